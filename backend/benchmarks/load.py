@@ -0,0 +1,365 @@
+"""
+Load benchmarks for the API against the in-memory Supabase stand-in.
+
+    python -m benchmarks.load run [--scenarios login,report] [--concurrency 32] ...
+    python -m benchmarks.load run --backend sqlite ...
+    python -m benchmarks.load compare BASE_REV HEAD_REV [--threshold 10]
+
+`run` seeds the stand-in (10k employees and 2M activity logs by default),
+starts the application in-process and drives each scenario through its
+ASGI interface, reporting throughput and p50/p95/p99 latency. The load
+generator shares the process (and, on small machines, the CPU) with the
+application, so compare numbers from the same machine only.
+
+With --backend sqlite the seeded rows are copied into an embedded SQLite
+database and the application runs with DATABASE_BACKEND=sqlite, so
+nothing goes through the Supabase client at all ("trips/req" then counts
+SQL statements).
+
+`compare` checks both revisions out into temporary git worktrees and
+runs the same benchmark (this revision's harness) against each, then
+reports the change per scenario. It exits 1 when p95 latency or
+throughput regresses by more than --threshold percent.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+WORKTREE = "WORKTREE"
+
+SCENARIOS = ("login", "heartbeat", "report", "dashboard", "admin_dashboard", "wellness")
+
+# Scenarios too heavy to run at the general request count / concurrency
+SCENARIO_LIMITS = {"wellness": {"requests": 3, "concurrency": 1}}
+
+REPORT_DESCRIPTIONS = (
+    "My manager keeps making comments about my accent in team meetings and it is getting worse every week.",
+    "A colleague was injured because the loading bay is unsafe; the guard rail has been broken for a month.",
+    "I was offered a bribe by a supplier to approve their invoice without the usual checks.",
+    "Short note about a scheduling issue.",
+)
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(name: str, latencies: List[float], statuses: List[int], elapsed: float, concurrency: int, round_trips: int) -> Dict:
+    ordered = sorted(latencies)
+    errors = sum(1 for code in statuses if code >= 400)
+    return {
+        "scenario": name,
+        "requests": len(statuses),
+        "concurrency": concurrency,
+        "errors": errors,
+        "unavailable": bool(statuses) and all(code in (404, 405) for code in statuses),
+        "throughput_rps": round(len(statuses) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        "round_trips_per_request": round(round_trips / len(statuses), 2) if statuses else 0.0
+    }
+
+async def drive(client, build_request: Callable[[int], Dict], requests: int, concurrency: int):
+    """Issue `requests` requests from `concurrency` workers; returns (latencies, statuses, elapsed)"""
+    latencies: List[float] = []
+    statuses: List[int] = []
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < requests:
+            number = issued
+            issued += 1
+            request = build_request(number)
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                statuses.append(response.status_code)
+            except Exception:
+                statuses.append(599)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, statuses, time.perf_counter() - started
+
+def build_scenarios(seeded: Dict, issue_token: Callable[[str], str], rng: random.Random) -> Dict[str, Callable[[int], Dict]]:
+    from benchmarks.seed import BENCH_PASSWORD, REPORT_TYPES, SEVERITIES, employee_email
+
+    employee_count = len(seeded["employee_ids"])
+    # A few hundred signed-in (active) employees, tokens issued directly by the auth backend
+    active = seeded["active_employee_ids"]
+    signed_in = [issue_token(employee_id) for employee_id in rng.sample(active, min(500, len(active)))]
+    admin = {"Authorization": f"Bearer {issue_token(seeded['admin_id'])}"}
+
+    def as_employee() -> Dict:
+        return {"Authorization": f"Bearer {rng.choice(signed_in)}"}
+
+    return {
+        "login": lambda n: {
+            "method": "POST", "url": "/auth/login",
+            "json": {"email": employee_email(rng.randrange(employee_count)), "password": BENCH_PASSWORD}
+        },
+        "heartbeat": lambda n: {"method": "POST", "url": "/activity/heartbeat", "headers": as_employee()},
+        "report": lambda n: {
+            "method": "POST", "url": "/reports", "headers": as_employee(),
+            "json": {
+                "report_type": rng.choice(REPORT_TYPES), "severity": rng.choice(SEVERITIES),
+                "title": f"Benchmark report {n}", "description": rng.choice(REPORT_DESCRIPTIONS),
+                "is_anonymous": rng.random() < 0.2
+            }
+        },
+        "dashboard": lambda n: {"method": "GET", "url": "/dashboard/metrics", "headers": as_employee()},
+        "admin_dashboard": lambda n: {"method": "GET", "url": "/dashboard/metrics", "headers": admin},
+        "wellness": lambda n: {"method": "POST", "url": "/admin/wellness/recompute", "headers": admin},
+    }
+
+async def _drain_flagging(main_module, timeout: float = 120.0) -> Optional[float]:
+    """Seconds until background flagging has caught up (None if this revision flags inline)"""
+    queue = getattr(getattr(main_module, "flagging_queue", None), "_queue", None)
+    if queue is None:
+        return None
+    started = time.perf_counter()
+    await asyncio.wait_for(queue.join(), timeout)
+    return round(time.perf_counter() - started, 3)
+
+async def run_scenarios(app_dir: Path, options: argparse.Namespace) -> Dict:
+    from benchmarks.seed import seed
+    from benchmarks.stand_in import SupabaseStandIn
+    import httpx
+
+    sqlite = options.backend == "sqlite"
+    stand_in = SupabaseStandIn(latency_ms=options.db_latency_ms)
+    if not sqlite:
+        stand_in.install()
+        os.environ.update(stand_in.environment())
+
+    seed_started = time.perf_counter()
+    seeded = seed(stand_in, options.employees, options.activity_logs, options.seed)
+    print(f"Seeded {seeded['counts']} in {time.perf_counter() - seed_started:.1f}s", file=sys.stderr)
+
+    # Import the application under test from app_dir, with its files (journals, uploads) in a scratch directory
+    sys.path.insert(0, str(app_dir))
+    scratch = tempfile.mkdtemp(prefix="behappy-bench-")
+    os.chdir(scratch)
+    try:
+        if sqlite:
+            os.environ.update({"DATABASE_BACKEND": "sqlite", "SQLITE_PATH": os.path.join(scratch, "bench.db")})
+            os.environ.setdefault("JWT_SECRET_KEY", secrets.token_urlsafe(32))
+            from benchmarks.seed import copy_to_sqlite
+            from config.sqlite_backend import get_database, issue_access_token
+
+            copy_started = time.perf_counter()
+            copy_to_sqlite(stand_in, get_database())
+            print(f"Copied into SQLite in {time.perf_counter() - copy_started:.1f}s", file=sys.stderr)
+            users = stand_in.auth.users
+            issue_token = lambda user_id: issue_access_token(users[user_id])
+            round_trips = lambda: get_database().statements
+        else:
+            issue_token = stand_in.auth.issue_token
+            round_trips = lambda: stand_in.round_trips
+
+        import main
+
+        rng = random.Random(options.seed)
+        scenarios = build_scenarios(seeded, issue_token, rng)
+        results = []
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                for name in options.scenarios:
+                    limits = SCENARIO_LIMITS.get(name, {})
+                    requests = min(options.requests, limits.get("requests", options.requests))
+                    concurrency = min(options.concurrency, limits.get("concurrency", options.concurrency), requests)
+
+                    await drive(client, scenarios[name], min(options.warmup, requests), concurrency)
+                    trips_before = round_trips()
+                    latencies, statuses, elapsed = await drive(client, scenarios[name], requests, concurrency)
+                    result = summarize(name, latencies, statuses, elapsed, concurrency, round_trips() - trips_before)
+                    if name == "report":
+                        result["flagging_drain_s"] = await _drain_flagging(main)
+                    results.append(result)
+                    print_results([result], header=not results[:-1])
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(scratch, ignore_errors=True)
+        stand_in.uninstall()
+        # Each password sign-in leaves a (non-daemon) token auto-refresh timer
+        # on its client; cancel them or the process waits an hour to exit
+        for thread in threading.enumerate():
+            if isinstance(thread, threading.Timer):
+                thread.cancel()
+
+    return {
+        "app_dir": str(app_dir),
+        "options": {key: value for key, value in vars(options).items() if key not in ("command", "json", "app_dir")},
+        "seeded": seeded["counts"],
+        "results": results
+    }
+
+# ----- output -----
+
+COLUMNS = (
+    ("scenario", 16, "scenario"), ("requests", 8, "requests"), ("conc", 5, "concurrency"), ("errors", 6, "errors"),
+    ("req/s", 8, "throughput_rps"), ("p50 ms", 8, "p50_ms"), ("p95 ms", 8, "p95_ms"), ("p99 ms", 8, "p99_ms"),
+    ("trips/req", 9, "round_trips_per_request")
+)
+
+def print_results(results: List[Dict], header: bool = True):
+    if header:
+        print(" ".join(f"{title:>{width}}" if key != "scenario" else f"{title:<{width}}" for title, width, key in COLUMNS))
+    for result in results:
+        if result.get("unavailable"):
+            print(f"{result['scenario']:<16} (endpoint not available in this revision)")
+            continue
+        print(" ".join(
+            f"{result[key]:<{width}}" if key == "scenario" else f"{result[key]:>{width}}"
+            for _, width, key in COLUMNS
+        ))
+        if result.get("flagging_drain_s") is not None:
+            print(f"{'':<16} background flagging drained {result['flagging_drain_s']}s after the last request")
+    sys.stdout.flush()
+
+# ----- revision comparison -----
+
+def _git(*args: str) -> str:
+    return subprocess.run(["git", *args], cwd=BACKEND_DIR, check=True, capture_output=True, text=True).stdout.strip()
+
+def run_revision(revision: str, forwarded: List[str]) -> Dict:
+    """Benchmark one git revision (or the working tree) in a child process"""
+    worktree = None
+    if revision == WORKTREE:
+        app_dir = BACKEND_DIR
+    else:
+        toplevel = Path(_git("rev-parse", "--show-toplevel"))
+        worktree = Path(tempfile.mkdtemp(prefix="behappy-rev-"))
+        _git("worktree", "add", "--detach", str(worktree), revision)
+        app_dir = worktree / BACKEND_DIR.relative_to(toplevel)
+
+    output = Path(tempfile.mkstemp(suffix=".json")[1])
+    try:
+        print(f"\n== {revision} ({app_dir})", flush=True)
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.load", "run", "--app-dir", str(app_dir), "--json", str(output), *forwarded],
+            cwd=BACKEND_DIR, check=True
+        )
+        return json.loads(output.read_text())
+    finally:
+        output.unlink(missing_ok=True)
+        if worktree is not None:
+            _git("worktree", "remove", "--force", str(worktree))
+
+def _change(base: float, head: float) -> Optional[float]:
+    return round((head - base) / base * 100, 1) if base else None
+
+def compare(base_run: Dict, head_run: Dict, threshold: float) -> List[Dict]:
+    """Per-scenario deltas; a scenario regresses when p95 rises or throughput falls by more than threshold %"""
+    base_results = {r["scenario"]: r for r in base_run["results"]}
+    rows = []
+    for head in head_run["results"]:
+        base = base_results.get(head["scenario"])
+        if base is None or base.get("unavailable") or head.get("unavailable"):
+            rows.append({"scenario": head["scenario"], "comparable": False})
+            continue
+        p95_change = _change(base["p95_ms"], head["p95_ms"])
+        throughput_change = _change(base["throughput_rps"], head["throughput_rps"])
+        rows.append({
+            "scenario": head["scenario"],
+            "comparable": True,
+            "base": base,
+            "head": head,
+            "p50_change": _change(base["p50_ms"], head["p50_ms"]),
+            "p95_change": p95_change,
+            "p99_change": _change(base["p99_ms"], head["p99_ms"]),
+            "throughput_change": throughput_change,
+            "regressed": (p95_change or 0) > threshold or (throughput_change or 0) < -threshold or head["errors"] > base["errors"]
+        })
+    return rows
+
+def print_comparison(rows: List[Dict], base_label: str, head_label: str):
+    print(f"\n{'scenario':<16} {'metric':<8} {base_label[:12]:>12} {head_label[:12]:>12} {'change':>8}")
+    for row in rows:
+        if not row["comparable"]:
+            print(f"{row['scenario']:<16} (not available in both revisions)")
+            continue
+        for metric, key, change in (
+            ("req/s", "throughput_rps", row["throughput_change"]), ("p50 ms", "p50_ms", row["p50_change"]),
+            ("p95 ms", "p95_ms", row["p95_change"]), ("p99 ms", "p99_ms", row["p99_change"]),
+            ("errors", "errors", None), ("trips/rq", "round_trips_per_request", None)
+        ):
+            shown = f"{change:+.1f}%" if change is not None else ""
+            print(f"{row['scenario'] if metric == 'req/s' else '':<16} {metric:<8} {row['base'][key]:>12} {row['head'][key]:>12} {shown:>8}")
+        if row["regressed"]:
+            print(f"{'':<16} REGRESSION")
+
+def _forwarded_options(args: argparse.Namespace) -> List[str]:
+    return [
+        "--scenarios", ",".join(args.scenarios), "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+        "--warmup", str(args.warmup), "--employees", str(args.employees), "--activity-logs", str(args.activity_logs),
+        "--db-latency-ms", str(args.db_latency_ms), "--seed", str(args.seed), "--backend", args.backend
+    ]
+
+def _scenario_list(value: str) -> List[str]:
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    return names
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load benchmarks against the in-memory Supabase stand-in")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--scenarios", type=_scenario_list, default=list(SCENARIOS), help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    common.add_argument("--requests", type=int, default=500, help="Measured requests per scenario (wellness is capped at 3)")
+    common.add_argument("--concurrency", type=int, default=32)
+    common.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario before measuring")
+    common.add_argument("--employees", type=int, default=10000)
+    common.add_argument("--activity-logs", type=int, default=2000000)
+    common.add_argument("--db-latency-ms", type=float, default=1.0, help="Simulated network latency per database/auth round trip")
+    common.add_argument("--seed", type=int, default=7)
+    common.add_argument("--backend", choices=("supabase", "sqlite"), default="supabase",
+                        help="Data backend under test (sqlite needs a revision with the embedded backend)")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run = subcommands.add_parser("run", parents=[common], help="Benchmark the application")
+    run.add_argument("--app-dir", type=Path, default=BACKEND_DIR, help="Backend directory of the application under test")
+    run.add_argument("--json", type=Path, default=None, help="Also write the results as JSON")
+
+    revisions = subcommands.add_parser("compare", parents=[common], help="Benchmark two git revisions and report regressions")
+    revisions.add_argument("base", help=f"Baseline git revision ({WORKTREE} for uncommitted changes)")
+    revisions.add_argument("head", help=f"Candidate git revision ({WORKTREE} for uncommitted changes)")
+    revisions.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    revisions.add_argument("--json", type=Path, default=None, help="Also write the comparison as JSON")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = asyncio.run(run_scenarios(args.app_dir.resolve(), args))
+        if args.json:
+            args.json.write_text(json.dumps(report, indent=2))
+
+    elif args.command == "compare":
+        forwarded = _forwarded_options(args)
+        base_run = run_revision(args.base, forwarded)
+        head_run = run_revision(args.head, forwarded)
+        rows = compare(base_run, head_run, args.threshold)
+        print_comparison(rows, args.base, args.head)
+        if args.json:
+            args.json.write_text(json.dumps({"base": args.base, "head": args.head, "threshold": args.threshold, "scenarios": rows}, indent=2))
+        sys.exit(1 if any(row.get("regressed") for row in rows) else 0)
@@ -0,0 +1,157 @@
+"""
+Seed data for the stand-in: departments, employees (with auth users),
+an admin, activity logs with matching daily rollups, reports, tasks,
+wellness history and flagging rules. Deterministic for a given seed
+(timestamps are relative to the time of seeding).
+"""
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from benchmarks.stand_in import SupabaseStandIn
+
+BENCH_PASSWORD = "bench-password"
+ADMIN_EMAIL = "admin@behappy-bench.com"
+
+DEPARTMENTS = (
+    "Engineering", "Sales", "Marketing", "Finance", "Human Resources", "Operations", "Legal",
+    "Customer Support", "Product", "Design", "Security", "Facilities", "Procurement", "Research",
+    "Quality", "Logistics", "Training", "Communications", "Data", "Administration"
+)
+REPORT_TYPES = ("harassment", "discrimination", "safety", "fraud", "misconduct", "other")
+SEVERITIES = ("low", "medium", "high", "critical")
+FLAGGING_RULES = (
+    ("threat", "critical"), ("weapon", "critical"), ("assault", "critical"), ("harass", "high"),
+    ("bribe", "high"), ("fraud", "high"), ("unsafe", "medium"), ("retaliation", "high"),
+    ("discriminat", "high"), ("injury", "medium")
+)
+ACTIVITY_DAYS = 30
+
+def employee_email(index: int) -> str:
+    return f"employee{index}@behappy-bench.com"
+
+def seed(stand_in: SupabaseStandIn, employees: int, activity_logs: int, seed_value: int = 7) -> Dict:
+    """Fill the stand-in; returns {"admin_id", "employee_ids", "department_ids", "counts"}"""
+    rng = random.Random(seed_value)
+    db = stand_in.db
+    now = datetime.now(timezone.utc)
+
+    def stamp(days_ago: float) -> str:
+        return (now - timedelta(days=days_ago)).isoformat()
+
+    departments = [
+        {"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": name, "icon": "🏢",
+         "wellness_score": None, "total_employees": 0, "created_at": stamp(365), "updated_at": stamp(365)}
+        for name in DEPARTMENTS
+    ]
+    db.table("departments").load(departments)
+    department_ids = [d["id"] for d in departments]
+
+    profiles = []
+    for index in range(employees):
+        user = stand_in.auth.create_user(employee_email(index), BENCH_PASSWORD, str(uuid.UUID(int=rng.getrandbits(128))))
+        profiles.append({
+            "id": user["id"], "email": user["email"], "full_name": f"Employee {index}", "role": "employee",
+            "department_id": rng.choice(department_ids), "position": "Staff", "is_active": rng.random() > 0.02,
+            "activity_tracking_enabled": True, "created_at": stamp(rng.uniform(30, 700)), "updated_at": stamp(rng.uniform(0, 30))
+        })
+    admin = stand_in.auth.create_user(ADMIN_EMAIL, BENCH_PASSWORD)
+    profiles.append({
+        "id": admin["id"], "email": ADMIN_EMAIL, "full_name": "Bench Admin", "role": "admin", "department_id": department_ids[0],
+        "position": "Administrator", "is_active": True, "activity_tracking_enabled": False,
+        "created_at": stamp(700), "updated_at": stamp(700)
+    })
+    db.table("profiles").load(profiles)
+    employee_ids = [p["id"] for p in profiles if p["role"] == "employee"]
+
+    # Activity: mostly 5-minute "active" heartbeats plus some logins/logouts over the last
+    # ACTIVITY_DAYS. Timestamps come from a shared pool of slot strings to keep millions of rows affordable.
+    slots_per_day = 24 * 12
+    slot_stamps = [stamp(slot / slots_per_day) for slot in range(ACTIVITY_DAYS * slots_per_day)]
+    rollups: Dict = defaultdict(lambda: {"active_slots": 0, "login_count": 0, "logout_count": 0, "total_events": 0, "first_seen": None, "last_seen": None})
+    logs = []
+    for log_id in range(1, activity_logs + 1):
+        employee_id = employee_ids[rng.randrange(len(employee_ids))]
+        seen_at = slot_stamps[rng.randrange(len(slot_stamps))]
+        roll = rng.random()
+        activity_type = "login" if roll < 0.03 else "logout" if roll < 0.06 else "active"
+        logs.append({"id": log_id, "employee_id": employee_id, "activity_type": activity_type, "status": "active", "timestamp": seen_at})
+
+        rollup = rollups[(employee_id, seen_at[:10])]
+        rollup["total_events"] += 1
+        rollup[{"login": "login_count", "logout": "logout_count"}.get(activity_type, "active_slots")] += 1
+        if rollup["first_seen"] is None or seen_at < rollup["first_seen"]:
+            rollup["first_seen"] = seen_at
+        if rollup["last_seen"] is None or seen_at > rollup["last_seen"]:
+            rollup["last_seen"] = seen_at
+    db.table("activity_logs").load(logs)
+    db.table("activity_daily_rollups").load([
+        {"employee_id": employee_id, "day": day, **counts, "updated_at": counts["last_seen"]}
+        for (employee_id, day), counts in rollups.items()
+    ])
+
+    reports = []
+    for number in range(1, employees * 2 + 1):
+        anonymous = rng.random() < 0.2
+        created = stamp(rng.uniform(0, 90))
+        reports.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))), "report_id": f"RPT-{number:06d}",
+            "employee_id": None if anonymous else rng.choice(employee_ids), "department_id": rng.choice(department_ids),
+            "report_type": rng.choice(REPORT_TYPES), "severity": rng.choice(SEVERITIES),
+            "title": "Workplace concern", "description": "Details of the incident. " * rng.randint(2, 12),
+            "is_anonymous": anonymous, "status": rng.choice(("pending", "pending", "investigating", "resolved")),
+            "is_flagged": rng.random() < 0.15, "flag_reason": None, "attachments": [],
+            "created_at": created, "updated_at": created
+        })
+    db.table("reports").load(reports)
+
+    tasks = []
+    for employee_id in employee_ids:
+        for _ in range(5):
+            created = stamp(rng.uniform(0, 60))
+            tasks.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))), "employee_id": employee_id, "title": "Quarterly objective",
+                "is_completed": rng.random() < 0.6, "due_date": stamp(rng.uniform(-30, 30))[:10],
+                "created_at": created, "updated_at": created
+            })
+    db.table("tasks").load(tasks)
+
+    scores = []
+    for employee_id in employee_ids:
+        for week in range(4):
+            scores.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))), "employee_id": employee_id, "score": rng.randint(20, 100),
+                "factors": {}, "notes": None, "calculated_at": stamp(week * 7 + rng.uniform(0, 1))
+            })
+    db.table("wellness_scores").load(scores)
+
+    db.table("flagging_rules").load([
+        {"id": number, "keyword": keyword, "severity_level": severity, "is_active": True, "created_at": stamp(365)}
+        for number, (keyword, severity) in enumerate(FLAGGING_RULES, start=1)
+    ])
+
+    return {
+        "admin_id": admin["id"],
+        "employee_ids": employee_ids,
+        "active_employee_ids": [p["id"] for p in profiles if p["role"] == "employee" and p["is_active"]],
+        "department_ids": department_ids,
+        "counts": {name: len(table.rows) for name, table in db.tables.items() if table.rows}
+    }
+
+def copy_to_sqlite(stand_in: SupabaseStandIn, database) -> None:
+    """Load the seeded tables and auth users into an embedded SQLite database (config.sqlite_backend)"""
+    from config.sqlite_backend import TABLES
+    from services.password_hasher import hash_password
+
+    for name, table in stand_in.db.tables.items():
+        if table.rows and name in TABLES:
+            database.load(name, table.rows)
+    # Every seeded account has the same password, so one bcrypt hash does for all of them
+    password_hash = hash_password(BENCH_PASSWORD)
+    database.load("auth_users", [
+        {"id": user["id"], "email": user["email"], "password_hash": password_hash,
+         "created_at": user["created_at"], "updated_at": user["created_at"]}
+        for user in stand_in.auth.users.values()
+    ])
@@ -0,0 +1,617 @@
+"""
+In-memory stand-in for the Supabase REST (PostgREST) and auth (GoTrue)
+APIs. It is hooked in at the httpx transport, so the application under
+test runs unmodified: the real supabase-py client builds and serialises
+every request, and only the network hop and the database are replaced.
+
+Only the subset of PostgREST the application uses is implemented:
+eq/neq/gt/gte/lt/lte/like/ilike/is/in filters, or=/and= groups, order,
+limit/offset, count=exact, one level of embedded resources, insert,
+upsert (on_conflict), update, delete, and the views and functions from
+the migrations.
+"""
+import base64
+import json
+import re
+import secrets
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+STAND_IN_HOST = "supabase.stand-in"
+STAND_IN_URL = f"http://{STAND_IN_HOST}"
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def fake_jwt(claims: Dict) -> str:
+    """JWT-shaped (header.payload.signature) opaque token; supabase-py checks the shape of keys"""
+    def part(value: Dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+    return f"{part({'alg': 'none', 'typ': 'JWT'})}.{part(claims)}.{secrets.token_urlsafe(16)}"
+
+# ----- schema -----
+
+def _report_number(table: "Table") -> str:
+    return f"RPT-{len(table.rows) + 1:06d}"
+
+# table -> column defaults applied on insert (callables get the table)
+TABLE_DEFAULTS: Dict[str, Dict[str, Callable]] = {
+    "departments": {"id": lambda t: str(uuid.uuid4()), "wellness_score": lambda t: None, "total_employees": lambda t: 0},
+    "profiles": {"is_active": lambda t: True, "activity_tracking_enabled": lambda t: True, "department_id": lambda t: None},
+    "reports": {
+        "id": lambda t: str(uuid.uuid4()), "report_id": _report_number, "status": lambda t: "pending",
+        "is_flagged": lambda t: False, "flag_reason": lambda t: None, "attachments": lambda t: []
+    },
+    "activity_logs": {"id": lambda t: len(t.rows) + 1, "status": lambda t: "active", "timestamp": lambda t: now_iso()},
+    "activity_daily_rollups": {},
+    "tasks": {"id": lambda t: str(uuid.uuid4()), "is_completed": lambda t: False},
+    "wellness_scores": {"id": lambda t: str(uuid.uuid4()), "calculated_at": lambda t: now_iso()},
+    "flagging_rules": {"id": lambda t: len(t.rows) + 1, "is_active": lambda t: True},
+    "system_logs": {"id": lambda t: len(t.rows) + 1},
+    "revoked_tokens": {"revoked_at": lambda t: now_iso()},
+    "report_flagging": {
+        "status": lambda t: "queued", "attempts": lambda t: 0, "error": lambda t: None, "result": lambda t: None,
+        "updated_at": lambda t: now_iso()
+    },
+}
+
+# Hash-indexed columns where the id/*_id default does not fit (activity_logs is
+# only ever read by employee; an id index would cost a list per row)
+INDEXED_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "activity_logs": ("employee_id",),
+}
+
+# Tables stamped with created_at/updated_at by the database
+TIMESTAMPED_TABLES = {"departments", "profiles", "reports", "activity_logs", "tasks", "wellness_scores", "system_logs"}
+
+class Table:
+    """Rows plus hash indexes on id/*_id columns (what Postgres would have btree indexes on)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: List[Dict] = []
+        self.defaults = TABLE_DEFAULTS.get(name, {})
+        self.indexed_columns = INDEXED_COLUMNS.get(name)
+        self.indexes: Dict[str, Dict] = {}
+        self._unique: Dict[Tuple[str, ...], Dict] = {}
+        self.version = 0
+        self.changed_at = now_iso()
+
+    def _touch(self):
+        # What the table_versions triggers from migrations/006 do
+        self.version += 1
+        self.changed_at = now_iso()
+
+    def _indexed(self, column: str) -> bool:
+        if self.indexed_columns is not None:
+            return column in self.indexed_columns
+        return column == "id" or column.endswith("_id") or column == "jti"
+
+    def _index_row(self, row: Dict):
+        for column, value in row.items():
+            if self._indexed(column):
+                self.indexes.setdefault(column, defaultdict(list))[value].append(row)
+        for columns, index in self._unique.items():
+            index[tuple(row.get(c) for c in columns)] = row
+
+    def reindex(self):
+        self.indexes = {}
+        self._unique = {}
+        for row in self.rows:
+            self._index_row(row)
+
+    def unique(self, columns: Tuple[str, ...]) -> Dict:
+        index = self._unique.get(columns)
+        if index is None:
+            index = self._unique[columns] = {tuple(row.get(c) for c in columns): row for row in self.rows}
+        return index
+
+    def load(self, rows: List[Dict]):
+        """Bulk-load seed rows as they are (no defaults)"""
+        self.rows.extend(rows)
+        for row in rows:
+            self._index_row(row)
+        self._touch()
+
+    def insert(self, row: Dict) -> Dict:
+        row = dict(row)
+        for column, default in self.defaults.items():
+            if column not in row:
+                row[column] = default(self)
+        if self.name in TIMESTAMPED_TABLES:
+            stamp = now_iso()
+            row.setdefault("created_at", stamp)
+            row.setdefault("updated_at", stamp)
+        self.rows.append(row)
+        self._index_row(row)
+        self._touch()
+        return row
+
+    def update(self, row: Dict, values: Dict):
+        reindex = any(self._indexed(column) and row.get(column) != value for column, value in values.items())
+        row.update(values)
+        if self.name in TIMESTAMPED_TABLES or self.name == "report_flagging":
+            row["updated_at"] = now_iso()
+        if reindex:
+            self.reindex()
+        self._touch()
+
+    def delete(self, doomed: List[Dict]):
+        ids = {id(row) for row in doomed}
+        self.rows = [row for row in self.rows if id(row) not in ids]
+        self.reindex()
+        self._touch()
+
+    def candidates(self, filters: List) -> List[Dict]:
+        """Rows an indexed eq/in filter narrows the scan to (all rows otherwise)"""
+        for column, op, negate, value in filters:
+            if negate or column not in self.indexes:
+                continue
+            index = self.indexes[column]
+            if op == "eq":
+                return list(self._lookup(index, value))
+            if op == "in":
+                rows = []
+                for item in value:
+                    rows.extend(self._lookup(index, item))
+                return rows
+        return self.rows
+
+    @staticmethod
+    def _lookup(index: Dict, raw: str):
+        rows = index.get(raw)
+        if rows is None and raw.lstrip("-").isdigit():
+            rows = index.get(int(raw))
+        return rows or ()
+
+# ----- query grammar -----
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+def _split_top(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+def _parse_condition(column: str, expression: str) -> Tuple:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, value = expression.partition(".")
+    if op == "in":
+        # Parsed once per request, not once per row
+        return column, op, negate, frozenset(_unquote(item) for item in _split_top(value[1:-1]))
+    return column, op, negate, value
+
+def _parse_group(text: str) -> List:
+    """or=(a.lt.1,and(a.eq.1,id.lt.2)) -> [condition | (kind, [conditions])]"""
+    conditions = []
+    for item in _split_top(text):
+        match = re.match(r"^(and|or)\((.*)\)$", item)
+        if match:
+            conditions.append((match.group(1), _parse_group(match.group(2))))
+        else:
+            column, _, expression = item.partition(".")
+            conditions.append(_parse_condition(column, expression))
+    return conditions
+
+def _coerce(stored, raw: str):
+    if isinstance(stored, bool):
+        # Postgres boolean input is case-insensitive (supabase-py sends str(True))
+        return raw.lower() == "true"
+    if isinstance(stored, (int, float)):
+        return float(raw)
+    return raw
+
+def _matches_condition(row: Dict, condition: Tuple) -> bool:
+    if condition[0] in ("and", "or") and isinstance(condition[1], list):
+        return _matches_group(row, condition[0], condition[1])
+
+    column, op, negate, raw = condition
+    stored = row.get(column)
+    if op == "is":
+        result = stored is None if raw.lower() == "null" else stored is (raw.lower() == "true")
+    elif stored is None:
+        result = False
+    elif op == "in":
+        result = str(stored) in raw
+    elif op in ("like", "ilike"):
+        pattern = "^" + ".*".join(re.escape(part) for part in _unquote(raw).replace("%", "*").split("*")) + "$"
+        result = re.match(pattern, str(stored), re.IGNORECASE if op == "ilike" else 0) is not None
+    else:
+        value = _coerce(stored, _unquote(raw))
+        left = stored if not isinstance(value, str) else str(stored)
+        result = {
+            "eq": left == value, "neq": left != value, "gt": left > value,
+            "gte": left >= value, "lt": left < value, "lte": left <= value
+        }[op]
+    return not result if negate else result
+
+def _matches_group(row: Dict, kind: str, conditions: List) -> bool:
+    test = all if kind == "and" else any
+    return test(_matches_condition(row, condition) for condition in conditions)
+
+def _sort_rows(rows: List[Dict], orders: List[str]) -> List[Dict]:
+    for spec in reversed(orders):
+        column, *modifiers = spec.split(".")
+        descending = "desc" in modifiers
+        nulls_first = "nullsfirst" in modifiers if "nullsfirst" in modifiers or "nullslast" in modifiers else descending
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: row[column], reverse=descending)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+# ----- database -----
+
+class StandInDatabase:
+    """Tables, views (recomputed when their source tables change) and RPC functions"""
+
+    def __init__(self):
+        self.tables: Dict[str, Table] = {name: Table(name) for name in TABLE_DEFAULTS}
+        self._views: Dict[str, Tuple[Tuple[str, ...], Callable]] = {
+            "latest_wellness_scores": (("wellness_scores",), self._latest_wellness_scores),
+            "admin_dashboard_metrics": (("profiles", "reports", "departments", "wellness_scores"), self._admin_dashboard_metrics),
+            "department_health": (("profiles", "reports", "departments"), self._department_health),
+        }
+        self._view_cache: Dict[str, Tuple[Tuple, List[Dict]]] = {}
+
+    def table(self, name: str) -> Table:
+        if name not in self.tables:
+            self.tables[name] = Table(name)
+        return self.tables[name]
+
+    def relation_rows(self, name: str, filters: List) -> List[Dict]:
+        if name == "table_versions":
+            return [
+                {"table_name": table.name, "version": table.version, "changed_at": table.changed_at}
+                for table in list(self.tables.values())
+            ]
+        if name not in self._views:
+            return self.table(name).candidates(filters)
+        sources, build = self._views[name]
+        versions = tuple(self.table(source).version for source in sources)
+        cached = self._view_cache.get(name)
+        if cached is None or cached[0] != versions:
+            cached = self._view_cache[name] = (versions, build())
+        return cached[1]
+
+    # ----- triggers -----
+
+    def after_insert(self, name: str, rows: List[Dict]):
+        """What the AFTER INSERT triggers from the migrations do"""
+        if name != "reports":
+            return
+        # reports_queue_flagging (migrations/008)
+        flagging = self.table("report_flagging")
+        index = flagging.unique(("report_id",))
+        for row in rows:
+            if (row["id"],) not in index:
+                flagging.insert({"report_id": row["id"]})
+
+    # ----- views -----
+
+    def _latest_wellness_scores(self) -> List[Dict]:
+        latest: Dict[str, Dict] = {}
+        for row in self.table("wellness_scores").rows:
+            current = latest.get(row["employee_id"])
+            if current is None or row["calculated_at"] > current["calculated_at"]:
+                latest[row["employee_id"]] = row
+        return [
+            {"employee_id": employee_id, "score": row["score"], "calculated_at": row["calculated_at"]}
+            for employee_id, row in latest.items()
+        ]
+
+    def _admin_dashboard_metrics(self) -> List[Dict]:
+        profiles = [row for row in self.table("profiles").rows if row.get("role") == "employee"]
+        reports = self.table("reports").rows
+        scores = [row["score"] for row in self._latest_wellness_scores()]
+        return [{
+            "total_employees": len(profiles),
+            "active_employees": sum(1 for row in profiles if row.get("is_active")),
+            "total_departments": len(self.table("departments").rows),
+            "total_reports": len(reports),
+            "pending_reports": sum(1 for row in reports if row.get("status") == "pending"),
+            "flagged_reports": sum(1 for row in reports if row.get("is_flagged")),
+            "average_wellness_score": round(sum(scores) / len(scores), 2) if scores else None
+        }]
+
+    def _department_health(self) -> List[Dict]:
+        employees = defaultdict(int)
+        for row in self.table("profiles").rows:
+            if row.get("is_active"):
+                employees[row.get("department_id")] += 1
+        open_reports = defaultdict(int)
+        flagged = defaultdict(int)
+        for row in self.table("reports").rows:
+            if row.get("status") == "pending":
+                open_reports[row.get("department_id")] += 1
+            if row.get("is_flagged"):
+                flagged[row.get("department_id")] += 1
+        return [
+            {
+                "department_id": row["id"],
+                "department_name": row.get("name"),
+                "wellness_score": row.get("wellness_score"),
+                "total_employees": employees[row["id"]],
+                "open_reports": open_reports[row["id"]],
+                "flagged_reports": flagged[row["id"]]
+            }
+            for row in self.table("departments").rows
+        ]
+
+    # ----- functions -----
+
+    def rpc(self, name: str, params: Dict):
+        if name == "set_department_wellness":
+            departments = self.table("departments")
+            index = departments.unique(("id",))
+            for summary in params["summaries"]:
+                row = index.get((summary["id"],))
+                if row is not None:
+                    departments.update(row, {
+                        "wellness_score": summary["wellness_score"], "total_employees": summary["total_employees"], "updated_at": now_iso()
+                    })
+            return None
+        if name != "bump_activity_rollups":
+            raise KeyError(name)
+        rollups = self.table("activity_daily_rollups")
+        index = rollups.unique(("employee_id", "day"))
+        for delta in params["deltas"]:
+            row = index.get((delta["employee_id"], delta["day"]))
+            if row is None:
+                rollups.insert({**delta, "updated_at": now_iso()})
+                continue
+            values = {field: row.get(field, 0) + delta[field] for field in ("active_slots", "login_count", "logout_count", "total_events")}
+            if delta.get("first_seen") and (not row.get("first_seen") or delta["first_seen"] < row["first_seen"]):
+                values["first_seen"] = delta["first_seen"]
+            if delta.get("last_seen") and (not row.get("last_seen") or delta["last_seen"] > row["last_seen"]):
+                values["last_seen"] = delta["last_seen"]
+            values["updated_at"] = now_iso()
+            rollups.update(row, values)
+        return None
+
+# ----- PostgREST -----
+
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+class PostgrestStandIn:
+    def __init__(self, db: StandInDatabase):
+        self.db = db
+
+    def handle(self, method: str, path: str, params: httpx.QueryParams, headers: httpx.Headers, body) -> httpx.Response:
+        if path.startswith("rpc/"):
+            result = self.db.rpc(path[4:], body or {})
+            return httpx.Response(204) if result is None else httpx.Response(200, json=result)
+
+        prefer = headers.get("prefer", "")
+        filters, groups = [], []
+        for key, value in params.multi_items():
+            if key in _RESERVED_PARAMS:
+                continue
+            if key in ("or", "and"):
+                groups.append((key, _parse_group(value[1:-1])))
+            else:
+                filters.append(_parse_condition(key, value))
+
+        def matching() -> List[Dict]:
+            rows = self.db.relation_rows(path, filters)
+            return [
+                row for row in rows
+                if all(_matches_condition(row, f) for f in filters)
+                and all(_matches_group(row, kind, conditions) for kind, conditions in groups)
+            ]
+
+        table = self.db.table(path)
+        if method == "GET" or method == "HEAD":
+            rows = matching()
+            orders = [spec for value in params.get_list("order") for spec in value.split(",")]
+            if orders:
+                rows = _sort_rows(rows, orders)
+            total = len(rows)
+            offset = int(params.get("offset", 0))
+            limit = params.get("limit")
+            rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+            data = [self._project(row, params.get("select", "*")) for row in rows]
+            response_headers = {}
+            if "count=exact" in prefer:
+                span = f"{offset}-{offset + len(data) - 1}" if data else "*"
+                response_headers["content-range"] = f"{span}/{total}"
+            return httpx.Response(200, json=data, headers=response_headers)
+
+        if method == "POST":
+            payload = body if isinstance(body, list) else [body]
+            conflict = params.get("on_conflict")
+            written, inserted = [], []
+            if conflict and "resolution=" in prefer:
+                columns = tuple(c.strip() for c in conflict.split(","))
+                index = table.unique(columns)
+                for item in payload:
+                    row = index.get(tuple(item.get(c) for c in columns))
+                    if row is None:
+                        row = table.insert(item)
+                        inserted.append(row)
+                    else:
+                        table.update(row, item)
+                    written.append(row)
+            else:
+                written = inserted = [table.insert(item) for item in payload]
+            self.db.after_insert(path, inserted)
+            return httpx.Response(201, json=written)
+
+        if method == "PATCH":
+            rows = matching()
+            for row in rows:
+                table.update(row, body)
+            return httpx.Response(200, json=rows)
+
+        if method == "DELETE":
+            rows = matching()
+            table.delete(rows)
+            return httpx.Response(200, json=rows)
+
+        return httpx.Response(405, json={"message": f"{method} not supported by the stand-in"})
+
+    def _project(self, row: Dict, select: str) -> Dict:
+        columns = _split_top(select)
+        if columns == ["*"]:
+            return dict(row)
+        result = {}
+        for column in columns:
+            embed = re.match(r"^(\w+)\((.*)\)$", column)
+            if embed:
+                relation, inner = embed.groups()
+                foreign_key = f"{relation[:-1]}_id" if relation.endswith("s") else f"{relation}_id"
+                related = self.db.table(relation).unique(("id",)).get((row.get(foreign_key),))
+                result[relation] = self._project(related, inner) if related else None
+            elif column == "*":
+                result.update(row)
+            else:
+                result[column] = row.get(column)
+        return result
+
+# ----- GoTrue -----
+
+class AuthStandIn:
+    def __init__(self):
+        self.users: Dict[str, Dict] = {}
+        self._by_email: Dict[str, Dict] = {}
+        self._passwords: Dict[str, str] = {}
+        self._tokens: Dict[str, str] = {}
+
+    def create_user(self, email: str, password: str, user_id: str = None) -> Dict:
+        user = {
+            "id": user_id or str(uuid.uuid4()),
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": email,
+            "app_metadata": {"provider": "email"},
+            "user_metadata": {},
+            "created_at": now_iso()
+        }
+        self.users[user["id"]] = user
+        self._by_email[email.lower()] = user
+        self._passwords[user["id"]] = password
+        return user
+
+    def issue_token(self, user_id: str) -> str:
+        token = fake_jwt({"sub": user_id, "session_id": str(uuid.uuid4()), "exp": int(time.time()) + 3600})
+        self._tokens[token] = user_id
+        return token
+
+    def handle(self, method: str, path: str, params: httpx.QueryParams, headers: httpx.Headers, body) -> httpx.Response:
+        if method == "POST" and path == "token" and params.get("grant_type") == "password":
+            user = self._by_email.get((body.get("email") or "").lower())
+            if user is None or self._passwords[user["id"]] != body.get("password"):
+                return httpx.Response(400, json={"error": "invalid_grant", "error_description": "Invalid login credentials"})
+            return httpx.Response(200, json={
+                "access_token": self.issue_token(user["id"]),
+                "token_type": "bearer",
+                "expires_in": 3600,
+                "refresh_token": secrets.token_urlsafe(16),
+                "user": user
+            })
+
+        if method == "POST" and path == "admin/users":
+            if (body.get("email") or "").lower() in self._by_email:
+                return httpx.Response(422, json={"msg": "User already registered"})
+            return httpx.Response(200, json=self.create_user(body["email"], body.get("password", "")))
+
+        token = headers.get("authorization", "").removeprefix("Bearer ").strip()
+        user_id = self._tokens.get(token)
+        if path == "logout":
+            self._tokens.pop(token, None)
+            return httpx.Response(204)
+        if user_id is None:
+            return httpx.Response(401, json={"msg": "Invalid JWT"})
+        if path == "user" and method == "GET":
+            return httpx.Response(200, json=self.users[user_id])
+        if path == "user" and method == "PUT":
+            if body.get("password"):
+                self._passwords[user_id] = body["password"]
+            return httpx.Response(200, json=self.users[user_id])
+
+        return httpx.Response(404, json={"msg": f"{method} /{path} not supported by the stand-in"})
+
+# ----- transport hook -----
+
+class SupabaseStandIn:
+    """
+    Routes every httpx request for STAND_IN_URL to the in-memory REST/auth
+    stand-ins. latency_ms is slept per round trip (outside the lock, on the
+    caller's thread) to model the network hop to a real database, so that
+    round-trip count shows up in latency the way it does in production.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.db = StandInDatabase()
+        self.rest = PostgrestStandIn(self.db)
+        self.auth = AuthStandIn()
+        self.round_trips = 0
+        self._lock = threading.Lock()
+        self._original = None
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.loads(request.read() or b"null")
+        path = request.url.path
+        with self._lock:
+            self.round_trips += 1
+            if path.startswith("/rest/v1/"):
+                response = self.rest.handle(request.method, path[9:], request.url.params, request.headers, body)
+            elif path.startswith("/auth/v1/"):
+                response = self.auth.handle(request.method, path[9:], request.url.params, request.headers, body)
+            else:
+                response = httpx.Response(404, json={"message": f"No stand-in for {path}"})
+        response.request = request
+        return response
+
+    def install(self):
+        """Patch httpx so requests to STAND_IN_HOST never leave the process"""
+        stand_in = self
+        original = self._original = httpx.HTTPTransport.handle_request
+
+        def handle_request(transport, request):
+            if request.url.host == STAND_IN_HOST:
+                return stand_in.handle(request)
+            return original(transport, request)
+
+        httpx.HTTPTransport.handle_request = handle_request
+
+    def uninstall(self):
+        if self._original is not None:
+            httpx.HTTPTransport.handle_request = self._original
+            self._original = None
+
+    def environment(self) -> Dict[str, str]:
+        """Settings that point the application at the stand-in"""
+        return {
+            "SUPABASE_URL": STAND_IN_URL,
+            "SUPABASE_KEY": fake_jwt({"role": "anon"}),
+            "SUPABASE_SERVICE_KEY": fake_jwt({"role": "service_role"}),
+        }
@@ -0,0 +1,140 @@
+"""
+Startup budget check for API workers.
+
+    python -m benchmarks.startup [--import-budget-ms 600] [--ready-budget-ms 900] [--top 12]
+
+Two numbers, each from a fresh child process:
+
+- import: cumulative time of `import main` as reported by
+  `python -X importtime`, with the heaviest packages (by self time) listed
+  so a new top-level import of something large shows up by name.
+- ready: wall time from spawning `python` to the end of the lifespan
+  startup (interpreter start, import, create_app(), shared clients and
+  background services started). It runs on the embedded SQLite backend
+  with a scratch database, so it needs no network.
+
+Exits 1 when either number is over its budget. Compare numbers from the
+same machine only; importtime itself adds some overhead.
+"""
+import argparse
+import json
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+_READY_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app()
+created = time.perf_counter()
+
+async def start():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        print(json.dumps({
+            "import_ms": (imported - started) * 1000,
+            "create_app_ms": (created - imported) * 1000,
+            "lifespan_ms": (ready - created) * 1000
+        }), flush=True)
+
+asyncio.run(start())
+"""
+
+def parse_importtime(output: str) -> List[Tuple[int, int, int, str]]:
+    """`-X importtime` lines -> [(self_us, cumulative_us, depth, module)]"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append((int(self_us), int(cumulative_us), (len(name) - len(name.lstrip()) - 1) // 2, name.strip()))
+    return entries
+
+def _environment(app_dir: Path, **extra: str) -> Dict[str, str]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(app_dir), os.environ.get("PYTHONPATH")])))
+    env.update(extra)
+    return env
+
+def measure_imports(app_dir: Path, module: str = "main") -> Dict:
+    """Cumulative import time of `module` and the packages that cost the most"""
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    env = _environment(app_dir)
+    # First run compiles bytecode; only the second one is measured
+    subprocess.run(command, cwd=app_dir, env=env, capture_output=True)
+    completed = subprocess.run(command, cwd=app_dir, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    entries = parse_importtime(completed.stderr)
+    total_us = next(cumulative for _, cumulative, depth, name in entries if depth == 0 and name == module)
+    by_package: Counter = Counter()
+    for self_us, _, _, name in entries:
+        by_package[name.split(".")[0]] += self_us
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "modules": len(entries),
+        "packages_ms": {package: round(us / 1000, 1) for package, us in by_package.most_common()}
+    }
+
+def measure_ready(app_dir: Path) -> Dict:
+    """Wall time until the lifespan startup has finished, on a scratch SQLite database"""
+    scratch = tempfile.mkdtemp(prefix="behappy-startup-")
+    env = _environment(
+        app_dir, DATABASE_BACKEND="sqlite", SQLITE_PATH=os.path.join(scratch, "startup.db"),
+        JWT_SECRET_KEY=os.environ.get("JWT_SECRET_KEY") or secrets.token_urlsafe(32)
+    )
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", _READY_SCRIPT], cwd=scratch, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"startup failed:\n{completed.stderr[-2000:]}")
+
+    phases = json.loads(completed.stdout.strip().splitlines()[-1])
+    # The child stops timing at "ready"; shutdown is not part of startup
+    return {
+        "ready_ms": round(elapsed * 1000, 1),
+        "interpreter_ms": round(elapsed * 1000 - sum(phases.values()), 1),
+        **{phase: round(ms, 1) for phase, ms in phases.items()}
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check API worker import time and time to ready against budgets")
+    parser.add_argument("--app-dir", type=Path, default=BACKEND_DIR, help="Backend directory of the application under test")
+    parser.add_argument("--import-budget-ms", type=float, default=600.0)
+    parser.add_argument("--ready-budget-ms", type=float, default=900.0)
+    parser.add_argument("--top", type=int, default=12, help="How many of the heaviest packages to list")
+    parser.add_argument("--json", type=Path, default=None, help="Also write the measurements as JSON")
+    args = parser.parse_args()
+
+    imports = measure_imports(args.app_dir.resolve())
+    ready = measure_ready(args.app_dir.resolve())
+
+    print(f"import main: {imports['total_ms']} ms ({imports['modules']} modules), budget {args.import_budget_ms:g} ms")
+    for package, ms in list(imports["packages_ms"].items())[:args.top]:
+        print(f"  {ms:>8} ms  {package}")
+    print(f"ready: {ready['ready_ms']} ms, budget {args.ready_budget_ms:g} ms")
+    for phase in ("interpreter_ms", "import_ms", "create_app_ms", "lifespan_ms"):
+        print(f"  {ready[phase]:>8} ms  {phase[:-3]}")
+
+    if args.json:
+        args.json.write_text(json.dumps({"imports": imports, "ready": ready}, indent=2))
+
+    over = []
+    if imports["total_ms"] > args.import_budget_ms:
+        over.append("import")
+    if ready["ready_ms"] > args.ready_budget_ms:
+        over.append("ready")
+    if over:
+        print(f"OVER BUDGET: {', '.join(over)}")
+    sys.exit(1 if over else 0)
@@ -1,10 +1,158 @@
-from supabase import create_client, Client
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from config.settings import settings
+from services.metrics import DB_LATENCY, DB_ERRORS, describe_query
+from services.query_tracker import BulkOperation, record_query
+from typing import TYPE_CHECKING, Dict, Optional
 
-def get_supabase() -> Client:
+if TYPE_CHECKING:
+    from supabase import Client
+
+# supabase-py (with gotrue, postgrest, storage3 and realtime) and the embedded
+# SQLite backend are imported by the functions below, on first use: only one
+# of them is ever needed and importing them is a large share of worker start-up.
+
+# Both data backends (supabase-py, embedded SQLite) are synchronous, so every
+# call runs on this bounded pool instead of the event loop. The semaphore keeps
+# waiting calls on the loop (where they can still be cancelled) rather than in
+# the pool queue.
+_db_executor = None
+_db_semaphore = asyncio.Semaphore(settings.DB_MAX_WORKERS)
+
+def _executor() -> ThreadPoolExecutor:
+    # Created on first use (and again after a shutdown, e.g. a second app lifespan in tests)
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=settings.DB_MAX_WORKERS,
+            thread_name_prefix="supabase"
+        )
+    return _db_executor
+
+# Built on first use and shared: each client loads the CA bundle and opens
+# its own connection pools, which costs tens of milliseconds per client.
+# Token auto-refresh is off because no session is ever kept on them.
+_clients: Dict[str, "Client"] = {}
+_clients_lock = threading.Lock()
+_auth_http_client = None
+
+def _shared_client(key: str) -> "Client":
+    client = _clients.get(key)
+    if client is None:
+        from gotrue import SyncMemoryStorage
+        from supabase import create_client
+        from supabase.lib.client_options import ClientOptions
+
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = create_client(
+                    settings.SUPABASE_URL, key,
+                    ClientOptions(auto_refresh_token=False, persist_session=False, storage=SyncMemoryStorage())
+                )
+    return client
+
+def _sqlite_client():
+    from config.sqlite_backend import SQLiteClient, get_database
+    return SQLiteClient(get_database())
+
+def get_supabase() -> "Client":
     """Get Supabase client with anon key (respects RLS)"""
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    if settings.DATABASE_BACKEND == "sqlite":
+        return _sqlite_client()
+    return _shared_client(settings.SUPABASE_KEY)
 
-def get_supabase_admin() -> Client:
+def get_supabase_admin() -> "Client":
     """Get Supabase admin client (bypasses RLS)"""
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
\ No newline at end of file
+    if settings.DATABASE_BACKEND == "sqlite":
+        return _sqlite_client()
+    return _shared_client(settings.SUPABASE_SERVICE_KEY)
+
+def get_auth_client():
+    """
+    A fresh auth client for calls that keep a session (sign_in_with_password,
+    update_user, sign_out). Signing in on the shared client would switch its
+    queries to that user's token for every request, so those calls get a
+    client of their own; only the HTTP connection pool is shared.
+    """
+    global _auth_http_client
+    if settings.DATABASE_BACKEND == "sqlite":
+        return _sqlite_client().auth
+    from gotrue import SyncGoTrueClient, SyncMemoryStorage
+    from gotrue.http_clients import SyncClient
+
+    if _auth_http_client is None:
+        with _clients_lock:
+            if _auth_http_client is None:
+                _auth_http_client = SyncClient()
+    return SyncGoTrueClient(
+        url=f"{settings.SUPABASE_URL}/auth/v1",
+        headers={"apiKey": settings.SUPABASE_KEY, "Authorization": f"Bearer {settings.SUPABASE_KEY}"},
+        auto_refresh_token=False,
+        persist_session=False,
+        storage=SyncMemoryStorage(),
+        http_client=_auth_http_client
+    )
+
+def warm_clients():
+    """Create the shared clients ahead of the first request (called from the app lifespan)"""
+    get_supabase()
+    get_supabase_admin()
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking Supabase call (query, auth, rpc) on the DB thread pool"""
+    async with _db_semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor(), partial(func, *args, **kwargs))
+
+async def run_auth(func, *args, **kwargs):
+    """
+    Run an auth call (sign-in, password change, user creation). Coroutine
+    implementations are awaited on the loop so their password hashing can
+    go through the hashing process pool; blocking ones (GoTrue) go to the
+    DB thread pool like any other call.
+    """
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await run_blocking(func, *args, **kwargs)
+
+async def db_execute(query, bulk: Optional[BulkOperation] = None):
+    """
+    Await a PostgREST query builder without blocking the event loop. Pass
+    the same `bulk` for every round trip of one paged or chunked operation.
+    """
+    started = time.perf_counter()
+    try:
+        return await run_blocking(query.execute)
+    except Exception:
+        DB_ERRORS.inc(*describe_query(query))
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        DB_LATENCY.observe(elapsed, *describe_query(query))
+        record_query(query, elapsed, bulk)
+
+async def db_fetch_all(build_query, page_size: int = 1000, bulk: Optional[BulkOperation] = None) -> list:
+    """
+    Read every row of a query page by page (PostgREST caps rows per response).
+    Callers reading one list in chunks pass a shared `bulk` for all of them.
+    """
+    bulk = bulk or BulkOperation()
+    rows = []
+    offset = 0
+    while True:
+        page = await db_execute(build_query().range(offset, offset + page_size - 1), bulk)
+        rows.extend(page.data)
+        if len(page.data) < page_size:
+            return rows
+        offset += page_size
+
+def shutdown_db_executor():
+    """Release the DB thread pool (called on application shutdown)"""
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=False, cancel_futures=True)
+        _db_executor = None
\ No newline at end of file
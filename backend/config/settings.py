@@ -3,17 +3,42 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Placeholder secret; the embedded SQLite backend refuses to start with it (it signs its own tokens)
+DEFAULT_JWT_SECRET_KEY = "your-secret-key-change-in-production"
+
 class Settings:
     # Supabase
     SUPABASE_URL: str = os.getenv("SUPABASE_URL")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY")
     SUPABASE_SERVICE_KEY: str = os.getenv("SUPABASE_SERVICE_KEY")
-    
+    # Data backend: "supabase" (hosted Postgres) or "sqlite" (embedded file, for single-site installs)
+    DATABASE_BACKEND: str = os.getenv("DATABASE_BACKEND", "supabase").lower()
+    SQLITE_PATH: str = os.getenv("SQLITE_PATH", "data/behappy.db")
+
+    # Database thread pool (the Supabase client is synchronous)
+    DB_MAX_WORKERS: int = int(os.getenv("DB_MAX_WORKERS", "32"))
+    # Per-request query tracking: X-DB-Queries / X-DB-Time headers, N+1 warning threshold
+    QUERY_DEBUG_HEADERS: bool = os.getenv("QUERY_DEBUG_HEADERS", "false").lower() == "true"
+    QUERY_REPEAT_WARN_THRESHOLD: int = int(os.getenv("QUERY_REPEAT_WARN_THRESHOLD", "5"))
+
     # JWT
-    JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
+    JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", DEFAULT_JWT_SECRET_KEY)
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
     
+    # Password hashing pool (bcrypt runs in worker processes; 0 = one per CPU)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_MAX_QUEUED: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUED", "64"))
+    
+    # Token revocation (logout): Bloom filter + exact set, synced from revoked_tokens
+    TOKEN_REVOCATION_CAPACITY: int = int(os.getenv("TOKEN_REVOCATION_CAPACITY", "100000"))
+    TOKEN_REVOCATION_ERROR_RATE: float = 0.001
+    TOKEN_REVOCATION_SYNC_SECONDS: float = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "10"))
+
+    # Principal cache (profiles resolved by get_current_user)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+    
     # Email (Optional - configure if you want email notifications)
     SMTP_HOST: str = os.getenv("SMTP_HOST", "smtp.gmail.com")
     SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
@@ -25,22 +50,52 @@ class Settings:
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: set = {".pdf", ".png", ".jpg", ".jpeg", ".doc", ".docx"}
     UPLOAD_DIR: str = "uploads"
+    # Hand file bodies to the reverse proxy (e.g. "X-Accel-Redirect" for nginx, "X-Sendfile" for Apache)
+    SENDFILE_HEADER: str = os.getenv("SENDFILE_HEADER", "")
+    SENDFILE_PREFIX: str = os.getenv("SENDFILE_PREFIX", "/protected-uploads")
+    IMAGE_PROCESS_WORKERS: int = int(os.getenv("IMAGE_PROCESS_WORKERS", "2"))
     
     # Wellness Score Thresholds
     WELLNESS_EXCELLENT_MIN: int = 80
     WELLNESS_GOOD_MIN: int = 50
     WELLNESS_FAIR_MIN: int = 30
+    WELLNESS_BATCH_CHUNK_SIZE: int = int(os.getenv("WELLNESS_BATCH_CHUNK_SIZE", "200"))
     
     # Activity Tracking
     ACTIVITY_TIMEOUT_MINUTES: int = 10
     HEARTBEAT_INTERVAL_MINUTES: int = 5
+    HEARTBEAT_FLUSH_SECONDS: float = float(os.getenv("HEARTBEAT_FLUSH_SECONDS", "10"))
+    HEARTBEAT_BATCH_SIZE: int = int(os.getenv("HEARTBEAT_BATCH_SIZE", "500"))
+    HEARTBEAT_BUFFER_MAX: int = int(os.getenv("HEARTBEAT_BUFFER_MAX", "5000"))
+    ACTIVITY_ROLLUP_FLUSH_SECONDS: float = float(os.getenv("ACTIVITY_ROLLUP_FLUSH_SECONDS", "30"))
     
     # Report Flagging
     PATTERN_DETECTION_DAYS: int = 7
     SIMILAR_REPORTS_THRESHOLD: int = 2
+    PATTERN_COUNTER_RESYNC_MINUTES: int = int(os.getenv("PATTERN_COUNTER_RESYNC_MINUTES", "5"))
+    FLAGGING_RULES_REFRESH_SECONDS: int = int(os.getenv("FLAGGING_RULES_REFRESH_SECONDS", "60"))
+    FLAGGING_WORKERS: int = int(os.getenv("FLAGGING_WORKERS", "4"))
+    FLAGGING_QUEUE_MAX_DEPTH: int = int(os.getenv("FLAGGING_QUEUE_MAX_DEPTH", "1000"))
+    FLAGGING_MAX_RETRIES: int = 3
+    FLAGGING_RETRY_BASE_SECONDS: float = 2.0
+    # Each worker process journals to <name>.<host>.<pid>.jsonl next to this path
+    FLAGGING_QUEUE_FILE: str = os.getenv("FLAGGING_QUEUE_FILE", "data/flagging_queue.jsonl")
+    
+    # Admission control: requests in flight per worker before lower-priority routes are shed
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "256"))
+    
+    # Admin dashboard stream (SSE)
+    DASHBOARD_STREAM_DEBOUNCE_SECONDS: float = float(os.getenv("DASHBOARD_STREAM_DEBOUNCE_SECONDS", "2"))
+    DASHBOARD_STREAM_REFRESH_SECONDS: float = float(os.getenv("DASHBOARD_STREAM_REFRESH_SECONDS", "30"))
+    DASHBOARD_STREAM_KEEPALIVE_SECONDS: float = 15
+    DASHBOARD_STREAM_QUEUE_SIZE: int = 256
+    STREAM_TICKET_TTL_SECONDS: int = int(os.getenv("STREAM_TICKET_TTL_SECONDS", "30"))
     
     # Pagination
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
+    
+    # Conditional GET (ETag): upper bound on how long time-derived dashboard figures can be revalidated as unchanged
+    CONDITIONAL_GET_MAX_AGE_SECONDS: int = int(os.getenv("CONDITIONAL_GET_MAX_AGE_SECONDS", "60"))
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,998 @@
+import argparse
+import asyncio
+import getpass
+import json
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+from gotrue.errors import AuthApiError
+from gotrue.types import AuthResponse, Session, User, UserResponse
+from jose import JWTError, jwt
+from postgrest import APIError, APIResponse
+from config.database import run_blocking
+from config.settings import settings, DEFAULT_JWT_SECRET_KEY
+from services.auth_service import AuthService
+from services.password_hasher import password_hasher
+from services.time_utils import parse_timestamp
+
+# Embedded SQLite implementation of the data layer, selected with
+# DATABASE_BACKEND=sqlite. SQLiteClient answers the same calls the services
+# make on a supabase-py Client (table(...) query builders, rpc(...), auth),
+# so every service runs unchanged on either backend. There is no RLS here:
+# the anon and admin clients see the same data.
+
+# ----- schema -----
+
+NOW = "now()"
+NEW_UUID = "gen_random_uuid()"
+
+class Column(NamedTuple):
+    type: str  # uuid, serial, text, int, real, bool, json, timestamp, date
+    not_null: bool = False
+    default: object = None  # SQL literal, NOW, or NEW_UUID (generated on insert)
+
+_SQL_TYPES = {
+    "uuid": "TEXT", "serial": "INTEGER", "text": "TEXT", "int": "INTEGER", "real": "REAL",
+    "bool": "INTEGER", "json": "TEXT", "timestamp": "TEXT", "date": "TEXT"
+}
+
+def _stamps() -> Dict[str, Column]:
+    return {"created_at": Column("timestamp", True, NOW), "updated_at": Column("timestamp", True, NOW)}
+
+TABLES: Dict[str, Dict[str, Column]] = {
+    "departments": {
+        "id": Column("uuid", True, NEW_UUID), "name": Column("text", True), "icon": Column("text"),
+        "description": Column("text"), "wellness_score": Column("real"), "total_employees": Column("int", False, 0),
+        **_stamps()
+    },
+    "profiles": {
+        "id": Column("uuid", True), "email": Column("text", True), "full_name": Column("text"),
+        "employee_id": Column("text"), "role": Column("text", True, "'employee'"), "department_id": Column("uuid"),
+        "position": Column("text"), "avatar_url": Column("text"), "is_active": Column("bool", True, 1),
+        "activity_tracking_enabled": Column("bool", True, 1), "requires_password_change": Column("bool", True, 0),
+        **_stamps()
+    },
+    "reports": {
+        "id": Column("uuid", True, NEW_UUID), "report_id": Column("text", True), "employee_id": Column("uuid"),
+        "department_id": Column("uuid"), "report_type": Column("text", True), "severity": Column("text", True),
+        "title": Column("text", True), "description": Column("text", True), "is_anonymous": Column("bool", True, 0),
+        "incident_date": Column("text"), "witness_information": Column("text"), "attachments": Column("json", False, "'[]'"),
+        "status": Column("text", True, "'pending'"), "is_flagged": Column("bool", True, 0), "flag_reason": Column("text"),
+        "assigned_to": Column("uuid"), "resolution_notes": Column("text"), **_stamps()
+    },
+    "activity_logs": {
+        "id": Column("serial", True), "employee_id": Column("uuid", True), "activity_type": Column("text", True),
+        "status": Column("text", False, "'active'"), "timestamp": Column("timestamp", True, NOW),
+        "created_at": Column("timestamp", True, NOW)
+    },
+    "activity_daily_rollups": {
+        "employee_id": Column("uuid", True), "day": Column("date", True), "active_slots": Column("int", True, 0),
+        "login_count": Column("int", True, 0), "logout_count": Column("int", True, 0), "total_events": Column("int", True, 0),
+        "first_seen": Column("timestamp"), "last_seen": Column("timestamp"), "updated_at": Column("timestamp", True, NOW)
+    },
+    "wellness_scores": {
+        "id": Column("uuid", True, NEW_UUID), "employee_id": Column("uuid", True), "score": Column("int", True),
+        "factors": Column("json"), "notes": Column("text"), "calculated_at": Column("timestamp", True, NOW),
+        "created_at": Column("timestamp", True, NOW)
+    },
+    "tasks": {
+        "id": Column("uuid", True, NEW_UUID), "employee_id": Column("uuid", True), "report_id": Column("uuid"),
+        "title": Column("text", True), "description": Column("text"), "due_date": Column("date"),
+        "priority": Column("text"), "is_completed": Column("bool", True, 0), **_stamps()
+    },
+    "flagging_rules": {
+        "id": Column("serial", True), "rule_name": Column("text"), "keyword": Column("text"), "keywords": Column("json"),
+        "severity_level": Column("text"), "min_severity": Column("text"), "is_active": Column("bool", True, 1),
+        "created_at": Column("timestamp", True, NOW)
+    },
+    "system_logs": {
+        "id": Column("serial", True), "user_id": Column("uuid"), "action": Column("text", True),
+        "entity_type": Column("text"), "entity_id": Column("text"), "details": Column("json"),
+        "created_at": Column("timestamp", True, NOW)
+    },
+    "revoked_tokens": {
+        "jti": Column("text", True), "user_id": Column("uuid"), "expires_at": Column("timestamp", True),
+        "revoked_at": Column("timestamp", True, NOW)
+    },
+    "stream_tickets": {
+        "ticket_hash": Column("text", True), "user_id": Column("uuid", True), "expires_at": Column("timestamp", True),
+        "created_at": Column("timestamp", True, NOW)
+    },
+    "report_flagging": {
+        "report_id": Column("uuid", True), "status": Column("text", True, "'queued'"), "attempts": Column("int", True, 0),
+        "error": Column("text"), "result": Column("json"), "updated_at": Column("timestamp", True, NOW)
+    },
+    "table_versions": {
+        "table_name": Column("text", True), "version": Column("int", True, 0), "changed_at": Column("timestamp", True, NOW)
+    },
+    # Stands in for Supabase's auth.users
+    "auth_users": {
+        "id": Column("uuid", True, NEW_UUID), "email": Column("text", True), "password_hash": Column("text", True),
+        "user_metadata": Column("json", False, "'{}'"), **_stamps()
+    },
+}
+
+PRIMARY_KEYS: Dict[str, Tuple[str, ...]] = {
+    "activity_daily_rollups": ("employee_id", "day"),
+    "revoked_tokens": ("jti",),
+    "stream_tickets": ("ticket_hash",),
+    "report_flagging": ("report_id",),
+    "table_versions": ("table_name",),
+}
+
+# Tables whose table_versions counter is bumped on every write (migrations/006; row triggers here)
+VERSIONED_TABLES = ("departments", "profiles", "reports", "tasks", "wellness_scores")
+
+# (table, columns, unique); the same access paths as the Postgres indexes
+# and migrations, plus the foreign keys Postgres users index by hand. A few
+# carry extra trailing columns so the views can be answered from the index.
+INDEXES: Tuple[Tuple[str, str, bool], ...] = (
+    ("profiles", "email", True),
+    ("profiles", "created_at DESC, id DESC", False),
+    ("profiles", "department_id, created_at DESC, id DESC", False),
+    ("reports", "report_id", True),
+    ("reports", "created_at DESC, id DESC", False),
+    ("reports", "department_id, created_at DESC, id DESC", False),
+    ("reports", "department_id, report_type, created_at", False),
+    ("reports", "employee_id, created_at", False),
+    ("reports", "department_id, status, is_flagged", False),
+    ("activity_logs", "employee_id, timestamp", False),
+    ("activity_logs", "timestamp, id", False),
+    ("activity_daily_rollups", "day", False),
+    ("wellness_scores", "employee_id, calculated_at DESC, score", False),
+    ("wellness_scores", "calculated_at", False),
+    ("tasks", "employee_id, updated_at", False),
+    ("flagging_rules", "is_active", False),
+    ("system_logs", "created_at", False),
+    ("revoked_tokens", "revoked_at", False),
+    ("revoked_tokens", "expires_at", False),
+    ("stream_tickets", "expires_at", False),
+    ("auth_users", "email COLLATE NOCASE", True),
+)
+
+# Views from the migrations: (columns, SQL)
+VIEWS: Dict[str, Tuple[Dict[str, Column], str]] = {
+    # SQLite takes the bare columns of a max() aggregate from the max row
+    "latest_wellness_scores": (
+        {"employee_id": Column("uuid"), "score": Column("int"), "calculated_at": Column("timestamp")},
+        "SELECT employee_id, score, max(calculated_at) AS calculated_at FROM wellness_scores GROUP BY employee_id"
+    ),
+    "admin_dashboard_metrics": (
+        {
+            "total_employees": Column("int"), "active_employees": Column("int"), "total_departments": Column("int"),
+            "total_reports": Column("int"), "pending_reports": Column("int"), "flagged_reports": Column("int"),
+            "average_wellness_score": Column("real")
+        },
+        """SELECT
+            (SELECT count(*) FROM profiles WHERE role = 'employee') AS total_employees,
+            (SELECT count(*) FROM profiles WHERE role = 'employee' AND is_active) AS active_employees,
+            (SELECT count(*) FROM departments) AS total_departments,
+            (SELECT count(*) FROM reports) AS total_reports,
+            (SELECT count(*) FROM reports WHERE status = 'pending') AS pending_reports,
+            (SELECT count(*) FROM reports WHERE is_flagged) AS flagged_reports,
+            (SELECT round(avg(score), 2) FROM latest_wellness_scores) AS average_wellness_score"""
+    ),
+    "department_health": (
+        {
+            "department_id": Column("uuid"), "department_name": Column("text"), "wellness_score": Column("real"),
+            "total_employees": Column("int"), "open_reports": Column("int"), "flagged_reports": Column("int")
+        },
+        # One grouped pass over each table rather than a subquery per department
+        """SELECT
+            d.id AS department_id,
+            d.name AS department_name,
+            d.wellness_score,
+            coalesce(p.total_employees, 0) AS total_employees,
+            coalesce(r.open_reports, 0) AS open_reports,
+            coalesce(r.flagged_reports, 0) AS flagged_reports
+        FROM departments d
+        LEFT JOIN (
+            SELECT department_id, count(*) AS total_employees FROM profiles WHERE is_active GROUP BY department_id
+        ) p ON p.department_id = d.id
+        LEFT JOIN (
+            SELECT department_id, sum(status = 'pending') AS open_reports, sum(is_flagged = 1) AS flagged_reports
+            FROM reports GROUP BY department_id
+        ) r ON r.department_id = d.id"""
+    ),
+}
+
+# Same text format as _now() (SQLite's clock has millisecond resolution)
+_NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000+00:00'"
+
+def schema_sql() -> str:
+    statements = []
+    for table, columns in TABLES.items():
+        definitions = []
+        for name, column in columns.items():
+            definition = f'"{name}" {_SQL_TYPES[column.type]}'
+            if column.not_null:
+                definition += " NOT NULL"
+            if column.default == NOW:
+                definition += f" DEFAULT ({_NOW_SQL})"
+            elif column.default is not None and column.default != NEW_UUID:
+                definition += f" DEFAULT {column.default}"
+            definitions.append(definition)
+        primary_key = PRIMARY_KEYS.get(table, ("id",))
+        definitions.append(f"PRIMARY KEY ({', '.join(primary_key)})")
+        statements.append(f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(definitions) + "\n)")
+    for table, columns, unique in INDEXES:
+        name = f"{table}_{re.sub(r'[^a-z_]+', '_', columns.lower()).strip('_')}_idx"
+        statements.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    for view, (_, sql) in VIEWS.items():
+        statements.append(f"CREATE VIEW IF NOT EXISTS {view} AS {sql}")
+    for table in VERSIONED_TABLES:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_bump_version_{event.lower()} AFTER {event} ON {table} BEGIN "
+                f"INSERT INTO table_versions (table_name, version, changed_at) VALUES ('{table}', 1, {_NOW_SQL}) "
+                f"ON CONFLICT (table_name) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at; END"
+            )
+    # The 'queued' flagging status row of a new report (migrations/008)
+    statements.append(
+        "CREATE TRIGGER IF NOT EXISTS reports_queue_flagging AFTER INSERT ON reports BEGIN "
+        "INSERT INTO report_flagging (report_id) VALUES (NEW.id) ON CONFLICT (report_id) DO NOTHING; END"
+    )
+    return ";\n".join(statements) + ";"
+
+# ----- values -----
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+@lru_cache(maxsize=65536)
+def _timestamp(value) -> str:
+    # One fixed-width UTC format, so timestamps compare correctly as text
+    return parse_timestamp(value).isoformat(timespec="microseconds")
+
+def encode(column: Column, value):
+    """Python/PostgREST value -> stored SQLite value"""
+    if value is None:
+        return None
+    kind = column.type
+    if kind == "bool":
+        return int(value.lower() == "true") if isinstance(value, str) else int(bool(value))
+    if kind == "json":
+        return json.dumps(value, default=str)
+    if kind == "timestamp":
+        return _timestamp(value)
+    if kind == "date":
+        return value.isoformat()[:10] if isinstance(value, (date, datetime)) else str(value)[:10]
+    if kind in ("int", "serial"):
+        return int(value)
+    if kind == "real":
+        return float(value)
+    return str(value)
+
+def decode(column: Column, value):
+    """Stored SQLite value -> what PostgREST would return"""
+    if value is None:
+        return None
+    if column.type == "bool":
+        return bool(value)
+    if column.type == "json":
+        return json.loads(value)
+    return value
+
+# ----- PostgREST filter grammar (for or_() strings) -----
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+def _split_top(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+def _parse_group(text: str) -> List:
+    """'a.lt.1,and(a.eq.1,id.lt.2)' -> [(column, op, value) | (kind, [conditions])]"""
+    conditions = []
+    for item in _split_top(text):
+        match = re.match(r"^(and|or)\((.*)\)$", item)
+        if match:
+            conditions.append((match.group(1), _parse_group(match.group(2))))
+            continue
+        column, _, expression = item.partition(".")
+        op, _, value = expression.partition(".")
+        if op == "not":
+            op, _, value = value.partition(".")
+            op = "not." + op
+        if op.endswith("in"):
+            value = [_unquote(v) for v in _split_top(value[1:-1])]
+        else:
+            value = _unquote(value)
+        conditions.append((column, op, value))
+    return conditions
+
+def _filter_text(value) -> str:
+    if isinstance(value, (list, tuple, set)):
+        return "(" + ",".join(str(item) for item in value) + ")"
+    return str(value)
+
+def _column(relation: str, schema: Dict[str, Column], name: str) -> Column:
+    column = schema.get(name)
+    if column is None:
+        raise APIError({
+            "message": f"Could not find the '{name}' column of '{relation}'",
+            "code": "PGRST204", "hint": None, "details": None
+        })
+    return column
+
+# ----- query builder -----
+
+_COMPARISONS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+class SQLiteQuery:
+    """
+    The supabase-py query builder calls the services use (select/insert/
+    upsert/update/delete, filters, order, limit, range), compiled to one
+    SQLite statement. path, http_method, headers, params and json mirror
+    the PostgREST request they stand for, so metrics and query tracking
+    describe both backends the same way.
+    """
+
+    def __init__(self, database: "SQLiteDatabase", relation: str):
+        self._database = database
+        self.relation = relation
+        self.path = f"/{relation}"
+        self.http_method = "GET"
+        self.headers: Dict[str, str] = {}
+        self.json = None
+        self._params: List[Tuple[str, str]] = []
+        self._columns = "*"
+        self._count = None
+        self._filters: List = []
+        self._orders: List[Tuple[str, bool, bool]] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+        self._on_conflict: Optional[str] = None
+        self._ignore_duplicates = False
+
+    @property
+    def params(self) -> httpx.QueryParams:
+        return httpx.QueryParams(self._params)
+
+    # ----- operations -----
+
+    def select(self, *columns: str, count=None) -> "SQLiteQuery":
+        self._columns = ",".join(columns) or "*"
+        self._count = count
+        self._params.append(("select", self._columns))
+        if count:
+            self.headers["prefer"] = f"count={count}"
+        return self
+
+    def insert(self, json, *, count=None, returning=None, upsert: bool = False) -> "SQLiteQuery":
+        self.http_method = "POST"
+        self.json = json
+        self.headers["prefer"] = "return=representation"
+        if upsert:
+            self.headers["prefer"] += ",resolution=merge-duplicates"
+            self._on_conflict = ""
+        return self
+
+    def upsert(self, json, *, count=None, returning=None, ignore_duplicates: bool = False, on_conflict: str = "") -> "SQLiteQuery":
+        self.insert(json)
+        self.headers["prefer"] += f",resolution={'ignore' if ignore_duplicates else 'merge'}-duplicates"
+        self._on_conflict = on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        if on_conflict:
+            self._params.append(("on_conflict", on_conflict))
+        return self
+
+    def update(self, json: Dict, *, count=None, returning=None) -> "SQLiteQuery":
+        self.http_method = "PATCH"
+        self.json = json
+        self.headers["prefer"] = "return=representation"
+        return self
+
+    def delete(self, *, count=None, returning=None) -> "SQLiteQuery":
+        self.http_method = "DELETE"
+        self.headers["prefer"] = "return=representation"
+        return self
+
+    # ----- filters -----
+
+    def filter(self, column: str, operator: str, criteria) -> "SQLiteQuery":
+        self._filters.append((column, operator, criteria))
+        self._params.append((column, f"{operator}.{_filter_text(criteria)}"))
+        return self
+
+    def eq(self, column: str, value) -> "SQLiteQuery":
+        return self.filter(column, "eq", value)
+
+    def neq(self, column: str, value) -> "SQLiteQuery":
+        return self.filter(column, "neq", value)
+
+    def gt(self, column: str, value) -> "SQLiteQuery":
+        return self.filter(column, "gt", value)
+
+    def gte(self, column: str, value) -> "SQLiteQuery":
+        return self.filter(column, "gte", value)
+
+    def lt(self, column: str, value) -> "SQLiteQuery":
+        return self.filter(column, "lt", value)
+
+    def lte(self, column: str, value) -> "SQLiteQuery":
+        return self.filter(column, "lte", value)
+
+    def like(self, column: str, pattern: str) -> "SQLiteQuery":
+        return self.filter(column, "like", pattern)
+
+    def ilike(self, column: str, pattern: str) -> "SQLiteQuery":
+        return self.filter(column, "ilike", pattern)
+
+    def is_(self, column: str, value) -> "SQLiteQuery":
+        return self.filter(column, "is", "null" if value is None else str(value).lower())
+
+    def in_(self, column: str, values) -> "SQLiteQuery":
+        return self.filter(column, "in", list(values))
+
+    def or_(self, filters: str, reference_table: Optional[str] = None) -> "SQLiteQuery":
+        self._filters.append(("or", _parse_group(filters)))
+        self._params.append(("or", f"({filters})"))
+        return self
+
+    # ----- modifiers -----
+
+    def order(self, column: str, *, desc: bool = False, nullsfirst: bool = False, foreign_table: Optional[str] = None) -> "SQLiteQuery":
+        self._orders.append((column, desc, nullsfirst))
+        self._params.append(("order", f"{column}.{'desc' if desc else 'asc'}" + (".nullsfirst" if nullsfirst else "")))
+        return self
+
+    def limit(self, size: int, *, foreign_table: Optional[str] = None) -> "SQLiteQuery":
+        self._limit = size
+        self._params.append(("limit", str(size)))
+        return self
+
+    def range(self, start: int, end: int, foreign_table: Optional[str] = None) -> "SQLiteQuery":
+        self._offset = start
+        self._limit = end - start + 1
+        self._params.extend((("offset", str(start)), ("limit", str(self._limit))))
+        return self
+
+    def execute(self) -> APIResponse:
+        try:
+            return self._database.run(self)
+        except sqlite3.Error as e:
+            raise APIError({"message": str(e), "code": type(e).__name__, "hint": None, "details": None})
+
+    # ----- compilation -----
+
+    def _where(self, schema: Dict[str, Column], qualify: str = "") -> Tuple[str, List]:
+        clauses, args = [], []
+        for condition in self._filters:
+            clause, values = self._condition(schema, condition, qualify)
+            clauses.append(clause)
+            args.extend(values)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def _condition(self, schema: Dict[str, Column], condition: Tuple, qualify: str) -> Tuple[str, List]:
+        if condition[0] in ("and", "or") and len(condition) == 2:
+            kind, members = condition
+            parts, args = [], []
+            for member in members:
+                clause, values = self._condition(schema, member, qualify)
+                parts.append(clause)
+                args.extend(values)
+            return "(" + f" {kind.upper()} ".join(parts or ["1"]) + ")", args
+
+        name, op, value = condition
+        negate = op.startswith("not.")
+        op = op[4:] if negate else op
+        column = _column(self.relation, schema, name)
+        target = f'{qualify}"{name}"'
+        if op in _COMPARISONS:
+            clause, args = f"{target} {_COMPARISONS[op]} ?", [encode(column, value)]
+        elif op == "in":
+            clause = f"{target} IN ({', '.join('?' * len(value))})" if value else "0"
+            args = [encode(column, item) for item in value]
+        elif op == "is":
+            literal = str(value).lower()
+            clause, args = (f"{target} IS NULL", []) if literal == "null" else (f"{target} IS ?", [int(literal == "true")])
+        elif op == "like":
+            clause, args = f"{target} GLOB ?", [str(value).replace("%", "*")]
+        elif op == "ilike":
+            clause, args = f"{target} LIKE ?", [str(value).replace("*", "%")]
+        else:
+            raise APIError({"message": f"Unsupported operator '{op}'", "code": "PGRST100", "hint": None, "details": None})
+        return (f"NOT ({clause})" if negate else clause), args
+
+    def compile_select(self) -> Tuple[str, List, List[Tuple[str, Optional[str], Column]], str, List]:
+        """(sql, args, [(key, embedded relation, column)], count sql, count args)"""
+        schema = self._database.columns(self.relation)
+        qualify = f'"{self.relation}".'
+        selected, outputs, joins = [], [], []
+        for item in _split_top(self._columns):
+            embed = re.match(r"^(\w+)\((.*)\)$", item)
+            if embed:
+                relation, inner = embed.groups()
+                related = self._database.columns(relation)
+                foreign_key = f"{relation[:-1]}_id" if relation.endswith("s") else f"{relation}_id"
+                _column(self.relation, schema, foreign_key)
+                joins.append(f'LEFT JOIN {relation} AS "{relation}" ON "{relation}".id = {qualify}"{foreign_key}"')
+                # The related id tells a missing match (null) from a row of nulls
+                selected.append(f'"{relation}".id')
+                outputs.append((None, relation, None))
+                names = list(related) if inner.strip() == "*" else [c.strip() for c in _split_top(inner)]
+                for name in names:
+                    selected.append(f'"{relation}"."{name}"')
+                    outputs.append((name, relation, _column(relation, related, name)))
+            else:
+                names = list(schema) if item == "*" else [item]
+                for name in names:
+                    selected.append(f'{qualify}"{name}"')
+                    outputs.append((name, None, _column(self.relation, schema, name)))
+
+        where, args = self._where(schema, qualify)
+        sql = f"SELECT {', '.join(selected)} FROM {self.relation} {' '.join(joins)}{where}"
+        if self._orders:
+            terms = []
+            for name, descending, nulls_first in self._orders:
+                column = _column(self.relation, schema, name)
+                term = f'{qualify}"{name}" {"DESC" if descending else "ASC"}'
+                # Postgres sorts nulls as the largest value; only spell that out for nullable columns
+                if not column.not_null:
+                    term += " NULLS FIRST" if nulls_first or descending else " NULLS LAST"
+                terms.append(term)
+            sql += " ORDER BY " + ", ".join(terms)
+        query_args = list(args)
+        if self._limit is not None or self._offset:
+            sql += " LIMIT ? OFFSET ?"
+            query_args.extend((-1 if self._limit is None else self._limit, self._offset or 0))
+        count_sql = f"SELECT count(*) FROM {self.relation}{where}"
+        return sql, query_args, outputs, count_sql, args
+
+class SQLiteRpc:
+    """client.rpc(name, params) for the database functions in the migrations"""
+
+    def __init__(self, database: "SQLiteDatabase", name: str, params: Dict):
+        self._database = database
+        self.name = name
+        self.path = f"/rpc/{name}"
+        self.http_method = "POST"
+        self.headers: Dict[str, str] = {}
+        self.json = params
+        self.params = httpx.QueryParams()
+
+    def execute(self) -> APIResponse:
+        function = self._database.functions.get(self.name)
+        if function is None:
+            raise APIError({
+                "message": f"Could not find the function {self.name}", "code": "PGRST202", "hint": None, "details": None
+            })
+        try:
+            return APIResponse(data=function(**(self.json or {})) or [], count=None)
+        except sqlite3.Error as e:
+            raise APIError({"message": str(e), "code": type(e).__name__, "hint": None, "details": None})
+
+# ----- database -----
+
+class SQLiteDatabase:
+    """
+    One SQLite file shared by every thread of the DB pool. Each thread has
+    its own connection (WAL lets readers run alongside the writer), writes
+    in this process are serialised by a lock instead of busy-waiting on
+    the file lock, and each connection keeps its compiled statements in
+    the sqlite3 statement cache, so a repeated query shape is prepared
+    once per thread.
+    """
+
+    def __init__(self, path: str, cached_statements: int = 512):
+        self.path = path
+        self.cached_statements = cached_statements
+        self.statements = 0
+        self.functions: Dict[str, Callable] = {
+            "bump_activity_rollups": self._bump_activity_rollups,
+            "set_department_wellness": self._set_department_wellness
+        }
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        connection = self.connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(schema_sql())
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, isolation_level=None, check_same_thread=False, cached_statements=self.cached_statements
+            )
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            connection.execute("PRAGMA cache_size=-65536")
+            connection.execute("PRAGMA temp_store=MEMORY")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def columns(self, relation: str) -> Dict[str, Column]:
+        if relation in TABLES:
+            return TABLES[relation]
+        if relation in VIEWS:
+            return VIEWS[relation][0]
+        raise APIError({
+            "message": f"Could not find the table 'public.{relation}' in the schema cache",
+            "code": "PGRST205", "hint": None, "details": None
+        })
+
+    def table_columns(self, relation: str) -> Dict[str, Column]:
+        if relation not in TABLES:
+            raise APIError({
+                "message": f"cannot write to '{relation}': not a table", "code": "PGRST205", "hint": None, "details": None
+            })
+        return TABLES[relation]
+
+    def query(self, sql: str, args=()) -> List[tuple]:
+        self.statements += 1
+        return self.connection().execute(sql, args).fetchall()
+
+    def write(self, statements: List[Tuple[str, tuple]], many: bool = False) -> List[tuple]:
+        """Run statements in one transaction; returns the rows they RETURN"""
+        connection = self.connection()
+        rows = []
+        with self._write_lock:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, args in statements:
+                    self.statements += 1
+                    if many:
+                        connection.executemany(sql, args)
+                    else:
+                        rows.extend(connection.execute(sql, args).fetchall())
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return rows
+
+    # ----- queries -----
+
+    def run(self, query: SQLiteQuery) -> APIResponse:
+        if query.http_method == "GET":
+            sql, args, outputs, count_sql, count_args = query.compile_select()
+            rows = self.query(sql, args)
+            count = self.query(count_sql, count_args)[0][0] if query._count else None
+            return APIResponse(data=[self._row(outputs, row) for row in rows], count=count)
+        if query.http_method == "POST":
+            return APIResponse(data=self._insert(query), count=None)
+        if query.http_method == "PATCH":
+            return APIResponse(data=self._update(query), count=None)
+        return APIResponse(data=self._delete(query), count=None)
+
+    @staticmethod
+    def _row(outputs, values) -> Dict:
+        row: Dict = {}
+        for (name, relation, column), value in zip(outputs, values):
+            if relation is None:
+                row[name] = decode(column, value)
+            elif name is None:
+                row[relation] = None if value is None else {}
+            elif row[relation] is not None:
+                row[relation][name] = decode(column, value)
+        return row
+
+    def _returning(self, relation: str, rows: List[tuple]) -> List[Dict]:
+        schema = TABLES[relation]
+        return [{name: decode(column, value) for (name, column), value in zip(schema.items(), row)} for row in rows]
+
+    def _prepare_row(self, relation: str, row: Dict) -> Dict:
+        schema = self.table_columns(relation)
+        values = {name: encode(_column(relation, schema, name), value) for name, value in row.items()}
+        for name, column in schema.items():
+            if column.default == NEW_UUID and name not in values:
+                values[name] = str(uuid.uuid4())
+        return values
+
+    def _insert(self, query: SQLiteQuery) -> List[Dict]:
+        relation = query.relation
+        payload = query.json if isinstance(query.json, list) else [query.json]
+        conflict = None
+        if query._on_conflict is not None:
+            conflict = [c.strip() for c in query._on_conflict.split(",") if c.strip()] or list(PRIMARY_KEYS.get(relation, ("id",)))
+
+        statements = []
+        for item in payload:
+            values = self._prepare_row(relation, item)
+            columns = [f'"{name}"' for name in values]
+            placeholders = ["?"] * len(values)
+            if relation == "reports" and "report_id" not in values:
+                # Sequential human-readable id (a sequence default in Postgres)
+                columns.append('"report_id"')
+                placeholders.append("printf('RPT-%06d', (SELECT coalesce(max(rowid), 0) + 1 FROM reports))")
+            sql = f"INSERT INTO {relation} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
+            if conflict is not None:
+                if query._ignore_duplicates:
+                    sql += f" ON CONFLICT ({', '.join(conflict)}) DO NOTHING"
+                else:
+                    updates = [c for c in item if c not in conflict]
+                    if "updated_at" in TABLES[relation] and "updated_at" not in updates:
+                        updates.append("updated_at")
+                    assignments = ", ".join(f'"{c}" = excluded."{c}"' for c in updates)
+                    sql += f" ON CONFLICT ({', '.join(conflict)}) " + (f"DO UPDATE SET {assignments}" if assignments else "DO NOTHING")
+            statements.append((sql + " RETURNING *", tuple(values.values())))
+        return self._returning(relation, self.write(statements))
+
+    def _update(self, query: SQLiteQuery) -> List[Dict]:
+        schema = self.table_columns(query.relation)
+        values = {name: encode(_column(query.relation, schema, name), value) for name, value in query.json.items()}
+        if "updated_at" in schema and "updated_at" not in values:
+            values["updated_at"] = _now()
+        where, args = query._where(schema)
+        assignments = ", ".join(f'"{name}" = ?' for name in values)
+        sql = f"UPDATE {query.relation} SET {assignments}{where} RETURNING *"
+        return self._returning(query.relation, self.write([(sql, (*values.values(), *args))]))
+
+    def _delete(self, query: SQLiteQuery) -> List[Dict]:
+        where, args = query._where(self.table_columns(query.relation))
+        return self._returning(query.relation, self.write([(f"DELETE FROM {query.relation}{where} RETURNING *", tuple(args))]))
+
+    # ----- functions -----
+
+    def _bump_activity_rollups(self, deltas: List[Dict]):
+        """Same upsert as the bump_activity_rollups function in migrations/001"""
+        schema = TABLES["activity_daily_rollups"]
+        counters = ("active_slots", "login_count", "logout_count", "total_events")
+        now = _now()
+        rows = [
+            (
+                str(delta["employee_id"]), encode(schema["day"], delta["day"]),
+                *(int(delta.get(field) or 0) for field in counters),
+                encode(schema["first_seen"], delta.get("first_seen")), encode(schema["last_seen"], delta.get("last_seen")), now
+            )
+            for delta in deltas
+        ]
+        self.write([("""
+            INSERT INTO activity_daily_rollups (
+                employee_id, day, active_slots, login_count, logout_count, total_events, first_seen, last_seen, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (employee_id, day) DO UPDATE SET
+                active_slots = active_slots + excluded.active_slots,
+                login_count = login_count + excluded.login_count,
+                logout_count = logout_count + excluded.logout_count,
+                total_events = total_events + excluded.total_events,
+                first_seen = min(coalesce(first_seen, excluded.first_seen), coalesce(excluded.first_seen, first_seen)),
+                last_seen = max(coalesce(last_seen, excluded.last_seen), coalesce(excluded.last_seen, last_seen)),
+                updated_at = excluded.updated_at
+        """, rows)], many=True)
+        return None
+
+    def _set_department_wellness(self, summaries: List[Dict]):
+        """Same update as the set_department_wellness function in migrations/005"""
+        now = _now()
+        self.write([(
+            "UPDATE departments SET wellness_score = ?, total_employees = ?, updated_at = ? WHERE id = ?",
+            [(summary["wellness_score"], summary["total_employees"], now, str(summary["id"])) for summary in summaries]
+        )], many=True)
+        return None
+
+    # ----- bulk loading -----
+
+    def load(self, relation: str, rows: List[Dict], chunk_size: int = 50000):
+        """Bulk-insert rows as they are (no RETURNING), for seeding and imports"""
+        schema = TABLES[relation]
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            by_columns: Dict[Tuple[str, ...], List[tuple]] = {}
+            for row in chunk:
+                columns = tuple(row)
+                by_columns.setdefault(columns, []).append(tuple(encode(schema[c], row[c]) for c in columns))
+            self.write([
+                (f"INSERT INTO {relation} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", values)
+                for columns, values in by_columns.items()
+            ], many=True)
+        self.query("ANALYZE")
+
+# ----- auth -----
+
+def issue_access_token(user: Dict) -> str:
+    """Signed access token for a local user (what GoTrue issues on sign-in)"""
+    now = int(time.time())
+    return jwt.encode({
+        "sub": user["id"], "email": user["email"], "aud": "authenticated", "role": "authenticated",
+        "session_id": str(uuid.uuid4()), "iat": now, "exp": now + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+def _user(row: Dict) -> User:
+    return User(
+        id=row["id"], email=row["email"], aud="authenticated", role="authenticated",
+        app_metadata={"provider": "email"}, user_metadata=row.get("user_metadata") or {},
+        created_at=parse_timestamp(row["created_at"]), updated_at=parse_timestamp(row["updated_at"])
+    )
+
+class LocalAuthAdmin:
+    def __init__(self, database: SQLiteDatabase):
+        self._database = database
+
+    async def create_user(self, attributes: Dict) -> UserResponse:
+        """Create a user and (like the Supabase signup trigger) its profile"""
+        password_hash = await AuthService.get_password_hash_async(attributes.get("password") or secrets.token_urlsafe(16))
+        return await run_blocking(self._insert_user, attributes, password_hash)
+
+    def _insert_user(self, attributes: Dict, password_hash: str) -> UserResponse:
+        metadata = attributes.get("user_metadata") or {}
+        client = SQLiteClient(self._database)
+        try:
+            created = client.table("auth_users").insert({
+                "email": attributes["email"],
+                "password_hash": password_hash,
+                "user_metadata": metadata
+            }).execute().data[0]
+        except APIError as e:
+            if "UNIQUE" in str(e.message):
+                raise AuthApiError("A user with this email address has already been registered", 422)
+            raise
+        client.table("profiles").insert({
+            "id": created["id"], "email": created["email"], "full_name": metadata.get("full_name"),
+            "employee_id": metadata.get("employee_id"), "role": metadata.get("role") or "employee"
+        }).execute()
+        return UserResponse(user=_user(created))
+
+    def sign_out(self, jwt_token: str, scope: str = "global"):
+        # Sessions are not stored server-side here; logout is enforced by revoking the token
+        return None
+
+class LocalAuth:
+    """
+    The supabase-py auth calls the application makes, against the
+    auth_users table: bcrypt password hashes and HS256 access tokens
+    signed with JWT_SECRET_KEY. Like the GoTrue client, each client
+    instance holds the session of its last sign-in.
+
+    The calls that hash (sign-in, password change, user creation) are
+    coroutines: bcrypt runs in the hashing process pool, which sheds load
+    with a 503, and only the table reads and writes use the DB thread pool.
+    """
+
+    def __init__(self, database: SQLiteDatabase):
+        self._database = database
+        self._session: Optional[Session] = None
+        self.admin = LocalAuthAdmin(database)
+
+    def _find(self, column: str, value) -> Optional[Dict]:
+        rows = SQLiteClient(self._database).table("auth_users").select("*").eq(column, value).execute().data
+        return rows[0] if rows else None
+
+    def _find_by_email(self, email: str) -> Optional[Dict]:
+        rows = self._database.query("SELECT id FROM auth_users WHERE email = ? COLLATE NOCASE", (email,))
+        return self._find("id", rows[0][0]) if rows else None
+
+    async def sign_in_with_password(self, credentials: Dict) -> AuthResponse:
+        row = await run_blocking(self._find_by_email, credentials.get("email") or "")
+        if row is None or not await AuthService.verify_password_async(credentials.get("password") or "", row["password_hash"]):
+            raise AuthApiError("Invalid login credentials", 400)
+        user = _user(row)
+        self._session = Session(
+            access_token=issue_access_token(row), refresh_token=secrets.token_urlsafe(16),
+            expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60, token_type="bearer", user=user
+        )
+        return AuthResponse(user=user, session=self._session)
+
+    def get_user(self, jwt_token: Optional[str] = None) -> UserResponse:
+        token = jwt_token or (self._session.access_token if self._session else None)
+        try:
+            claims = jwt.decode(token or "", settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM], audience="authenticated")
+        except JWTError:
+            raise AuthApiError("Invalid JWT", 401)
+        row = self._find("id", claims.get("sub"))
+        if row is None:
+            raise AuthApiError("User not found", 401)
+        return UserResponse(user=_user(row))
+
+    async def update_user(self, attributes: Dict) -> UserResponse:
+        if self._session is None:
+            raise AuthApiError("Auth session missing!", 401)
+        changes = {}
+        if attributes.get("password"):
+            changes["password_hash"] = await AuthService.get_password_hash_async(attributes["password"])
+        if attributes.get("data") is not None:
+            changes["user_metadata"] = attributes["data"]
+        if attributes.get("email"):
+            changes["email"] = attributes["email"]
+        return await run_blocking(self._apply_changes, self._session.user.id, changes)
+
+    def _apply_changes(self, user_id: str, changes: Dict) -> UserResponse:
+        client = SQLiteClient(self._database)
+        if changes:
+            rows = client.table("auth_users").update(changes).eq("id", user_id).execute().data
+        else:
+            rows = client.table("auth_users").select("*").eq("id", user_id).execute().data
+        return UserResponse(user=_user(rows[0]))
+
+    def sign_out(self, options=None):
+        self._session = None
+
+class SQLiteClient:
+    """Stands in for supabase.Client on the SQLite backend; cheap to create (the database is shared)"""
+
+    def __init__(self, database: SQLiteDatabase):
+        self._database = database
+        self.auth = LocalAuth(database)
+
+    def table(self, name: str) -> SQLiteQuery:
+        return SQLiteQuery(self._database, name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: Optional[Dict] = None) -> SQLiteRpc:
+        return SQLiteRpc(self._database, fn, params or {})
+
+_database: Optional[SQLiteDatabase] = None
+_database_lock = threading.Lock()
+
+def get_database() -> SQLiteDatabase:
+    """The process-wide database at settings.SQLITE_PATH, opened (and migrated) on first use"""
+    global _database
+    if not settings.JWT_SECRET_KEY or settings.JWT_SECRET_KEY == DEFAULT_JWT_SECRET_KEY:
+        # Access tokens are signed locally with this key: the public default would let anyone mint one
+        raise RuntimeError(
+            "DATABASE_BACKEND=sqlite needs JWT_SECRET_KEY set to a secret of your own, e.g. "
+            "python -c \"import secrets; print(secrets.token_urlsafe(32))\""
+        )
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = SQLiteDatabase(settings.SQLITE_PATH)
+    return _database
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedded SQLite database maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("init", help="Create the schema at SQLITE_PATH")
+    create_user = subcommands.add_parser("create-user", help="Create a sign-in account and its profile (e.g. the first admin)")
+    create_user.add_argument("email")
+    create_user.add_argument("--full-name", default="")
+    create_user.add_argument("--employee-id", default=None)
+    create_user.add_argument("--role", default="employee", choices=("employee", "admin"))
+    args = parser.parse_args()
+
+    database = get_database()
+    if args.command == "init":
+        print(f"Schema ready at {database.path}")
+    elif args.command == "create-user":
+        password = getpass.getpass("Password: ")
+        try:
+            response = asyncio.run(SQLiteClient(database).auth.admin.create_user({
+                "email": args.email, "password": password,
+                "user_metadata": {"full_name": args.full_name, "employee_id": args.employee_id, "role": args.role}
+            }))
+        finally:
+            password_hasher.shutdown()
+        print(f"Created {args.role} {response.user.email} ({response.user.id})")
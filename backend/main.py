@@ -1,75 +1,42 @@
-# =====================================================
-# FastAPI + Supabase Configuration
-# =====================================================
-# File: config/database.py
-
-import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
-from pathlib import Path
-
-# Get the backend directory path
-backend_dir = Path(__file__).resolve().parent.parent
-
-# Load environment variables from .env file
-env_path = "C:/Users/Windows 10 Pro/BeHappy/backend/.env"
-load_dotenv(dotenv_path=env_path)
-
-# Supabase Configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")  # Use anon key for client, service_role for admin
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")  # For bypassing RLS
-
-# Validate environment variables
-if not SUPABASE_URL:
-    raise ValueError(f"SUPABASE_URL not found in environment variables. Looking in: {env_path}")
-if not SUPABASE_KEY:
-    raise ValueError("SUPABASE_KEY not found in environment variables")
-if not SUPABASE_SERVICE_KEY:
-    raise ValueError("SUPABASE_SERVICE_KEY not found in environment variables")
-
-print(f"✅ Loaded environment from: {env_path}")
-print(f"✅ Supabase URL: {SUPABASE_URL}")
-
-# Initialize Supabase clients
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-supabase_admin: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response, status
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
+from config.database import get_supabase, get_supabase_admin, get_auth_client, warm_clients, db_execute, db_fetch_all, run_blocking, run_auth, shutdown_db_executor
+from services.principal_cache import principal_cache
+from services.flagging_queue import flagging_queue
+from services.pattern_counter import pattern_counter
+from services.heartbeat_buffer import heartbeat_buffer, HeartbeatBufferFull
+from services.activity_rollup import activity_rollups
+from services.time_utils import utc_today
+from services.pagination import clamp_limit, keyset_page, paginate_rows
+from services.wellness_batch import recompute_all_wellness
+from services.etag import combined_stamp, make_etag, latest_change, time_bucket, conditional_response
+from services.dashboard_stream import dashboard_stream
+from services.image_processing import image_processor
+from services.file_download import resolve_upload, download_response
+from services.token_revocation import token_revocations, revocation_id
+from services.stream_tickets import issue_stream_ticket, redeem_stream_ticket
+from services.password_hasher import password_hasher
+from services.export_service import iter_rows, iter_rows_in, stream_export, export_headers, export_media_type
+from middleware.admission import AdmissionController, AdmissionControlMiddleware
+from middleware.metrics import MetricsMiddleware
+from middleware.query_tracker import QueryTrackerMiddleware
+from services.metrics import registry
+from config.settings import settings
+from contextlib import asynccontextmanager
+from jose import jwt
+from datetime import date, timedelta
+import asyncio
+from typing import TYPE_CHECKING
 
-def get_supabase() -> Client:
-    """
-    Returns Supabase client for regular operations (respects RLS)
-    """
-    return supabase
+if TYPE_CHECKING:
+    from supabase import Client
 
-def get_supabase_admin() -> Client:
-    """
-    Returns Supabase admin client (bypasses RLS)
-    Use for system operations like activity logging
-    """
-    return supabase_admin
+router = APIRouter()
 
-
-# =====================================================
-# File: main.py
-# =====================================================
-
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from config.database import get_supabase, get_supabase_admin
-from supabase import Client
-import uvicorn
-
-app = FastAPI(title="Corporate Integrity Monitoring API")
-
-# CORS Configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:5173"],  # React dev servers
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Shared by every app instance (read by /admin/admission and the metrics gauges)
+admission_controller = AdmissionController(max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT)
 
 # Security
 security = HTTPBearer()
@@ -80,40 +47,73 @@ security = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """
     Validates JWT token and returns current user
     """
-    token = credentials.credentials
-    
+    return await authenticate_token(credentials.credentials, supabase)
+
+async def authenticate_token(token: str, supabase: "Client") -> dict:
+    """
+    Resolve an access token to the caller's profile
+    """
     try:
-        # Verify token with Supabase
-        user = supabase.auth.get_user(token)
-        
-        if not user:
+        # In-memory check before the auth round trip. The claims are not verified
+        # yet, but a revocation hit can only reject the token.
+        if token_revocations.is_revoked(revocation_id(jwt.get_unverified_claims(token))):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials"
+                detail="Token has been revoked"
             )
         
-        # Get user profile
-        profile = get_supabase_admin().table("profiles").select("*").eq("id", response.user.id).execute()
+        # Verify token with Supabase
+        user = await run_blocking(supabase.auth.get_user, token)
         
-        if not profile.data:
+        if not user:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User profile not found"
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials"
             )
         
-        return profile.data[0]
+        return await load_principal(user.user.id)
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Could not validate credentials: {str(e)}"
         )
 
+async def load_principal(user_id: str) -> dict:
+    """
+    The caller's profile (served from the principal cache when warm);
+    404 if it is missing, 403 if the account is inactive
+    """
+    async def load_profile():
+        profile = await db_execute(
+            get_supabase_admin().table("profiles").select("*").eq("id", user_id)
+        )
+        return profile.data[0] if profile.data else None
+    
+    profile = await principal_cache.get_or_load(user_id, load_profile)
+    
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User profile not found"
+        )
+    
+    # Deactivated accounts lose access as soon as their cached profile is invalidated
+    if not profile.get("is_active"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Account is inactive"
+        )
+    
+    return profile
+
 async def require_admin(current_user: dict = Depends(get_current_user)):
     """
     Ensures current user is an admin
@@ -125,6 +125,20 @@ async def require_admin(current_user: dict = Depends(get_current_user)):
         )
     return current_user
 
+async def require_admin_stream(ticket: str = Query(...)):
+    """
+    require_admin for EventSource clients, which cannot set headers: they
+    pass a single-use ?ticket= from POST /admin/stream/ticket, never the
+    access token, so no bearer token ends up in access or proxy logs
+    """
+    user_id = await redeem_stream_ticket(ticket, get_supabase_admin())
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired stream ticket"
+        )
+    return await require_admin(await load_principal(user_id))
+
 # =====================================================
 # Authentication Routes
 # =====================================================
@@ -140,20 +154,22 @@ class LoginResponse(BaseModel):
     token_type: str
     user: dict
 
-@app.post("/auth/login", response_model=LoginResponse)
-async def login(request: LoginRequest, supabase: Client = Depends(get_supabase)):
+@router.post("/auth/login", response_model=LoginResponse)
+async def login(request: LoginRequest):
     """
     Employee/Admin login endpoint
     """
     try:
         # Authenticate with Supabase
-        response = supabase.auth.sign_in_with_password({
+        response = await run_auth(get_auth_client().sign_in_with_password, {
             "email": request.email,
             "password": request.password
         })
         
         # Get user profile
-        profile = get_supabase_admin().table("profiles").select("*").eq("id", response.user.id).execute()
+        profile = await db_execute(
+            get_supabase_admin().table("profiles").select("*").eq("id", response.user.id)
+        )
         
         # Check if profile exists
         if not profile.data or len(profile.data) == 0:
@@ -164,10 +180,12 @@ async def login(request: LoginRequest, supabase: Client = Depends(get_supabase))
         
         # Log login activity
         supabase_admin = get_supabase_admin()
-        supabase_admin.table("activity_logs").insert({
+        login_event = {
             "employee_id": response.user.id,
             "activity_type": "login"
-        }).execute()
+        }
+        await db_execute(supabase_admin.table("activity_logs").insert(login_event))
+        activity_rollups.observe([login_event])
         
         return {
             "access_token": response.session.access_token,
@@ -183,24 +201,34 @@ async def login(request: LoginRequest, supabase: Client = Depends(get_supabase))
             detail=f"Login failed: {str(e)}"
         )
 
-@app.post("/auth/logout")
+@router.post("/auth/logout")
 async def logout(
-    current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: dict = Depends(get_current_user)
 ):
     """
-    Logout endpoint
+    Logout endpoint (revokes the presented token's session)
     """
     try:
-        # Log logout activity
+        # Revoke until the token would have expired; every worker rejects it
+        # from then on (see authenticate_token)
         supabase_admin = get_supabase_admin()
-        supabase_admin.table("activity_logs").insert({
+        claims = jwt.get_unverified_claims(credentials.credentials)
+        await token_revocations.revoke(revocation_id(claims), claims.get("exp", 0), current_user["id"], supabase_admin)
+        
+        # Log logout activity
+        logout_event = {
             "employee_id": current_user["id"],
             "activity_type": "logout"
-        }).execute()
+        }
+        await db_execute(supabase_admin.table("activity_logs").insert(logout_event))
+        activity_rollups.observe([logout_event])
         
-        # Sign out from Supabase
-        supabase.auth.sign_out()
+        # End the session in Supabase Auth as well, so its refresh token stops working
+        try:
+            await run_blocking(supabase_admin.auth.admin.sign_out, credentials.credentials)
+        except Exception as e:
+            print(f"Supabase sign-out error: {e}")
         
         return {"message": "Logged out successfully"}
     
@@ -222,11 +250,11 @@ class CreateEmployeeRequest(BaseModel):
     role: str = "employee"
     auto_generate_password: bool = True
 
-@app.post("/admin/employees")
+@router.post("/admin/employees")
 async def create_employee(
     request: CreateEmployeeRequest,
     current_user: dict = Depends(require_admin),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """
     Admin creates new employee account
@@ -237,7 +265,7 @@ async def create_employee(
         temp_password = secrets.token_urlsafe(12) if request.auto_generate_password else "TempPass123!"
         
         # Create auth user
-        auth_response = supabase.auth.admin.create_user({
+        auth_response = await run_auth(supabase.auth.admin.create_user, {
             "email": request.email,
             "password": temp_password,
             "email_confirm": True,
@@ -249,19 +277,20 @@ async def create_employee(
         })
         
         # Profile is auto-created via trigger, but we can update department
-        profile_update = supabase.table("profiles").update({
+        profile_update = await db_execute(supabase.table("profiles").update({
             "department_id": request.department_id
-        }).eq("id", auth_response.user.id).execute()
+        }).eq("id", auth_response.user.id))
+        principal_cache.invalidate(auth_response.user.id)
         
         # Log system activity
         supabase_admin = get_supabase_admin()
-        supabase_admin.table("system_logs").insert({
+        await db_execute(supabase_admin.table("system_logs").insert({
             "user_id": current_user["id"],
             "action": "employee_created",
             "entity_type": "profile",
             "entity_id": auth_response.user.id,
             "details": {"employee_id": request.employee_id}
-        }).execute()
+        }))
         
         # TODO: Send email with temporary password
         
@@ -271,36 +300,130 @@ async def create_employee(
             "temp_password": temp_password if request.auto_generate_password else None
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Failed to create employee: {str(e)}"
         )
 
-@app.get("/admin/employees")
+@router.get("/admin/employees")
 async def get_all_employees(
+    request: Request,
+    response: Response,
     department_id: str = None,
+    cursor: str = None,
+    limit: int = None,
     current_user: dict = Depends(require_admin),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """
-    Get all employees (with optional department filter)
+    Get employees, newest first (with optional department filter).
+    Paginated: pass the returned next_cursor to get the following page.
+    Supports If-None-Match: unchanged pages are answered with 304.
     """
     try:
-        query = supabase.table("profiles").select("*, departments(name, icon)")
+        limit = clamp_limit(limit)
         
-        if department_id:
-            query = query.eq("department_id", department_id)
+        def apply_filters(query):
+            if department_id:
+                query = query.eq("department_id", department_id)
+            return query
+        
+        stamps = await combined_stamp(supabase, "profiles", "departments")
+        if stamps:
+            etag = make_etag("employees", stamps, department_id, cursor, limit)
+            not_modified = conditional_response(request, response, etag, latest_change(stamps))
+            if not_modified:
+                return not_modified
         
-        result = query.execute()
-        return {"employees": result.data}
+        query = apply_filters(supabase.table("profiles").select("*, departments(name, icon)"))
+        
+        result = await db_execute(keyset_page(query, cursor, limit))
+        employees, pagination = paginate_rows(result.data, limit)
+        return {"employees": employees, "pagination": pagination}
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch employees: {str(e)}"
         )
 
+class UpdateEmployeeRequest(BaseModel):
+    full_name: str = None
+    employee_id: str = None
+    department_id: str = None
+    role: str = None
+    is_active: bool = None
+
+@router.patch("/admin/employees/{employee_id}")
+async def update_employee(
+    employee_id: str,
+    request: UpdateEmployeeRequest,
+    current_user: dict = Depends(require_admin),
+    supabase: "Client" = Depends(get_supabase)
+):
+    """
+    Admin updates an employee profile (including deactivation)
+    """
+    try:
+        updates = request.model_dump(exclude_none=True)
+        
+        if not updates:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No fields to update"
+            )
+        
+        result = await db_execute(
+            supabase.table("profiles").update(updates).eq("id", employee_id)
+        )
+        principal_cache.invalidate(employee_id)
+        
+        if not result.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Employee not found"
+            )
+        
+        # Log system activity
+        supabase_admin = get_supabase_admin()
+        await db_execute(supabase_admin.table("system_logs").insert({
+            "user_id": current_user["id"],
+            "action": "employee_deactivated" if updates.get("is_active") is False else "employee_updated",
+            "entity_type": "profile",
+            "entity_id": employee_id,
+            "details": updates
+        }))
+        dashboard_stream.publish("employee_updated", {"id": employee_id, "changes": sorted(updates)})
+        
+        return {"message": "Employee updated successfully", "employee": result.data[0]}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to update employee: {str(e)}"
+        )
+
+@router.get("/admin/admission")
+async def get_admission_stats(current_user: dict = Depends(require_admin)):
+    """
+    In-flight and shed request counts per priority class
+    """
+    return admission_controller.stats()
+
+@router.get("/admin/cache/principals")
+async def get_principal_cache_stats(current_user: dict = Depends(require_admin)):
+    """
+    Hit/miss counters for the get_current_user profile cache
+    """
+    return principal_cache.stats()
+
 # =====================================================
 # Report Routes
 # =====================================================
@@ -315,11 +438,11 @@ class CreateReportRequest(BaseModel):
     witness_information: str = None
     department_id: str = None
 
-@app.post("/reports")
+@router.post("/reports")
 async def create_report(
     request: CreateReportRequest,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """
     Employee submits a report
@@ -338,15 +461,30 @@ async def create_report(
         }
         
         # Insert report
-        result = supabase.table("reports").insert(report_data).execute()
+        result = await db_execute(supabase.table("reports").insert(report_data))
         report_id = result.data[0]["report_id"]
+        pattern_counter.record(
+            result.data[0]["department_id"],
+            result.data[0]["report_type"],
+            result.data[0].get("created_at")
+        )
         
-        # Check for auto-flagging (keyword detection)
-        await check_and_flag_report(result.data[0], supabase)
+        # Auto-flagging (keywords, patterns, documentation) runs in the background
+        flagging_status = await flagging_queue.enqueue(result.data[0])
+        dashboard_stream.publish("report_created", {
+            "id": result.data[0]["id"],
+            "report_id": report_id,
+            "department_id": result.data[0]["department_id"],
+            "report_type": result.data[0]["report_type"],
+            "severity": result.data[0].get("severity"),
+            "created_at": result.data[0].get("created_at")
+        })
         
         return {
             "message": "Report submitted successfully",
-            "report_id": report_id
+            "report_id": report_id,
+            "id": result.data[0]["id"],
+            "flagging_status": flagging_status
         }
     
     except Exception as e:
@@ -355,71 +493,110 @@ async def create_report(
             detail=f"Failed to submit report: {str(e)}"
         )
 
-async def check_and_flag_report(report: dict, supabase: Client):
-    """
-    Check if report should be auto-flagged based on keywords
-    """
-    try:
-        # Get active flagging rules
-        rules = supabase.table("flagging_rules").select("*").eq("is_active", True).execute()
-        
-        description_lower = report["description"].lower()
-        title_lower = report["title"].lower()
-        
-        for rule in rules.data:
-            keyword = rule["keyword"].lower()
-            if keyword in description_lower or keyword in title_lower:
-                # Flag the report
-                supabase.table("reports").update({
-                    "is_flagged": True,
-                    "flag_reason": f"Keyword detected: {rule['keyword']}",
-                    "severity": rule["severity_level"]  # Update severity if higher
-                }).eq("id", report["id"]).execute()
-                break
-    
-    except Exception as e:
-        print(f"Flagging check failed: {str(e)}")
-
-@app.get("/reports")
+@router.get("/reports")
 async def get_reports(
+    request: Request,
+    response: Response,
     department_id: str = None,
     status: str = None,
+    cursor: str = None,
+    limit: int = None,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """
-    Get reports (employees see own reports, admins see all)
+    Get reports (employees see own reports, admins see all).
+    The admin listing is paginated: pass the returned next_cursor to get
+    the following page. Supports If-None-Match: unchanged results are
+    answered with 304.
     """
     try:
-        if current_user["role"] == "admin":
-            # Admin sees all reports
-            query = supabase.table("reports").select("*, departments(name)")
-            
+        is_admin = current_user["role"] == "admin"
+        if is_admin:
+            limit = clamp_limit(limit)
+        
+        def apply_filters(query):
+            if not is_admin:
+                return query.eq("employee_id", current_user["id"])
             if department_id:
                 query = query.eq("department_id", department_id)
             if status:
                 query = query.eq("status", status)
-            
-            result = query.order("created_at", desc=True).execute()
+            return query
+        
+        stamps = await combined_stamp(supabase, "reports", "departments")
+        if stamps:
+            etag = make_etag("reports", stamps, current_user["id"], department_id, status, cursor, limit)
+            not_modified = conditional_response(request, response, etag, latest_change(stamps))
+            if not_modified:
+                return not_modified
+        
+        if is_admin:
+            # Admin sees all reports, one keyset page at a time
+            query = apply_filters(supabase.table("reports").select("*, departments(name)"))
+            result = await db_execute(keyset_page(query, cursor, limit))
+            reports, pagination = paginate_rows(result.data, limit)
+            return {"reports": reports, "pagination": pagination}
         else:
             # Employee sees only their reports
-            result = supabase.table("reports").select("*").eq(
+            result = await db_execute(supabase.table("reports").select("*").eq(
                 "employee_id", current_user["id"]
-            ).order("created_at", desc=True).execute()
+            ).order("created_at", desc=True))
         
         return {"reports": result.data}
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch reports: {str(e)}"
         )
 
+@router.get("/reports/{report_id}/flagging")
+async def get_report_flagging_status(
+    report_id: str,
+    current_user: dict = Depends(require_admin)
+):
+    """
+    Poll the background flagging status of a report (by report row id).
+    Served from report_flagging, so any worker can answer for any job.
+    """
+    result = await db_execute(
+        get_supabase_admin().table("report_flagging").select("*").eq("report_id", report_id)
+    )
+    
+    if not result.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No flagging job recorded for this report"
+        )
+    
+    return {"flagging": result.data[0], "queue": flagging_queue.stats()}
+
+@router.get("/admin/flagging/patterns")
+async def get_hot_report_patterns(
+    min_count: int = None,
+    current_user: dict = Depends(require_admin)
+):
+    """
+    Current (department, report type) pairs with repeated reports in the detection window.
+    Counted by this worker: other workers' reports appear after its next counter resync.
+    """
+    threshold = min_count if min_count is not None else settings.SIMILAR_REPORTS_THRESHOLD
+    
+    return {
+        "window_days": settings.PATTERN_DETECTION_DAYS,
+        "min_count": threshold,
+        "patterns": pattern_counter.hot_pairs(threshold),
+        "warmed_at": pattern_counter.warmed_at
+    }
+
 # =====================================================
 # Activity Tracking Routes
 # =====================================================
 
-@app.post("/activity/heartbeat")
+@router.post("/activity/heartbeat")
 async def activity_heartbeat(
     current_user: dict = Depends(get_current_user)
 ):
@@ -430,35 +607,250 @@ async def activity_heartbeat(
         if not current_user.get("activity_tracking_enabled"):
             return {"message": "Activity tracking disabled"}
         
-        supabase_admin = get_supabase_admin()
-        supabase_admin.table("activity_logs").insert({
-            "employee_id": current_user["id"],
-            "activity_type": "active",
-            "status": "active"
-        }).execute()
+        # Buffered and written in batches by the heartbeat flusher
+        await heartbeat_buffer.add(current_user["id"])
         
         return {"message": "Activity logged"}
     
+    except HeartbeatBufferFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Activity logging is temporarily backed up",
+            headers={"Retry-After": str(int(settings.HEARTBEAT_FLUSH_SECONDS))}
+        )
     except Exception as e:
         return {"message": f"Failed to log activity: {str(e)}"}
 
+@router.get("/activity/heartbeat/metrics")
+async def get_heartbeat_metrics(current_user: dict = Depends(require_admin)):
+    """
+    Buffer depth and flush latency of the heartbeat write-behind buffer
+    """
+    return heartbeat_buffer.metrics()
+
+# =====================================================
+# Wellness Routes (Admin Only)
+# =====================================================
+
+@router.post("/admin/wellness/recompute")
+async def recompute_wellness(
+    dry_run: bool = False,
+    current_user: dict = Depends(require_admin)
+):
+    """
+    Recompute wellness scores for every active employee in one batch run
+    """
+    try:
+        summary = await recompute_all_wellness(dry_run=dry_run)
+        
+        if not dry_run:
+            supabase_admin = get_supabase_admin()
+            await db_execute(supabase_admin.table("system_logs").insert({
+                "user_id": current_user["id"],
+                "action": "wellness_recomputed",
+                "entity_type": "wellness",
+                "details": {"employees": summary["employees"], "total_ms": summary["timings_ms"]["total"]}
+            }))
+            dashboard_stream.publish("wellness_recomputed", {
+                "employees": summary["employees"],
+                "departments": summary["departments"],
+                "average_score": summary["average_score"]
+            })
+        
+        return summary
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Wellness recompute failed: {str(e)}"
+        )
+
+# =====================================================
+# File Download Routes
+# =====================================================
+
+@router.api_route("/files/{area}/{file_path:path}", methods=["GET", "HEAD"])
+async def download_file(
+    area: str,
+    file_path: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Download a stored upload. Profile pictures are visible to any signed-in
+    user; report evidence only to admins. Supports Range (resumable
+    downloads, PDF viewers) and If-None-Match against the content hash.
+    """
+    if area == "reports" and current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    
+    path = await run_blocking(resolve_upload, area, file_path)
+    return download_response(request, path)
+
+# =====================================================
+# Export Routes (Admin Only)
+# =====================================================
+
+def _date_range_filter(query, column: str, start_date: date = None, end_date: date = None):
+    # end_date is inclusive: everything before the start of the following day
+    if start_date:
+        query = query.gte(column, start_date.isoformat())
+    if end_date:
+        query = query.lt(column, (end_date + timedelta(days=1)).isoformat())
+    return query
+
+@router.get("/admin/export/reports")
+async def export_reports(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    department_id: str = None,
+    status_filter: str = Query(None, alias="status"),
+    start_date: date = None,
+    end_date: date = None,
+    current_user: dict = Depends(require_admin),
+    supabase: "Client" = Depends(get_supabase)
+):
+    """
+    Stream every matching report as CSV or NDJSON (optionally gzipped).
+    Rows are read and written one page at a time, so memory stays flat
+    regardless of how many reports match.
+    """
+    def apply_filters(query):
+        if department_id:
+            query = query.eq("department_id", department_id)
+        if status_filter:
+            query = query.eq("status", status_filter)
+        return _date_range_filter(query, "created_at", start_date, end_date)
+    
+    pages = iter_rows(supabase, "reports", "*, departments(name)", "created_at", apply_filters)
+    return StreamingResponse(
+        stream_export(pages, format, compress=gzip),
+        media_type=export_media_type(format, gzip),
+        headers=export_headers("reports", format, gzip)
+    )
+
+@router.get("/admin/export/activity")
+async def export_activity(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    department_id: str = None,
+    employee_id: str = None,
+    activity_type: str = None,
+    start_date: date = None,
+    end_date: date = None,
+    current_user: dict = Depends(require_admin),
+    supabase: "Client" = Depends(get_supabase)
+):
+    """
+    Stream activity logs as CSV or NDJSON (optionally gzipped), one page
+    at a time. activity_logs has no department column, so a department
+    filter is resolved to its employees first and read in chunks of ids.
+    """
+    employee_ids = None
+    if department_id:
+        try:
+            members = await db_fetch_all(lambda: supabase.table("profiles").select("id").eq(
+                "department_id", department_id
+            ).order("id"))
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to resolve department: {str(e)}"
+            )
+        employee_ids = [member["id"] for member in members]
+    
+    def apply_filters(query):
+        if employee_id:
+            query = query.eq("employee_id", employee_id)
+        if activity_type:
+            query = query.eq("activity_type", activity_type)
+        return _date_range_filter(query, "timestamp", start_date, end_date)
+    
+    if employee_ids is None:
+        pages = iter_rows(supabase, "activity_logs", "*", "timestamp", apply_filters)
+    else:
+        pages = iter_rows_in(supabase, "activity_logs", "*", "timestamp", apply_filters, "employee_id", employee_ids)
+    return StreamingResponse(
+        stream_export(pages, format, compress=gzip),
+        media_type=export_media_type(format, gzip),
+        headers=export_headers("activity", format, gzip)
+    )
+
 # =====================================================
 # Dashboard Routes
 # =====================================================
 
-@app.get("/dashboard/metrics")
+@router.post("/admin/stream/ticket")
+async def create_dashboard_stream_ticket(current_user: dict = Depends(require_admin)):
+    """
+    Single-use ticket for opening /admin/stream?ticket=..., valid for
+    STREAM_TICKET_TTL_SECONDS
+    """
+    try:
+        return await issue_stream_ticket(current_user["id"], get_supabase_admin())
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to issue stream ticket: {str(e)}"
+        )
+
+@router.get("/admin/stream")
+async def admin_dashboard_stream(current_user: dict = Depends(require_admin_stream)):
+    """
+    Server-Sent Events feed for the admin dashboard: report_created,
+    report_flagged, employee_updated and wellness_recomputed events, plus
+    a "dashboard" event carrying the same payload as GET /dashboard/metrics
+    whenever it changes. Replaces polling /dashboard/metrics.
+    """
+    return StreamingResponse(
+        dashboard_stream.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/admin/stream/stats")
+async def get_dashboard_stream_stats(current_user: dict = Depends(require_admin)):
+    """
+    Subscriber and fan-out counters for the admin stream
+    """
+    return dashboard_stream.stats()
+
+@router.get("/dashboard/metrics")
 async def get_dashboard_metrics(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """
-    Get dashboard metrics for current user
+    Get dashboard metrics for current user.
+    Supports If-None-Match: the ETag is built from the change counters of
+    the underlying tables, so an unchanged dashboard is answered with 304
+    without querying the metric views. Time-derived figures (activity)
+    are covered by rolling the ETag every CONDITIONAL_GET_MAX_AGE_SECONDS.
     """
     try:
+        if current_user["role"] == "admin":
+            stamps = await combined_stamp(supabase, "reports", "profiles", "departments", "wellness_scores")
+        else:
+            stamps = await combined_stamp(supabase, "tasks", "wellness_scores")
+        if stamps:
+            etag = make_etag(
+                "dashboard", stamps, current_user["id"], time_bucket(settings.CONDITIONAL_GET_MAX_AGE_SECONDS)
+            )
+            not_modified = conditional_response(request, response, etag, latest_change(stamps))
+            if not_modified:
+                return not_modified
+        
         if current_user["role"] == "admin":
             # Admin dashboard metrics
-            metrics = supabase.table("admin_dashboard_metrics").select("*").execute()
-            departments = supabase.table("department_health").select("*").execute()
+            metrics, departments = await asyncio.gather(
+                db_execute(supabase.table("admin_dashboard_metrics").select("*")),
+                db_execute(supabase.table("department_health").select("*"))
+            )
             
             return {
                 "metrics": metrics.data[0] if metrics.data else {},
@@ -467,26 +859,22 @@ async def get_dashboard_metrics(
         else:
             # Employee dashboard metrics
             # Get tasks
-            tasks = supabase.table("tasks").select("*").eq(
+            tasks = await db_execute(supabase.table("tasks").select("*").eq(
                 "employee_id", current_user["id"]
-            ).execute()
+            ))
             
             # Get wellness score
-            wellness = supabase.table("wellness_scores").select("*").eq(
+            wellness = await db_execute(supabase.table("wellness_scores").select("*").eq(
                 "employee_id", current_user["id"]
-            ).order("calculated_at", desc=True).limit(1).execute()
+            ).order("calculated_at", desc=True).limit(1))
             
-            # Get today's activity
-            from datetime import datetime, timedelta
-            today = datetime.now().date()
-            activity = supabase.table("activity_logs").select("*").eq(
-                "employee_id", current_user["id"]
-            ).gte("timestamp", today.isoformat()).execute()
+            # Get today's activity (from the daily rollup, not raw logs)
+            activity = await activity_rollups.get_totals(current_user["id"], utc_today(), supabase)
             
             return {
                 "tasks": tasks.data,
                 "wellness_score": wellness.data[0] if wellness.data else None,
-                "activity_today": len(activity.data)
+                "activity_today": activity["total_events"]
             }
     
     except Exception as e:
@@ -495,17 +883,149 @@ async def get_dashboard_metrics(
             detail=f"Failed to fetch metrics: {str(e)}"
         )
 
+# =====================================================
+# Application Lifecycle
+# =====================================================
+
+background_tasks = []
+
+async def startup_event():
+    # Shared database clients are built off the event loop, before the first request
+    await run_blocking(warm_clients)
+    
+    # Warm pattern counters before the flagging workers start consuming
+    try:
+        await pattern_counter.warm(get_supabase_admin())
+    except Exception as e:
+        print(f"Pattern counter warm-up failed, falling back to database counts: {e}")
+    background_tasks.append(asyncio.create_task(
+        pattern_counter.run_resync(get_supabase_admin, settings.PATTERN_COUNTER_RESYNC_MINUTES)
+    ))
+    
+    await flagging_queue.start()
+    await token_revocations.start(get_supabase_admin)
+    heartbeat_buffer.start()
+    activity_rollups.start()
+    dashboard_stream.start()
+
+async def shutdown_event():
+    # Heartbeats first, so their rollup deltas are included in the final rollup flush
+    await heartbeat_buffer.stop()
+    await activity_rollups.stop()
+    await flagging_queue.stop()
+    await dashboard_stream.stop()
+    await token_revocations.stop()
+    image_processor.shutdown()
+    password_hasher.shutdown()
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    shutdown_db_executor()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_event()
+
+# =====================================================
+# Metrics (Prometheus)
+# =====================================================
+
+registry.gauge_callback(
+    "behappy_heartbeat_buffer", "Heartbeat write-behind buffer state", ("field",),
+    lambda: [((field,), value) for field, value in heartbeat_buffer.metrics().items()]
+)
+registry.gauge_callback(
+    "behappy_flagging_queue", "Report flagging queue state", ("field",),
+    lambda: [((field,), value) for field, value in flagging_queue.stats().items()]
+)
+registry.gauge_callback(
+    "behappy_principal_cache", "Principal cache counters", ("field",),
+    lambda: [((field,), value) for field, value in principal_cache.stats().items()]
+)
+registry.gauge_callback(
+    "behappy_dashboard_stream", "Admin SSE fan-out counters", ("field",),
+    lambda: [((field,), value) for field, value in dashboard_stream.stats().items()]
+)
+registry.gauge_callback(
+    "behappy_password_hashing", "Password hashing pool state", ("field",),
+    lambda: [((field,), value) for field, value in password_hasher.stats().items()]
+)
+registry.gauge_callback(
+    "behappy_token_revocations", "Token revocation filter counters", ("field",),
+    lambda: [((field,), value) for field, value in token_revocations.stats().items()]
+)
+registry.gauge_callback(
+    "behappy_admission_in_flight", "Requests in flight per priority class", ("priority",),
+    lambda: [((name,), cls["in_flight"]) for name, cls in admission_controller.stats()["classes"].items()]
+)
+registry.gauge_callback(
+    "behappy_admission_shed", "Requests shed (429) per priority class since start", ("priority",),
+    lambda: [((name,), cls["shed"]) for name, cls in admission_controller.stats()["classes"].items()]
+)
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Prometheus scrape endpoint (text exposition format). Restrict access at
+    the proxy / network level; it carries no user data.
+    """
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
+
 # =====================================================
 # Health Check
 # =====================================================
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "Corporate Integrity Monitoring API"}
 
+# =====================================================
+# Application Factory
+# =====================================================
+
+def create_app() -> FastAPI:
+    """
+    Build the API. Importing this module opens no database clients, pools
+    or worker processes: the shared clients and background services start
+    in the lifespan hook, process pools on first use.
+    """
+    app = FastAPI(title="Corporate Integrity Monitoring API", lifespan=lifespan)
+    
+    # Admission control (added before CORS so 429s still carry CORS headers)
+    app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+    
+    # Request latency histograms (outside admission control, so shed requests are counted too)
+    app.add_middleware(MetricsMiddleware)
+    
+    # Per-request query counts and N+1 warnings
+    app.add_middleware(
+        QueryTrackerMiddleware,
+        debug_headers=settings.QUERY_DEBUG_HEADERS,
+        repeat_threshold=settings.QUERY_REPEAT_WARN_THRESHOLD
+    )
+    
+    # CORS Configuration
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000", "http://localhost:5173"],  # React dev servers
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    app.include_router(router)
+    return app
+
+app = create_app()
+
 # =====================================================
 # Run Server
 # =====================================================
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    import uvicorn
+    uvicorn.run("main:create_app", factory=True, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
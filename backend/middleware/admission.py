@@ -0,0 +1,175 @@
+import asyncio
+import json
+import re
+import time
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Dict, List, Optional, Tuple
+
+# Highest first. share: fraction of max_in_flight the class may use, so as
+# load rises the lower classes hit their ceiling (and are shed) first.
+PRIORITY_CLASSES = {
+    "critical": {"share": 1.0, "retry_after": 1, "wait_seconds": 2.0},
+    "high": {"share": 0.9, "retry_after": 1, "wait_seconds": 0.0},
+    "normal": {"share": 0.75, "retry_after": 2, "wait_seconds": 0.0},
+    "low": {"share": 0.5, "retry_after": 5, "wait_seconds": 0.0}
+}
+
+# (method or "*", path regex, class); first match wins, default is "normal"
+DEFAULT_ROUTE_PRIORITIES: List[Tuple[str, str, str]] = [
+    ("POST", r"^/reports$", "critical"),
+    ("*", r"^/reports/", "critical"),
+    ("*", r"^/admin/export/", "low"),
+    ("*", r"^/admin/", "critical"),
+    ("GET", r"^/reports$", "high"),
+    ("*", r"^/auth/", "high"),
+    ("POST", r"^/activity/heartbeat$", "low"),
+]
+
+# Never counted: health checks, scrapes (needed most when overloaded) and
+# long-lived streams, which would pin slots forever
+DEFAULT_EXEMPT_PATHS = (r"^/health$", r"^/metrics$", r"^/admin/stream$")
+
+class AdmissionController:
+    """
+    In-flight request accounting per priority class. A request is admitted
+    when the total in flight is below its class's share of max_in_flight;
+    critical requests may wait briefly for a slot instead of being
+    rejected outright.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._by_class: Dict[str, int] = {name: 0 for name in PRIORITY_CLASSES}
+        self._released: Optional[asyncio.Condition] = None
+        self._waiting = 0
+
+        # Metrics
+        self.admitted: Dict[str, int] = {name: 0 for name in PRIORITY_CLASSES}
+        self.shed: Dict[str, int] = {name: 0 for name in PRIORITY_CLASSES}
+
+    def _limit(self, priority: str) -> int:
+        return max(1, int(self.max_in_flight * PRIORITY_CLASSES[priority]["share"]))
+
+    def _try_acquire(self, priority: str, waiting: bool = False) -> bool:
+        if self.in_flight >= self._limit(priority):
+            return False
+        # Freed slots go to queued critical requests before anything new
+        if self._waiting and not waiting:
+            return False
+        self.in_flight += 1
+        self._by_class[priority] += 1
+        self.admitted[priority] += 1
+        return True
+
+    async def acquire(self, priority: str) -> bool:
+        if self._try_acquire(priority):
+            return True
+
+        wait_seconds = PRIORITY_CLASSES[priority]["wait_seconds"]
+        if wait_seconds > 0:
+            if self._released is None:
+                self._released = asyncio.Condition()
+            deadline = time.monotonic() + wait_seconds
+            self._waiting += 1
+            try:
+                async with self._released:
+                    while (remaining := deadline - time.monotonic()) > 0:
+                        try:
+                            await asyncio.wait_for(self._released.wait(), timeout=remaining)
+                        except asyncio.TimeoutError:
+                            break
+                        if self._try_acquire(priority, waiting=True):
+                            return True
+            finally:
+                self._waiting -= 1
+
+        self.shed[priority] += 1
+        return False
+
+    async def release(self, priority: str):
+        self.in_flight -= 1
+        self._by_class[priority] -= 1
+        if self._released is not None:
+            async with self._released:
+                self._released.notify()
+
+    def stats(self) -> Dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "waiting": self._waiting,
+            "classes": {
+                name: {
+                    "limit": self._limit(name),
+                    "in_flight": self._by_class[name],
+                    "admitted": self.admitted[name],
+                    "shed": self.shed[name]
+                }
+                for name in PRIORITY_CLASSES
+            }
+        }
+
+class AdmissionControlMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware, so streaming responses are
+    untouched) that classifies each request by route and sheds the lowest
+    classes first with 429 + Retry-After once the worker is saturated.
+    Slots are held until the response has been fully sent.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController,
+        route_priorities: List[Tuple[str, str, str]] = None,
+        exempt_paths: Tuple[str, ...] = DEFAULT_EXEMPT_PATHS
+    ):
+        self.app = app
+        self.controller = controller
+        self.route_priorities = [
+            (method, re.compile(pattern), priority)
+            for method, pattern, priority in (route_priorities or DEFAULT_ROUTE_PRIORITIES)
+        ]
+        self.exempt_paths = [re.compile(pattern) for pattern in exempt_paths]
+
+    def classify(self, method: str, path: str) -> Optional[str]:
+        """Priority class for a request, or None if it bypasses admission control"""
+        if method == "OPTIONS" or any(pattern.match(path) for pattern in self.exempt_paths):
+            return None
+        for rule_method, pattern, priority in self.route_priorities:
+            if rule_method in ("*", method) and pattern.match(path):
+                return priority
+        return "normal"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        priority = self.classify(scope["method"], scope["path"])
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire(priority):
+            await self._reject(send, priority)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await self.controller.release(priority)
+
+    async def _reject(self, send: Send, priority: str):
+        body = json.dumps({"detail": "Server is busy, please retry shortly", "priority": priority}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(PRIORITY_CLASSES[priority]["retry_after"]).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
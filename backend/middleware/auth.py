@@ -1,14 +1,19 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import Client
-from config.database import get_supabase
+from config.database import get_supabase, db_execute
 from services.auth_service import AuthService
+from services.principal_cache import principal_cache
+from services.token_revocation import token_revocations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 security = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """
     Validates JWT token and returns current user profile
@@ -26,6 +31,14 @@ async def get_current_user(
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        # In-memory check, no database round trip
+        if token_revocations.is_revoked(payload.get("jti")):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
         user_id = payload.get("user_id")
         if not user_id:
             raise HTTPException(
@@ -33,17 +46,21 @@ async def get_current_user(
                 detail="Invalid token payload"
             )
         
-        # Get user profile
-        profile = supabase.table("profiles").select("*").eq("id", user_id).execute()
+        # Get user profile (served from the principal cache when warm)
+        async def load_profile():
+            profile = await db_execute(
+                supabase.table("profiles").select("*").eq("id", user_id)
+            )
+            return profile.data[0] if profile.data else None
+        
+        user = await principal_cache.get_or_load(user_id, load_profile)
         
-        if not profile.data:
+        if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User profile not found"
             )
         
-        user = profile.data[0]
-        
         # Check if user is active
         if not user.get("is_active"):
             raise HTTPException(
@@ -74,7 +91,7 @@ async def require_admin(current_user: dict = Depends(get_current_user)):
 
 async def get_current_user_optional(
     credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer(auto_error=False)),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """
     Optional authentication - returns None if not authenticated
@@ -0,0 +1,52 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from services.metrics import REQUEST_LATENCY, Histogram
+from typing import Dict
+
+class MetricsMiddleware:
+    """
+    Records request latency per (method, route template, status). The
+    route template comes from the endpoint the router resolved, so
+    /reports/123/flagging and /reports/456/flagging share one series and
+    unmatched paths (404 probes) collapse into "unmatched".
+    """
+
+    def __init__(self, app: ASGIApp, histogram: Histogram = REQUEST_LATENCY):
+        self.app = app
+        self.histogram = histogram
+        self._templates: Dict = {}
+
+    def _template(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._templates.get(endpoint)
+        if template is None:
+            # Built once per endpoint from the application's route table
+            for route in getattr(scope.get("app"), "routes", []):
+                if getattr(route, "endpoint", None) is endpoint:
+                    template = route.path
+                    break
+            else:
+                template = "unmatched"
+            self._templates[endpoint] = template
+        return template
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.histogram.observe(time.perf_counter() - started, scope["method"], self._template(scope), status_code)
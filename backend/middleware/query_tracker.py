@@ -0,0 +1,40 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from services.query_tracker import track_queries, format_shape
+
+class QueryTrackerMiddleware:
+    """
+    Counts and times the data-layer calls behind each request. With
+    debug_headers the totals go out as X-DB-Queries / X-DB-Time (ms, as of
+    the response start, so streamed bodies report their first page only).
+    Any table/filter shape repeated more than repeat_threshold times in one
+    request is logged as a likely N+1 (the pages or chunks of one bulk
+    operation count once).
+    """
+
+    def __init__(self, app: ASGIApp, debug_headers: bool = False, repeat_threshold: int = 5):
+        self.app = app
+        self.debug_headers = debug_headers
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as tracker:
+            async def send_wrapper(message: Message):
+                if self.debug_headers and message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-db-queries", str(tracker.count).encode()),
+                        (b"x-db-time", f"{tracker.seconds * 1000:.2f}".encode())
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                for shape, n in tracker.repeated(self.repeat_threshold):
+                    print(
+                        f"Possible N+1: {scope['method']} {scope['path']} ran "
+                        f"{format_shape(shape)} {n} times ({tracker.count} queries total)"
+                    )
@@ -0,0 +1,58 @@
+-- =====================================================
+-- Per-employee daily activity rollups
+-- =====================================================
+-- Maintained by services/activity_rollup.py as heartbeats are written.
+-- Rebuild from activity_logs with:
+--   python -m services.activity_rollup backfill --days 90
+-- Deltas a worker had not flushed when it stopped are lost; schedule
+--   python -m services.activity_rollup reconcile
+-- daily, shortly after midnight UTC, to rewrite the last closed days.
+
+create table if not exists activity_daily_rollups (
+    employee_id uuid not null references profiles(id) on delete cascade,
+    day date not null,
+    active_slots integer not null default 0,
+    login_count integer not null default 0,
+    logout_count integer not null default 0,
+    total_events integer not null default 0,
+    first_seen timestamptz,
+    last_seen timestamptz,
+    updated_at timestamptz not null default now(),
+    primary key (employee_id, day)
+);
+
+create index if not exists activity_daily_rollups_day_idx
+    on activity_daily_rollups (day);
+
+-- Adds deltas from each API worker atomically, so concurrent workers never
+-- overwrite each other's counts.
+create or replace function bump_activity_rollups(deltas jsonb)
+returns void
+language sql
+as $$
+    insert into activity_daily_rollups as r (
+        employee_id, day, active_slots, login_count, logout_count,
+        total_events, first_seen, last_seen, updated_at
+    )
+    select
+        d.employee_id, d.day, d.active_slots, d.login_count, d.logout_count,
+        d.total_events, d.first_seen, d.last_seen, now()
+    from jsonb_to_recordset(deltas) as d(
+        employee_id uuid,
+        day date,
+        active_slots integer,
+        login_count integer,
+        logout_count integer,
+        total_events integer,
+        first_seen timestamptz,
+        last_seen timestamptz
+    )
+    on conflict (employee_id, day) do update set
+        active_slots = r.active_slots + excluded.active_slots,
+        login_count = r.login_count + excluded.login_count,
+        logout_count = r.logout_count + excluded.logout_count,
+        total_events = r.total_events + excluded.total_events,
+        first_seen = least(r.first_seen, excluded.first_seen),
+        last_seen = greatest(r.last_seen, excluded.last_seen),
+        updated_at = now();
+$$;
@@ -0,0 +1,16 @@
+-- =====================================================
+-- Latest wellness score per employee
+-- =====================================================
+-- Lets department wellness read every employee's latest score with one
+-- query (employee_id=in.(...)) instead of one query per employee.
+
+create index if not exists wellness_scores_employee_calculated_idx
+    on wellness_scores (employee_id, calculated_at desc);
+
+create or replace view latest_wellness_scores as
+select distinct on (employee_id)
+    employee_id,
+    score,
+    calculated_at
+from wellness_scores
+order by employee_id, calculated_at desc;
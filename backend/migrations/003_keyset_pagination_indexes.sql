@@ -0,0 +1,18 @@
+-- =====================================================
+-- Keyset pagination indexes
+-- =====================================================
+-- GET /reports (admin) and GET /admin/employees page on
+-- (created_at desc, id desc); these indexes let each page start at the
+-- cursor row instead of scanning and skipping an offset.
+
+create index if not exists reports_created_at_id_idx
+    on reports (created_at desc, id desc);
+
+create index if not exists reports_department_created_at_id_idx
+    on reports (department_id, created_at desc, id desc);
+
+create index if not exists profiles_created_at_id_idx
+    on profiles (created_at desc, id desc);
+
+create index if not exists profiles_department_created_at_id_idx
+    on profiles (department_id, created_at desc, id desc);
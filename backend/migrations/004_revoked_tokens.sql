@@ -0,0 +1,20 @@
+-- =====================================================
+-- Revoked access tokens
+-- =====================================================
+-- Written on logout; every API worker loads the unexpired rows into an
+-- in-memory Bloom filter at startup and polls for new ones by revoked_at
+-- (see services/token_revocation.py). Rows past expires_at are useless
+-- and can be deleted by a scheduled job.
+
+create table if not exists revoked_tokens (
+    jti text primary key,
+    user_id uuid references profiles(id) on delete cascade,
+    expires_at timestamptz not null,
+    revoked_at timestamptz not null default now()
+);
+
+create index if not exists revoked_tokens_revoked_at_idx
+    on revoked_tokens (revoked_at);
+
+create index if not exists revoked_tokens_expires_at_idx
+    on revoked_tokens (expires_at);
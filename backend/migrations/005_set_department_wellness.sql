@@ -0,0 +1,24 @@
+-- =====================================================
+-- Department wellness write-back
+-- =====================================================
+-- The organisation-wide recompute (services/wellness_service.py,
+-- calculate_all_departments_wellness) writes every department's
+-- wellness_score and total_employees in one call. Only those two columns
+-- (and updated_at) are touched, so edits to name/icon/description made
+-- while a recompute runs are kept.
+
+create or replace function set_department_wellness(summaries jsonb)
+returns void
+language sql
+as $$
+    update departments as d set
+        wellness_score = s.wellness_score,
+        total_employees = s.total_employees,
+        updated_at = now()
+    from jsonb_to_recordset(summaries) as s(
+        id uuid,
+        wellness_score numeric,
+        total_employees integer
+    )
+    where d.id = s.id;
+$$;
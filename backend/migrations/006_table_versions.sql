@@ -0,0 +1,66 @@
+-- =====================================================
+-- Table change counters and updated_at maintenance
+-- =====================================================
+-- services/etag.py builds ETags for GET /dashboard/metrics, /reports and
+-- /admin/employees from a per-table change counter, read in one indexed
+-- lookup instead of counting rows. A statement-level trigger bumps the
+-- counter on every insert, update or delete; each write holds the
+-- counter row's lock only until it commits.
+--
+-- The row trigger below keeps updated_at current for updates that do not
+-- set it (e.g. flagging, profile edits).
+
+create table if not exists table_versions (
+    table_name text primary key,
+    version bigint not null default 0,
+    changed_at timestamptz not null default now()
+);
+
+create or replace function bump_table_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into table_versions as v (table_name, version, changed_at)
+    values (tg_table_name, 1, now())
+    on conflict (table_name) do update set
+        version = v.version + 1,
+        changed_at = now();
+    return null;
+end;
+$$;
+
+create or replace function set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['departments', 'profiles', 'reports', 'tasks', 'wellness_scores'] loop
+        execute format('drop trigger if exists %I on %I', t || '_bump_version', t);
+        execute format(
+            'create trigger %I after insert or update or delete on %I
+             for each statement execute function bump_table_version()',
+            t || '_bump_version', t
+        );
+        insert into table_versions (table_name) values (t) on conflict do nothing;
+    end loop;
+
+    foreach t in array array['departments', 'profiles', 'reports', 'tasks'] loop
+        execute format('drop trigger if exists %I on %I', t || '_set_updated_at', t);
+        execute format(
+            'create trigger %I before update on %I
+             for each row execute function set_updated_at()',
+            t || '_set_updated_at', t
+        );
+    end loop;
+end;
+$$;
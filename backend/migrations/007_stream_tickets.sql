@@ -0,0 +1,19 @@
+-- =====================================================
+-- Admin stream tickets
+-- =====================================================
+-- EventSource cannot set an Authorization header, so GET /admin/stream
+-- takes a short-lived ticket from POST /admin/stream/ticket instead of
+-- the access token (see services/stream_tickets.py). Redeeming deletes
+-- the row, which makes each ticket single-use across workers. Only the
+-- SHA-256 of the ticket is stored. Expired rows that were never used can
+-- be deleted by a scheduled job.
+
+create table if not exists stream_tickets (
+    ticket_hash text primary key,
+    user_id uuid not null references profiles(id) on delete cascade,
+    expires_at timestamptz not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists stream_tickets_expires_at_idx
+    on stream_tickets (expires_at);
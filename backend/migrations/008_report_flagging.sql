@@ -0,0 +1,40 @@
+-- =====================================================
+-- Background flagging status
+-- =====================================================
+-- POST /reports hands the flagging checks to the in-process queue of
+-- whichever worker took the request (services/flagging_queue.py), but
+-- GET /reports/{id}/flagging can land on any worker, or on one started
+-- after a restart. The queue records each job's status here instead of in
+-- memory. The 'queued' row is written by a trigger in the same statement
+-- as the report, so submitting a report costs no extra round trip.
+
+create table if not exists report_flagging (
+    report_id uuid primary key references reports(id) on delete cascade,
+    status text not null default 'queued',
+    attempts int not null default 0,
+    error text,
+    result jsonb,
+    updated_at timestamptz not null default now()
+);
+
+create or replace function queue_report_flagging()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into report_flagging (report_id) values (new.id)
+    on conflict (report_id) do nothing;
+    return null;
+end;
+$$;
+
+drop trigger if exists reports_queue_flagging on reports;
+create trigger reports_queue_flagging
+    after insert on reports
+    for each row execute function queue_report_flagging();
+
+-- set_updated_at() is from migrations/006
+drop trigger if exists report_flagging_set_updated_at on report_flagging;
+create trigger report_flagging_set_updated_at
+    before update on report_flagging
+    for each row execute function set_updated_at();
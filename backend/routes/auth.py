@@ -1,22 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client
-from config.database import get_supabase, get_supabase_admin
+from config.database import get_supabase, get_supabase_admin, get_auth_client, db_execute, run_auth
 from models.auth import LoginRequest, LoginResponse, PasswordChangeRequest
 from services.auth_service import AuthService
-from middleware.auth import get_current_user
+from middleware.auth import get_current_user, security
+from fastapi.security import HTTPAuthorizationCredentials
+from services.principal_cache import principal_cache
+from services.activity_rollup import activity_rollups
+from services.token_revocation import token_revocations
 from datetime import timedelta
 from config.settings import settings
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/login", response_model=LoginResponse)
-async def login(request: LoginRequest, supabase: Client = Depends(get_supabase)):
+async def login(request: LoginRequest):
     """
     Employee/Admin login endpoint
     """
     try:
         # Authenticate with Supabase
-        response = supabase.auth.sign_in_with_password({
+        response = await run_auth(get_auth_client().sign_in_with_password, {
             "email": request.email,
             "password": request.password
         })
@@ -28,7 +35,9 @@ async def login(request: LoginRequest, supabase: Client = Depends(get_supabase))
             )
         
         # Get user profile
-        profile = supabase.table("profiles").select("*").eq("id", response.user.id).execute()
+        profile = await db_execute(
+            get_supabase_admin().table("profiles").select("*").eq("id", response.user.id)
+        )
         
         if not profile.data:
             raise HTTPException(
@@ -59,19 +68,21 @@ async def login(request: LoginRequest, supabase: Client = Depends(get_supabase))
         
         # Log login activity
         supabase_admin = get_supabase_admin()
-        supabase_admin.table("activity_logs").insert({
+        login_event = {
             "employee_id": str(response.user.id),
             "activity_type": "login",
             "status": "active"
-        }).execute()
+        }
+        await db_execute(supabase_admin.table("activity_logs").insert(login_event))
+        activity_rollups.observe([login_event])
         
         # Log system activity
-        supabase_admin.table("system_logs").insert({
+        await db_execute(supabase_admin.table("system_logs").insert({
             "user_id": str(response.user.id),
             "action": "login",
             "entity_type": "auth",
             "details": {"email": request.email}
-        }).execute()
+        }))
         
         return {
             "access_token": access_token,
@@ -89,30 +100,34 @@ async def login(request: LoginRequest, supabase: Client = Depends(get_supabase))
 
 @router.post("/logout")
 async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
     current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """
-    Logout endpoint
+    Logout endpoint (revokes the presented token)
     """
     try:
-        # Log logout activity
+        # Revoke this token until it would have expired
+        payload = AuthService.decode_access_token(credentials.credentials) or {}
         supabase_admin = get_supabase_admin()
-        supabase_admin.table("activity_logs").insert({
+        await token_revocations.revoke(payload.get("jti"), payload.get("exp", 0), current_user["id"], supabase_admin)
+        
+        # Log logout activity
+        logout_event = {
             "employee_id": current_user["id"],
             "activity_type": "logout",
             "status": "inactive"
-        }).execute()
+        }
+        await db_execute(supabase_admin.table("activity_logs").insert(logout_event))
+        activity_rollups.observe([logout_event])
         
         # Log system activity
-        supabase_admin.table("system_logs").insert({
+        await db_execute(supabase_admin.table("system_logs").insert({
             "user_id": current_user["id"],
             "action": "logout",
             "entity_type": "auth"
-        }).execute()
-        
-        # Note: Supabase auth.sign_out() requires the session token
-        # For JWT-based auth, we rely on client-side token deletion
+        }))
         
         return {"message": "Logged out successfully"}
     
@@ -125,15 +140,15 @@ async def logout(
 @router.post("/change-password")
 async def change_password(
     request: PasswordChangeRequest,
-    current_user: dict = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase)
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Change password for authenticated user
     """
     try:
-        # Verify current password
-        auth_response = supabase.auth.sign_in_with_password({
+        # Verify current password (the signed-in session is what update_user changes)
+        auth = get_auth_client()
+        auth_response = await run_auth(auth.sign_in_with_password, {
             "email": current_user["email"],
             "password": request.current_password
         })
@@ -145,22 +160,23 @@ async def change_password(
             )
         
         # Update password
-        supabase.auth.update_user({
+        await run_auth(auth.update_user, {
             "password": request.new_password
         })
         
         # Update requires_password_change flag
-        supabase.table("profiles").update({
+        supabase_admin = get_supabase_admin()
+        await db_execute(supabase_admin.table("profiles").update({
             "requires_password_change": False
-        }).eq("id", current_user["id"]).execute()
+        }).eq("id", current_user["id"]))
+        principal_cache.invalidate(current_user["id"])
         
         # Log activity
-        supabase_admin = get_supabase_admin()
-        supabase_admin.table("system_logs").insert({
+        await db_execute(supabase_admin.table("system_logs").insert({
             "user_id": current_user["id"],
             "action": "password_changed",
             "entity_type": "auth"
-        }).execute()
+        }))
         
         return {"message": "Password changed successfully"}
     
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from config.settings import settings
+from config.database import get_supabase_admin, db_execute
+from services.time_utils import parse_timestamp, utc_today
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Tuple
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+ROLLUP_TABLE = "activity_daily_rollups"
+COUNTER_FIELDS = ("active_slots", "login_count", "logout_count", "total_events")
+ACTIVITY_TYPE_FIELDS = {"active": "active_slots", "login": "login_count", "logout": "logout_count"}
+
+def _empty_rollup() -> Dict:
+    return {
+        "active_slots": 0,
+        "login_count": 0,
+        "logout_count": 0,
+        "total_events": 0,
+        "first_seen": None,
+        "last_seen": None
+    }
+
+def _add_event(rollup: Dict, activity_type: str, seen_at: datetime):
+    field = ACTIVITY_TYPE_FIELDS.get(activity_type)
+    if field:
+        rollup[field] += 1
+    rollup["total_events"] += 1
+
+    if rollup["first_seen"] is None or seen_at < rollup["first_seen"]:
+        rollup["first_seen"] = seen_at
+    if rollup["last_seen"] is None or seen_at > rollup["last_seen"]:
+        rollup["last_seen"] = seen_at
+
+def _to_row(employee_id: str, day: date, rollup: Dict) -> Dict:
+    return {
+        "employee_id": employee_id,
+        "day": day.isoformat(),
+        **{field: rollup[field] for field in COUNTER_FIELDS},
+        "first_seen": rollup["first_seen"].isoformat() if rollup["first_seen"] else None,
+        "last_seen": rollup["last_seen"].isoformat() if rollup["last_seen"] else None
+    }
+
+class ActivityRollupAggregator:
+    """
+    Streaming per-employee, per-day activity counters. Events are folded
+    into in-memory deltas as activity_logs rows are written, and the deltas
+    are periodically added to activity_daily_rollups through the
+    bump_activity_rollups() function (see migrations/001). Readers get the
+    stored rollup plus whatever this worker has not flushed yet.
+
+    Deltas a worker had not flushed when it died are lost, so stored rollups
+    can fall behind activity_logs. Running `reconcile` daily (see
+    reconcile_rollups) rewrites recent closed days from the logs.
+    """
+
+    def __init__(self, flush_interval_seconds: float):
+        self.flush_interval_seconds = flush_interval_seconds
+        self._deltas: Dict[Tuple[str, date], Dict] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def observe(self, events: Iterable[dict]):
+        """Fold activity_logs rows (employee_id, activity_type, timestamp) into the deltas"""
+        for event in events:
+            seen_at = parse_timestamp(event["timestamp"]) if event.get("timestamp") else datetime.now(timezone.utc)
+            key = (str(event["employee_id"]), seen_at.date())
+            rollup = self._deltas.get(key)
+            if rollup is None:
+                rollup = self._deltas[key] = _empty_rollup()
+            _add_event(rollup, event.get("activity_type"), seen_at)
+
+    async def flush(self):
+        """Add the pending deltas to the rollup table"""
+        async with self._flush_lock:
+            if not self._deltas:
+                return
+
+            deltas, self._deltas = self._deltas, {}
+            rows = [_to_row(employee_id, day, rollup) for (employee_id, day), rollup in deltas.items()]
+
+            try:
+                await db_execute(get_supabase_admin().rpc("bump_activity_rollups", {"deltas": rows}))
+            except Exception as e:
+                # Merge back so the counts are retried on the next flush
+                for key, rollup in deltas.items():
+                    self._merge(key, rollup)
+                print(f"Activity rollup flush error: {e}")
+
+    def _merge(self, key: Tuple[str, date], rollup: Dict):
+        current = self._deltas.get(key)
+        if current is None:
+            self._deltas[key] = rollup
+            return
+        for field in COUNTER_FIELDS:
+            current[field] += rollup[field]
+        current["first_seen"] = min(t for t in (current["first_seen"], rollup["first_seen"]) if t)
+        current["last_seen"] = max(t for t in (current["last_seen"], rollup["last_seen"]) if t)
+
+    def pending(self, employee_id: str, since: date) -> Dict:
+        """Unflushed counts for one employee from `since` onwards"""
+        totals = {field: 0 for field in COUNTER_FIELDS}
+        for (pending_employee, day), rollup in self._deltas.items():
+            if pending_employee == str(employee_id) and day >= since:
+                for field in COUNTER_FIELDS:
+                    totals[field] += rollup[field]
+        return totals
+
+    async def get_totals(self, employee_id: str, since: date, supabase: "Client") -> Dict:
+        """Summed counters for one employee from `since` (a UTC day) to today"""
+        result = await db_execute(
+            supabase.table(ROLLUP_TABLE).select(", ".join(COUNTER_FIELDS)).eq(
+                "employee_id", employee_id
+            ).gte(
+                "day", since.isoformat()
+            )
+        )
+
+        totals = self.pending(employee_id, since)
+        for row in result.data:
+            for field in COUNTER_FIELDS:
+                totals[field] += row.get(field) or 0
+        return totals
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+async def backfill_rollups(
+    days: int,
+    page_size: int = 1000,
+    chunk_size: int = 500,
+    until: Optional[date] = None
+) -> int:
+    """
+    Rebuild activity_daily_rollups for the last `days` days from activity_logs
+    (days before `until` only, if given). Rows are written with absolute values,
+    so without `until` run it while heartbeats are quiet (or right after
+    deploying the migration).
+    """
+    supabase = get_supabase_admin()
+    since = datetime.combine(utc_today() - timedelta(days=days), datetime.min.time(), tzinfo=timezone.utc)
+    rollups: Dict[Tuple[str, date], Dict] = {}
+
+    # Keyset pagination on (timestamp, id) so deep pages stay cheap
+    last_timestamp, last_id = None, None
+    scanned = 0
+    while True:
+        query = supabase.table("activity_logs").select("id, employee_id, activity_type, timestamp")
+        if until is not None:
+            query = query.lt("timestamp", datetime.combine(until, datetime.min.time(), tzinfo=timezone.utc).isoformat())
+        if last_timestamp is None:
+            query = query.gte("timestamp", since.isoformat())
+        else:
+            query = query.or_(
+                f'timestamp.gt."{last_timestamp}",and(timestamp.eq."{last_timestamp}",id.gt.{last_id})'
+            )
+        page = await db_execute(query.order("timestamp").order("id").limit(page_size))
+
+        for row in page.data:
+            seen_at = parse_timestamp(row["timestamp"])
+            key = (str(row["employee_id"]), seen_at.date())
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = _empty_rollup()
+            _add_event(rollup, row["activity_type"], seen_at)
+
+        scanned += len(page.data)
+        if len(page.data) < page_size:
+            break
+        last_timestamp, last_id = page.data[-1]["timestamp"], page.data[-1]["id"]
+
+    rows = [_to_row(employee_id, day, rollup) for (employee_id, day), rollup in rollups.items()]
+    for start in range(0, len(rows), chunk_size):
+        await db_execute(
+            supabase.table(ROLLUP_TABLE).upsert(rows[start:start + chunk_size], on_conflict="employee_id,day")
+        )
+
+    print(f"Backfilled {len(rows)} rollup row(s) from {scanned} activity log(s)")
+    return len(rows)
+
+async def reconcile_rollups(days: int = 2) -> int:
+    """
+    Rewrite the last `days` closed UTC days from activity_logs, repairing
+    deltas lost when a worker stopped without flushing. Live workers only
+    add to today's rows (their deltas flush within seconds of midnight), so
+    this is safe to run while heartbeats keep arriving. Schedule it daily,
+    some minutes after midnight UTC.
+    """
+    return await backfill_rollups(days, until=utc_today())
+
+activity_rollups = ActivityRollupAggregator(flush_interval_seconds=settings.ACTIVITY_ROLLUP_FLUSH_SECONDS)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Activity rollup maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    backfill = subcommands.add_parser("backfill", help="Rebuild daily rollups from activity_logs")
+    backfill.add_argument("--days", type=int, default=90, help="How many days of history to rebuild")
+    reconcile = subcommands.add_parser("reconcile", help="Rewrite recent closed days from activity_logs (run daily)")
+    reconcile.add_argument("--days", type=int, default=2, help="How many closed days to rewrite")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        asyncio.run(backfill_rollups(args.days))
+    elif args.command == "reconcile":
+        asyncio.run(reconcile_rollups(args.days))
\ No newline at end of file
@@ -1,22 +1,46 @@
 from datetime import datetime, timedelta
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from config.settings import settings
+from services import password_hasher as hashing
+from services.password_hasher import password_hasher, PasswordHashingBusy
 from typing import Optional
 import secrets
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class AuthService:
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        """Verify a password against a hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        """Verify a password against a hash (blocking; use verify_password_async in handlers)"""
+        return hashing.verify_password(plain_password, hashed_password)
     
     @staticmethod
     def get_password_hash(password: str) -> str:
-        """Hash a password"""
-        return pwd_context.hash(password)
+        """Hash a password (blocking; use get_password_hash_async in handlers)"""
+        return hashing.hash_password(password)
+    
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """Verify a password in the hashing process pool; 503 when the pool is saturated"""
+        try:
+            return await password_hasher.verify(plain_password, hashed_password)
+        except PasswordHashingBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in requests, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+    
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        """Hash a password in the hashing process pool; 503 when the pool is saturated"""
+        try:
+            return await password_hasher.hash(password)
+        except PasswordHashingBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password requests, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
     
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -27,7 +51,8 @@ class AuthService:
         else:
             expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         
-        to_encode.update({"exp": expire})
+        # jti identifies this token for revocation (see services/token_revocation.py)
+        to_encode.update({"exp": expire, "jti": secrets.token_urlsafe(16)})
         encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
         return encoded_jwt
     
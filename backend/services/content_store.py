@@ -0,0 +1,219 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from config.settings import settings
+from services.process_owner import owner_alive, owner_id
+from typing import Dict, Optional
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class ContentStore:
+    """
+    Content-addressed file store. Every object lives at
+    <root>/<h[0:2]>/<h[2:4]>/<sha256><ext>, so identical uploads share one
+    file and no directory grows past a few thousand entries.
+
+    Each object has a "<object>.refs" sidecar holding its reference count;
+    release() only removes the object once the last reference is gone.
+    Sidecar updates are serialized with an O_EXCL lock file, which works
+    across worker processes and on Windows. The lock file names its holder;
+    a waiter only breaks it when that process is gone (same host, POSIX)
+    or the lock is older than stale_lock_seconds, and otherwise gives up
+    with TimeoutError after lock_timeout_seconds.
+    """
+
+    def __init__(self, root: Path, lock_timeout_seconds: float = 10.0, stale_lock_seconds: float = 600.0):
+        self.root = Path(root)
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self.stale_lock_seconds = stale_lock_seconds
+
+    # ----- layout -----
+
+    def object_path(self, digest: str, ext: str = "") -> Path:
+        return self.root / digest[0:2] / digest[2:4] / f"{digest}{ext.lower()}"
+
+    def temp_dir(self) -> Path:
+        """Scratch directory on the same filesystem, so commit() is a rename"""
+        temp_dir = self.root / ".tmp"
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        return temp_dir
+
+    def temp_path(self) -> Path:
+        """Where an upload is streamed before its hash is known"""
+        return self.temp_dir() / uuid.uuid4().hex
+
+    @staticmethod
+    def is_object(path) -> bool:
+        """True for paths produced by this store (as opposed to legacy flat uploads)"""
+        return Path(str(path) + ".refs").exists()
+
+    @staticmethod
+    def digest_of(path) -> Optional[str]:
+        """The SHA-256 an object path is named after"""
+        name = Path(path).name.split(".")[0]
+        return name if len(name) == 64 else None
+
+    # ----- references -----
+
+    def _take_over(self, lock_path: Path) -> bool:
+        """Remove a lock left by a dead holder (or one older than stale_lock_seconds)"""
+        try:
+            owner = lock_path.read_text()
+            age = time.time() - lock_path.stat().st_mtime
+        except FileNotFoundError:
+            return True
+        if owner_alive(owner) and age < self.stale_lock_seconds:
+            return False
+
+        # Rename first, so two waiters breaking the same lock cannot both win
+        tomb = lock_path.with_name(lock_path.name + f".{uuid.uuid4().hex}")
+        try:
+            os.rename(lock_path, tomb)
+        except FileNotFoundError:
+            return True
+        if tomb.read_text() != owner:
+            # Someone else broke it first and we grabbed their fresh lock: give it back
+            try:
+                os.rename(tomb, lock_path)
+            except OSError:
+                pass
+            return False
+        print(f"Content store: took over stale lock {lock_path} from {owner}")
+        os.remove(tomb)
+        return True
+
+    @contextmanager
+    def _locked(self, object_path: Path):
+        lock_path = Path(str(object_path) + ".lock")
+        owner = owner_id()
+        deadline = time.monotonic() + self.lock_timeout_seconds
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, owner.encode())
+                break
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    if not self._take_over(lock_path):
+                        raise TimeoutError(f"Content store lock {lock_path} is held by another writer")
+                    deadline = time.monotonic() + self.lock_timeout_seconds
+                time.sleep(0.005)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            try:
+                # Only remove our own lock (it may have been taken over as stale)
+                if lock_path.read_text() == owner:
+                    os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+
+    def _read_refs(self, object_path: Path) -> int:
+        try:
+            return int(Path(str(object_path) + ".refs").read_text() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_refs(self, object_path: Path, count: int):
+        refs_path = Path(str(object_path) + ".refs")
+        temp = refs_path.with_name(refs_path.name + f".{uuid.uuid4().hex}")
+        temp.write_text(str(count))
+        os.replace(temp, refs_path)
+
+    def commit(self, temp_path: Path, digest: str, ext: str = "") -> Path:
+        """
+        Move a fully written temp file into the store (or drop it if the
+        content is already there) and take one reference. Blocking: call
+        through asyncio.to_thread from async code.
+        """
+        object_path = self.object_path(digest, ext)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._locked(object_path):
+            refs = self._read_refs(object_path)
+            if refs and object_path.exists():
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, object_path)
+                refs = 0
+            self._write_refs(object_path, refs + 1)
+        return object_path
+
+    def release(self, object_path) -> int:
+        """Drop one reference and return how many remain; the file goes with the last one"""
+        object_path = Path(object_path)
+        with self._locked(object_path):
+            refs = self._read_refs(object_path) - 1
+            if refs > 0:
+                self._write_refs(object_path, refs)
+                return refs
+            for path in (object_path, Path(str(object_path) + ".refs")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return 0
+
+def content_store(subfolder: str) -> ContentStore:
+    """Store for one upload area (reports, profiles, ...) under UPLOAD_DIR"""
+    return ContentStore(Path(settings.UPLOAD_DIR) / subfolder)
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def migrate_flat_layout(subfolder: str, dry_run: bool = False) -> Dict[str, str]:
+    """
+    Move legacy uploads (uuid4 names directly in UPLOAD_DIR/<subfolder>)
+    into the content-addressed layout. Duplicates collapse into one object
+    with one reference per original file. Returns {old path: new path};
+    the map is also written to UPLOAD_DIR so stored paths in the database
+    can be rewritten.
+    """
+    store = content_store(subfolder)
+    if not store.root.exists():
+        return {}
+
+    mapping = {}
+    for entry in sorted(store.root.iterdir()):
+        # Shard directories, sidecars and temp files are already in the new layout
+        if not entry.is_file() or entry.name.endswith((".refs", ".lock")) or store.is_object(entry):
+            continue
+
+        digest = hash_file(entry)
+        target = store.object_path(digest, entry.suffix)
+        mapping[str(entry)] = str(target)
+        if not dry_run:
+            store.commit(entry, digest, entry.suffix)
+
+    if mapping and not dry_run:
+        map_path = Path(settings.UPLOAD_DIR) / f"migration-{subfolder}-{int(time.time())}.json"
+        map_path.write_text(json.dumps(mapping, indent=2))
+        print(f"Path map written to {map_path}")
+    return mapping
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Attachment storage maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate = subcommands.add_parser("migrate", help="Convert flat uploads to the content-addressed layout")
+    migrate.add_argument("--subfolder", action="append", help="Upload area(s) to convert (default: reports, profiles)")
+    migrate.add_argument("--dry-run", action="store_true", help="Only print what would move")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        for subfolder in args.subfolder or ["reports", "profiles"]:
+            mapping = migrate_flat_layout(subfolder, dry_run=args.dry_run)
+            unique = len(set(mapping.values()))
+            print(f"{subfolder}: {len(mapping)} file(s) -> {unique} object(s)")
+            if args.dry_run:
+                for old, new in mapping.items():
+                    print(f"  {old} -> {new}")
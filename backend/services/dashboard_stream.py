@@ -0,0 +1,161 @@
+import asyncio
+import json
+import time
+from config.settings import settings
+from config.database import get_supabase_admin, db_execute
+from typing import AsyncIterator, Dict, Optional, Set
+
+# Events after which the admin dashboard views are worth re-reading
+DASHBOARD_EVENTS = {"report_created", "report_flagged", "wellness_recomputed", "employee_updated"}
+
+class DashboardBroadcaster:
+    """
+    Fan-out of admin dashboard updates to every connected /admin/stream
+    client. Routes publish small events (report created, report flagged,
+    wellness recomputed) and each is pushed to all subscribers as is.
+    A single producer task re-reads the admin_dashboard_metrics and
+    department_health views at most once per debounce window after such
+    events, and every refresh_seconds while anyone is listening (to pick
+    up writes made by other workers), so view load no longer scales with
+    the number of open dashboards.
+    """
+
+    def __init__(self, debounce_seconds: float, refresh_seconds: float, keepalive_seconds: float, queue_size: int):
+        self.debounce_seconds = debounce_seconds
+        self.refresh_seconds = refresh_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.queue_size = queue_size
+
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._dirty: Optional[asyncio.Event] = None
+        self._snapshot: Optional[dict] = None
+        self._next_id = 0
+        self._task = None
+
+        # Metrics
+        self.published = 0
+        self.dropped_subscribers = 0
+        self.snapshot_refreshes = 0
+
+    # ----- producer side -----
+
+    def publish(self, event_type: str, data: dict):
+        """Push an event to every subscriber (never blocks the caller)"""
+        self._next_id += 1
+        event = {"id": self._next_id, "event": event_type, "data": data}
+        self.published += 1
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A client that stopped reading is cut off rather than buffered forever
+                self._drop(queue)
+
+        if event_type in DASHBOARD_EVENTS and self._dirty is not None:
+            self._dirty.set()
+
+    def _drop(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        self.dropped_subscribers += 1
+        # Wake the reader so it notices it was dropped
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def _refresh_snapshot(self):
+        supabase = get_supabase_admin()
+        metrics, departments = await asyncio.gather(
+            db_execute(supabase.table("admin_dashboard_metrics").select("*")),
+            db_execute(supabase.table("department_health").select("*"))
+        )
+        self._snapshot = {
+            "metrics": metrics.data[0] if metrics.data else {},
+            "departments": departments.data,
+            "generated_at": time.time()
+        }
+        self.snapshot_refreshes += 1
+        self.publish("dashboard", self._snapshot)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._dirty.wait(), timeout=self.refresh_seconds)
+                # Coalesce bursts (e.g. a batch of reports) into one refresh
+                await asyncio.sleep(self.debounce_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._dirty.clear()
+
+            if not self._subscribers:
+                continue
+            try:
+                await self._refresh_snapshot()
+            except Exception as e:
+                print(f"Dashboard stream refresh error: {e}")
+
+    def start(self):
+        self._dirty = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for queue in list(self._subscribers):
+            self._drop(queue)
+
+    # ----- consumer side -----
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        if self._snapshot is not None:
+            queue.put_nowait({"id": self._next_id, "event": "dashboard", "data": self._snapshot})
+        elif self._dirty is not None:
+            # First listener: build a snapshot right away
+            self._dirty.set()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    async def stream(self) -> AsyncIterator[str]:
+        """
+        Server-Sent Events for one subscriber. Subscribes once the response
+        starts and unsubscribes when the client goes away, so a response
+        that never starts leaves no queue behind.
+        """
+        queue = None
+        try:
+            queue = self.subscribe()
+            yield f"retry: {int(self.keepalive_seconds * 1000)}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+        finally:
+            if queue is not None:
+                self.unsubscribe(queue)
+
+    def stats(self) -> Dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+            "snapshot_refreshes": self.snapshot_refreshes
+        }
+
+dashboard_stream = DashboardBroadcaster(
+    debounce_seconds=settings.DASHBOARD_STREAM_DEBOUNCE_SECONDS,
+    refresh_seconds=settings.DASHBOARD_STREAM_REFRESH_SECONDS,
+    keepalive_seconds=settings.DASHBOARD_STREAM_KEEPALIVE_SECONDS,
+    queue_size=settings.DASHBOARD_STREAM_QUEUE_SIZE
+)
@@ -0,0 +1,90 @@
+import hashlib
+import time
+from datetime import datetime
+from email.utils import format_datetime
+from fastapi import Request, Response
+from config.database import db_execute
+from services.time_utils import parse_timestamp
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+VERSION_TABLE = "table_versions"
+
+class VersionStamp:
+    """A table's change counter (bumped by a trigger on every write, see migrations/006) and last change time"""
+
+    def __init__(self, table: str, version: int, last_modified: Optional[datetime]):
+        self.table = table
+        self.version = version
+        self.last_modified = last_modified
+
+    def token(self) -> str:
+        return f"{self.table}:{self.version}"
+
+async def combined_stamp(supabase: "Client", *tables: str) -> Optional[List[VersionStamp]]:
+    """
+    Version stamps for several tables in one indexed lookup; None if it
+    failed. Counters are per table, so a write anywhere in a table changes
+    every ETag built on it (filters only go into the ETag as extras).
+    """
+    try:
+        result = await db_execute(
+            supabase.table(VERSION_TABLE).select("table_name, version, changed_at").in_("table_name", list(tables))
+        )
+    except Exception as e:
+        print(f"Version stamp error: {e}")
+        return None
+
+    rows = {row["table_name"]: row for row in result.data}
+    return [
+        VersionStamp(
+            table,
+            rows[table]["version"] if table in rows else 0,
+            parse_timestamp(rows[table]["changed_at"]) if table in rows else None
+        )
+        for table in tables
+    ]
+
+def make_etag(scope: str, stamps: List[VersionStamp], *extra) -> str:
+    """Weak ETag over the stamps and whatever else shapes the response (filters, page, user)"""
+    material = "|".join([scope, *[stamp.token() for stamp in stamps], *[str(e) for e in extra]])
+    return 'W/"' + hashlib.sha1(material.encode()).hexdigest()[:20] + '"'
+
+def time_bucket(max_age_seconds: int) -> int:
+    """Changes every max_age_seconds, bounding how long derived/time-based data can be cached"""
+    return int(time.time() // max_age_seconds)
+
+def latest_change(stamps: List[VersionStamp]) -> Optional[datetime]:
+    changes = [stamp.last_modified for stamp in stamps if stamp.last_modified]
+    return max(changes) if changes else None
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): ignore W/ prefixes
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> Optional[Response]:
+    """
+    Set ETag/Last-Modified on `response`. Returns a 304 to send instead
+    of the body when the client's If-None-Match shows it already has this
+    version. If-Modified-Since is not honoured: Last-Modified has one
+    second resolution and the ETag is exact.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(microsecond=0), usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return None
@@ -0,0 +1,185 @@
+import asyncio
+import csv
+import heapq
+import io
+import json
+import zlib
+from config.database import db_execute
+from services.query_tracker import BulkOperation
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+async def iter_rows(
+    supabase: "Client",
+    table: str,
+    columns: str,
+    sort_column: str,
+    apply_filters: Callable,
+    page_size: int = 1000,
+    bulk: Optional[BulkOperation] = None
+) -> AsyncIterator[List[dict]]:
+    """
+    Yield a table page by page in (sort_column, id) order. Pages are read
+    with keyset pagination, so only one page is held at a time and the
+    cost of a page does not grow with how far into the table it is.
+    """
+    bulk = bulk or BulkOperation()
+    last_value, last_id = None, None
+    while True:
+        query = apply_filters(supabase.table(table).select(columns))
+        if last_value is not None:
+            query = query.or_(
+                f'{sort_column}.gt."{last_value}",and({sort_column}.eq."{last_value}",id.gt.{last_id})'
+            )
+        page = await db_execute(query.order(sort_column).order("id").limit(page_size), bulk)
+
+        if page.data:
+            yield page.data
+        if len(page.data) < page_size:
+            return
+        last_value, last_id = page.data[-1][sort_column], page.data[-1]["id"]
+
+async def iter_rows_in(
+    supabase: "Client",
+    table: str,
+    columns: str,
+    sort_column: str,
+    apply_filters: Callable,
+    in_column: str,
+    values: List[str],
+    chunk_size: int = 200,
+    page_size: int = 1000
+) -> AsyncIterator[List[dict]]:
+    """
+    iter_rows restricted to `in_column IN values`. The values are split into
+    chunks so no request URL grows with the list, and the per-chunk streams
+    are merged back into one (sort_column, id) ordered stream.
+    """
+    bulk = BulkOperation()
+    streams = [
+        iter_rows(
+            supabase, table, columns, sort_column,
+            lambda query, chunk=values[start:start + chunk_size]: apply_filters(query).in_(in_column, chunk),
+            page_size, bulk
+        ).__aiter__()
+        for start in range(0, len(values), chunk_size)
+    ]
+
+    async def next_page(stream) -> List[dict]:
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return []
+
+    # One buffered page per stream; the first pages are fetched together
+    pages = await asyncio.gather(*[next_page(stream) for stream in streams])
+    positions = [0] * len(streams)
+    heap = [(page[0][sort_column], page[0]["id"], number) for number, page in enumerate(pages) if page]
+    heapq.heapify(heap)
+
+    merged = []
+    while heap:
+        _, _, number = heapq.heappop(heap)
+        merged.append(pages[number][positions[number]])
+        positions[number] += 1
+        if positions[number] == len(pages[number]):
+            pages[number], positions[number] = await next_page(streams[number]), 0
+        if pages[number]:
+            row = pages[number][positions[number]]
+            heapq.heappush(heap, (row[sort_column], row["id"], number))
+        if len(merged) == page_size:
+            yield merged
+            merged = []
+    if merged:
+        yield merged
+
+# Leading characters that make spreadsheet applications read a cell as a formula
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _csv_cell(value):
+    # Embedded resources (e.g. departments(name)) and json columns go in as JSON text
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    # Report titles and descriptions are user input: a leading ' keeps them text (CSV injection)
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+class CsvEncoder:
+    """Encodes pages of rows as CSV; the header comes from the first row"""
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer: Optional[csv.DictWriter] = None
+
+    def encode(self, rows: List[dict]) -> bytes:
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._buffer, fieldnames=list(rows[0].keys()), extrasaction="ignore")
+            self._writer.writeheader()
+        for row in rows:
+            self._writer.writerow({key: _csv_cell(value) for key, value in row.items()})
+
+        chunk = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return chunk.encode("utf-8")
+
+    def error(self, message: str) -> bytes:
+        return f"# export interrupted: {message}\n".encode("utf-8")
+
+class NdjsonEncoder:
+    """Encodes pages of rows as newline-delimited JSON"""
+
+    def encode(self, rows: List[dict]) -> bytes:
+        return "".join(json.dumps(row, default=str) + "\n" for row in rows).encode("utf-8")
+
+    def error(self, message: str) -> bytes:
+        return (json.dumps({"error": f"export interrupted: {message}"}) + "\n").encode("utf-8")
+
+async def stream_export(
+    pages: AsyncIterator[List[dict]],
+    export_format: str,
+    compress: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Serialize pages as they arrive, optionally gzipping on the fly. If a page
+    fails to load, a final error line is written and the exception is
+    re-raised, so the server aborts the response instead of ending it as if
+    the export were complete.
+    """
+    encoder = CsvEncoder() if export_format == "csv" else NdjsonEncoder()
+    # wbits=31 writes a gzip header/trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    try:
+        async for rows in pages:
+            chunk = encoder.encode(rows)
+            if compressor:
+                # Z_SYNC_FLUSH pushes each page out instead of holding it in zlib
+                chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if chunk:
+                yield chunk
+    except Exception as e:
+        print(f"Export stream error: {e}")
+        chunk = encoder.error(str(e))
+        # No gzip trailer: the truncated archive fails to decompress as well
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else chunk
+        raise
+
+    if compressor:
+        yield compressor.flush()
+
+def export_headers(name: str, export_format: str, compress: bool) -> Dict[str, str]:
+    """Content-Disposition for a download named e.g. reports.csv.gz"""
+    filename = f"{name}.{export_format}" + (".gz" if compress else "")
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+def export_media_type(export_format: str, compress: bool) -> str:
+    return "application/gzip" if compress else EXPORT_FORMATS[export_format]
@@ -0,0 +1,148 @@
+import mimetypes
+import os
+import re
+from pathlib import Path
+import anyio
+from fastapi import HTTPException, Request, status
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from config.settings import settings
+from services.content_store import ContentStore
+from typing import Optional, Tuple
+
+DOWNLOAD_AREAS = {"reports", "profiles"}
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE = "private, no-cache"
+
+_SINGLE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class FileRangeResponse(Response):
+    """
+    Serves bytes [start, end] of a file. When the server offers the ASGI
+    zero-copy extension (http.response.zerocopysend) the kernel copies the
+    file straight to the socket; otherwise it is streamed in fixed chunks
+    read off the loop, so memory use does not depend on file size.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int, headers: dict, media_type: str):
+        self.path = path
+        self.start = start
+        self.length = end - start + 1
+        super().__init__(
+            status_code=status_code,
+            headers={**headers, "content-length": str(self.length)},
+            media_type=media_type
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        with open(self.path, "rb") as file:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": self.start,
+                    "count": self.length,
+                    "more_body": False
+                })
+                return
+
+            file.seek(self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(file.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+
+def resolve_upload(area: str, relative_path: str) -> Path:
+    """Map a download URL onto a file under UPLOAD_DIR/<area>, refusing anything else"""
+    if area not in DOWNLOAD_AREAS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    root = (Path(settings.UPLOAD_DIR) / area).resolve()
+    path = (root / relative_path).resolve()
+    if not path.is_relative_to(root) or not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    # Store bookkeeping (reference sidecars, locks, partial uploads) is never served
+    if path.name.endswith((".refs", ".lock")) or ".tmp" in path.relative_to(root).parts:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    return path
+
+def file_etag(path: Path, stat_result: os.stat_result) -> Tuple[str, bool]:
+    """(ETag, immutable): content-addressed files are tagged with their hash"""
+    digest = ContentStore.digest_of(path)
+    if digest and ContentStore.is_object(path):
+        return f'"{digest}"', True
+    return f'W/"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"', False
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    First/last byte of a single "bytes=" range. None means serve the whole
+    file (no header, or a multi-range request); unsatisfiable ranges raise 416.
+    """
+    match = _SINGLE_RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the final N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+def download_response(request: Request, path: Path) -> Response:
+    """
+    Conditional, range-aware response for a stored upload. With
+    SENDFILE_HEADER configured (e.g. X-Accel-Redirect behind nginx) the
+    body is handed to the proxy entirely; validation still happens here.
+    """
+    stat_result = path.stat()
+    etag, immutable = file_etag(path, stat_result)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag.removeprefix("W/") in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+    if settings.SENDFILE_HEADER:
+        relative = path.relative_to(Path(settings.UPLOAD_DIR).resolve()).as_posix()
+        headers[settings.SENDFILE_HEADER] = f"{settings.SENDFILE_PREFIX.rstrip('/')}/{relative}"
+        return Response(headers=headers, media_type=media_type)
+
+    size = stat_result.st_size
+    byte_range = parse_range(request.headers.get("range"), size)
+    # If-Range: only resume when the client's copy is still this version
+    if_range = request.headers.get("if-range")
+    if byte_range and if_range and if_range.strip() != etag:
+        byte_range = None
+
+    if byte_range is None:
+        return FileRangeResponse(path, 0, size - 1, status.HTTP_200_OK, headers, media_type)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(path, start, end, status.HTTP_206_PARTIAL_CONTENT, headers, media_type)
@@ -0,0 +1,357 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from config.settings import settings
+from config.database import db_execute, get_supabase_admin
+from services.process_owner import owner_alive, owner_id, process_alive
+from services.flagging_service import FlaggingService
+from services.dashboard_stream import dashboard_stream
+from services.metrics import FLAGGING_JOBS
+
+async def run_flagging_checks(report: dict) -> dict:
+    """Default job handler: run every FlaggingService check for a report"""
+    result = await FlaggingService.check_and_flag_report(report, get_supabase_admin())
+    if result.get("flagged"):
+        dashboard_stream.publish("report_flagged", {
+            "id": report["id"],
+            "report_id": report.get("report_id"),
+            "department_id": report.get("department_id"),
+            "severity": result.get("severity"),
+            "reasons": [flag["reason"] for flag in result.get("flags", [])]
+        })
+    return result
+
+async def record_flagging_status(report_id: str, fields: dict):
+    """Default status store: the report's report_flagging row (migrations/008)"""
+    await db_execute(
+        get_supabase_admin().table("report_flagging").upsert({"report_id": report_id, **fields}, on_conflict="report_id")
+    )
+
+class FlaggingQueue:
+    """
+    In-process worker pool that flags reports after POST /reports returns.
+
+    Jobs are appended to a JSON-lines journal before they are queued and
+    marked done once they finish, so anything still pending when the
+    process stops is replayed on the next start. Past max_depth, jobs wait
+    in a backlog that refills the queue as workers free up; the checks
+    never run on the request path. Flagging jobs are idempotent, which makes at-least-once replay safe. The journal
+    is rewritten down to the pending jobs at startup and whenever it has
+    grown by compact_after entries since the last rewrite.
+
+    Job status (running, retrying, flagged, clear, failed, with attempts)
+    goes to status_store rather than memory, so any worker can answer a
+    poll. The 'queued' row is created with the report itself.
+
+    Each worker process has a journal of its own, <name>.<host>.<pid>.jsonl
+    next to journal_path, so no process ever rewrites another's jobs. On
+    start a process also adopts the journals of processes that are gone
+    (same host, POSIX) or untouched for stale_journal_seconds, claiming
+    each with an O_EXCL file so two starting workers cannot both take it.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[dict], Awaitable[dict]],
+        workers: int,
+        max_depth: int,
+        max_retries: int,
+        retry_base_seconds: float,
+        journal_path: str,
+        status_store: Callable[[str, dict], Awaitable] = record_flagging_status,
+        compact_after: int = 1000,
+        stale_journal_seconds: float = 600.0
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_depth = max_depth
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.journal_base = Path(journal_path)
+        self.journal_path = self._own_journal()
+        self.status_store = status_store
+        self.compact_after = compact_after
+        self.stale_journal_seconds = stale_journal_seconds
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+        self._retries: set = set()
+        # Journaled jobs waiting for room in the queue
+        self._backlog: "OrderedDict[str, dict]" = OrderedDict()
+        # Unfinished jobs and the journal's length since the last compaction (guarded by _journal_lock)
+        self._pending: "OrderedDict[str, dict]" = OrderedDict()
+        self._journal_entries = 0
+        self._journal_lock = threading.Lock()
+
+    # ----- lifecycle -----
+
+    async def start(self):
+        """Replay the journal and start the worker pool"""
+        # Depth is enforced in enqueue() so replayed jobs and retries are never dropped
+        self._queue = asyncio.Queue()
+        # Again here: a pre-fork server imports this module before the workers exist
+        self.journal_path = self._own_journal()
+        pending = await asyncio.to_thread(self._replay_journal)
+
+        for report in pending:
+            self._queue.put_nowait((report, 0))
+
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"flagging-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+        if pending:
+            print(f"Flagging queue: replayed {len(pending)} pending job(s) into {self.journal_path}")
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs stay in the journal for the next start"""
+        tasks = self._tasks + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._retries.clear()
+        self._backlog.clear()
+        await asyncio.to_thread(self._close_journal)
+
+    # ----- producer side -----
+
+    async def enqueue(self, report: dict) -> str:
+        """
+        Queue a freshly inserted report for flagging and return its status.
+        The job is journaled first; when the queue is full it waits in the
+        backlog (or, before start(), in the journal until the next replay).
+        """
+        await asyncio.to_thread(self._append_journal, {"op": "enqueue", "report": report})
+        if self._queue is None:
+            return "queued"
+
+        if self._backlog or self._queue.qsize() >= self.max_depth:
+            self._backlog[str(report["id"])] = report
+        else:
+            self._queue.put_nowait((report, 0))
+        return "queued"
+
+    def stats(self) -> Dict:
+        return {
+            "workers": len(self._tasks),
+            "depth": self._queue.qsize() if self._queue else 0,
+            "max_depth": self.max_depth,
+            "backlog": len(self._backlog)
+        }
+
+    # ----- consumer side -----
+
+    async def _worker(self):
+        while True:
+            report, attempts = await self._queue.get()
+            try:
+                await self._run(report, attempts + 1)
+            finally:
+                # Refill first, so join() does not see an empty queue while jobs are backlogged
+                self._refill()
+                self._queue.task_done()
+
+    def _refill(self):
+        """Move backlogged jobs into the queue while it has room"""
+        while self._backlog and self._queue.qsize() < self.max_depth:
+            _, report = self._backlog.popitem(last=False)
+            self._queue.put_nowait((report, 0))
+
+    async def _run(self, report: dict, attempt: int):
+        report_id = str(report["id"])
+        await self._record_status(report_id, "running", attempt)
+
+        try:
+            result = await self.handler(report)
+        except Exception as e:
+            if attempt <= self.max_retries and self._queue is not None:
+                delay = self.retry_base_seconds * (2 ** (attempt - 1))
+                await self._record_status(report_id, "retrying", attempt, error=str(e))
+                FLAGGING_JOBS.inc("retrying")
+                # Keep a reference: the loop only holds tasks weakly
+                task = asyncio.create_task(self._requeue_later(report, attempt, delay))
+                self._retries.add(task)
+                task.add_done_callback(self._retries.discard)
+                return
+
+            print(f"Flagging job for report {report_id} failed after {attempt} attempt(s): {e}")
+            await self._record_status(report_id, "failed", attempt, error=str(e))
+            FLAGGING_JOBS.inc("failed")
+            await asyncio.to_thread(self._append_journal, {"op": "done", "id": report_id})
+            return
+
+        await self._record_status(report_id, "flagged" if result.get("flagged") else "clear", attempt, result=result)
+        FLAGGING_JOBS.inc("flagged" if result.get("flagged") else "clear")
+        await asyncio.to_thread(self._append_journal, {"op": "done", "id": report_id})
+
+    async def _requeue_later(self, report: dict, attempts: int, delay: float):
+        await asyncio.sleep(delay)
+        self._queue.put_nowait((report, attempts))
+
+    async def _record_status(
+        self, report_id: str, status: str, attempts: int, error: Optional[str] = None, result: Optional[dict] = None
+    ):
+        # Best effort: a lost status write must not fail or repeat the job
+        try:
+            await self.status_store(report_id, {"status": status, "attempts": attempts, "error": error, "result": result})
+        except Exception as e:
+            print(f"Flagging queue: could not record status {status} for report {report_id}: {e}")
+
+    # ----- journal -----
+
+    def _append_journal(self, entry: dict):
+        line = json.dumps(entry, default=str) + "\n"
+        with self._journal_lock:
+            if entry["op"] == "enqueue":
+                self._pending[str(entry["report"]["id"])] = entry["report"]
+            else:
+                self._pending.pop(entry["id"], None)
+
+            if self._journal_entries >= self.compact_after + len(self._pending):
+                self._write_journal(self._pending.values())
+                return
+
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_entries += 1
+
+    def _write_journal(self, reports):
+        """Replace the journal with one enqueue entry per pending report (caller holds _journal_lock)"""
+        reports = list(reports)
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        compacted = self.journal_path.with_suffix(".compact")
+        with open(compacted, "w", encoding="utf-8") as f:
+            for report in reports:
+                f.write(json.dumps({"op": "enqueue", "report": report}, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(compacted, self.journal_path)
+        self._journal_entries = len(reports)
+
+    def _close_journal(self):
+        """Remove this process's journal on shutdown if nothing is left in it"""
+        with self._journal_lock:
+            if not self._pending:
+                self.journal_path.unlink(missing_ok=True)
+                self._journal_entries = 0
+
+    @staticmethod
+    def _read_journal(path: Path) -> "OrderedDict[str, dict]":
+        """Jobs a journal records as enqueued but never finished"""
+        pending: "OrderedDict[str, dict]" = OrderedDict()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write
+                        continue
+                    if entry.get("op") == "enqueue":
+                        pending[str(entry["report"]["id"])] = entry["report"]
+                    elif entry.get("op") == "done":
+                        pending.pop(str(entry.get("id")), None)
+        except FileNotFoundError:
+            pass
+        return pending
+
+    def _own_journal(self) -> Path:
+        base = self.journal_base
+        return base.with_name(f"{base.stem}.{socket.gethostname()}.{os.getpid()}{base.suffix}")
+
+    def _journal_owner(self, path: Path) -> Optional[Tuple[str, int]]:
+        """(host, pid) from a per-process journal name"""
+        middle = path.name[len(self.journal_base.stem) + 1:len(path.name) - len(self.journal_base.suffix)]
+        host, _, pid = middle.rpartition(".")
+        try:
+            return host, int(pid)
+        except ValueError:
+            return None
+
+    def _orphaned_journals(self) -> List[Path]:
+        """Other processes' journals whose owner is gone or that went stale, and a shared journal from before per-process ones"""
+        base = self.journal_base
+        orphans = [base] if base.exists() else []
+        for path in sorted(base.parent.glob(f"{base.stem}.*{base.suffix}")):
+            owner = self._journal_owner(path)
+            if path == self.journal_path or owner is None:
+                continue
+            try:
+                age = time.time() - path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if process_alive(owner[1], owner[0]) and age < self.stale_journal_seconds:
+                continue
+            orphans.append(path)
+        return orphans
+
+    def _claim(self, path: Path) -> Optional[Path]:
+        """Create <journal>.adopt for this process, or None if another (live) process holds it"""
+        claim = Path(str(path) + ".adopt")
+        for _ in range(2):
+            try:
+                fd = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    holder = claim.read_text()
+                    age = time.time() - claim.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if owner_alive(holder) and age < self.stale_journal_seconds:
+                    return None
+                # Left behind by a process that died while adopting
+                claim.unlink(missing_ok=True)
+                continue
+            os.write(fd, owner_id().encode())
+            os.close(fd)
+            return claim
+        return None
+
+    def _replay_journal(self) -> list:
+        """
+        Return jobs enqueued but never finished - this process's own (a
+        restart can reuse a pid) and those of orphaned journals - and
+        rewrite this process's journal down to just those.
+        """
+        pending = self._read_journal(self.journal_path)
+        adopted = []
+        for path in self._orphaned_journals():
+            claim = self._claim(path)
+            if claim is None:
+                continue
+            adopted.append((path, claim))
+            for report_id, report in self._read_journal(path).items():
+                pending.setdefault(report_id, report)
+
+        with self._journal_lock:
+            self._pending = pending
+            self._write_journal(pending.values())
+
+        # The adopted jobs are durable in our journal now; a crash before this point only replays them twice
+        for path, claim in adopted:
+            path.unlink(missing_ok=True)
+            claim.unlink(missing_ok=True)
+        if adopted:
+            print(f"Flagging queue: adopted {len(adopted)} journal(s) of stopped workers")
+
+        return list(pending.values())
+
+flagging_queue = FlaggingQueue(
+    handler=run_flagging_checks,
+    workers=settings.FLAGGING_WORKERS,
+    max_depth=settings.FLAGGING_QUEUE_MAX_DEPTH,
+    max_retries=settings.FLAGGING_MAX_RETRIES,
+    retry_base_seconds=settings.FLAGGING_RETRY_BASE_SECONDS,
+    journal_path=settings.FLAGGING_QUEUE_FILE
+)
\ No newline at end of file
@@ -1,11 +1,16 @@
-from supabase import Client
 from datetime import datetime, timedelta
 from config.settings import settings
-from typing import List, Dict
+from config.database import db_execute
+from services.keyword_matcher import flagging_rule_cache, SEVERITY_ORDER
+from services.pattern_counter import pattern_counter
+from typing import TYPE_CHECKING, List, Dict
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 class FlaggingService:
     @staticmethod
-    async def check_and_flag_report(report: dict, supabase: Client) -> dict:
+    async def check_and_flag_report(report: dict, supabase: "Client") -> dict:
         """
         Check if report should be auto-flagged based on:
         1. Keyword detection
@@ -36,57 +41,59 @@ class FlaggingService:
         if flags:
             flag_reasons = " | ".join([f["reason"] for f in flags])
             
-            supabase.table("reports").update({
+            await db_execute(supabase.table("reports").update({
                 "is_flagged": True,
                 "flag_reason": flag_reasons,
                 "severity": highest_severity
-            }).eq("id", report["id"]).execute()
+            }).eq("id", report["id"]))
             
             return {"flagged": True, "flags": flags, "severity": highest_severity}
         
         return {"flagged": False}
     
     @staticmethod
-    async def _check_keywords(report: dict, supabase: Client) -> dict:
-        """Check for keyword matches"""
+    async def _check_keywords(report: dict, supabase: "Client") -> dict:
+        """Check for keyword matches (single pass over the cached rule automaton)"""
         try:
-            rules = supabase.table("flagging_rules").select("*").eq("is_active", True).execute()
-            
-            description_lower = report["description"].lower()
-            title_lower = report["title"].lower()
+            match = await flagging_rule_cache.match(report, supabase)
             
-            for rule in rules.data:
-                keyword = rule["keyword"].lower()
-                if keyword in description_lower or keyword in title_lower:
-                    return {
-                        "type": "keyword",
-                        "reason": f"Keyword detected: {rule['keyword']}",
-                        "severity": rule["severity_level"]
-                    }
+            if match["rules"]:
+                return {
+                    "type": "keyword",
+                    "reason": f"Keyword detected: {', '.join(match['keywords'])}",
+                    "severity": match["severity"]
+                }
         except Exception as e:
             print(f"Keyword check error: {e}")
         
         return None
     
     @staticmethod
-    async def _check_patterns(report: dict, supabase: Client) -> dict:
+    async def _check_patterns(report: dict, supabase: "Client") -> dict:
         """Check for patterns - multiple similar reports"""
         try:
             # Check for multiple reports from same department in last N days
-            cutoff_date = datetime.now() - timedelta(days=settings.PATTERN_DETECTION_DAYS)
-            
-            similar_reports = supabase.table("reports").select("*").eq(
-                "department_id", report["department_id"]
-            ).eq(
-                "report_type", report["report_type"]
-            ).gte(
-                "created_at", cutoff_date.isoformat()
-            ).execute()
+            similar_count = 0
+            if pattern_counter.ready:
+                similar_count = pattern_counter.count(report["department_id"], report["report_type"])
+            if similar_count < settings.SIMILAR_REPORTS_THRESHOLD:
+                # The counter misses other workers' reports until its next resync (and
+                # is empty if the startup warm failed), so only the database can clear
+                cutoff_date = datetime.now() - timedelta(days=settings.PATTERN_DETECTION_DAYS)
+                
+                similar_reports = await db_execute(supabase.table("reports").select("id", count="exact").eq(
+                    "department_id", report["department_id"]
+                ).eq(
+                    "report_type", report["report_type"]
+                ).gte(
+                    "created_at", cutoff_date.isoformat()
+                ).limit(1))
+                similar_count = max(similar_count, similar_reports.count)
             
-            if len(similar_reports.data) >= settings.SIMILAR_REPORTS_THRESHOLD:
+            if similar_count >= settings.SIMILAR_REPORTS_THRESHOLD:
                 return {
                     "type": "pattern",
-                    "reason": f"Multiple similar reports detected ({len(similar_reports.data)} in {settings.PATTERN_DETECTION_DAYS} days)",
+                    "reason": f"Multiple similar reports detected ({similar_count} in {settings.PATTERN_DETECTION_DAYS} days)",
                     "severity": "high"
                 }
         except Exception as e:
@@ -120,5 +127,4 @@ class FlaggingService:
     @staticmethod
     def _is_higher_severity(new_severity: str, current_severity: str) -> bool:
         """Compare severity levels"""
-        severity_order = {"low": 0, "medium": 1, "high": 2, "critical": 3}
-        return severity_order.get(new_severity, 0) > severity_order.get(current_severity, 0)
\ No newline at end of file
+        return SEVERITY_ORDER.get(new_severity, 0) > SEVERITY_ORDER.get(current_severity, 0)
\ No newline at end of file
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from config.settings import settings
+from config.database import get_supabase_admin, db_execute
+from services.activity_rollup import activity_rollups
+from typing import Dict, List
+
+class HeartbeatBufferFull(Exception):
+    """Raised when the buffer is at capacity and a flush could not make room"""
+
+class HeartbeatBuffer:
+    """
+    Write-behind buffer for activity heartbeats. Events are coalesced in
+    memory and written as multi-row activity_logs inserts, either every
+    flush_interval_seconds or as soon as max_batch_size events are waiting.
+    When max_buffered events are pending (e.g. the database is slow),
+    producers wait for a flush instead of growing the buffer without bound.
+    """
+
+    def __init__(self, flush_interval_seconds: float, max_batch_size: int, max_buffered: int):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_batch_size = max_batch_size
+        self.max_buffered = max_buffered
+
+        self._events: List[dict] = []
+        self._flush_lock = asyncio.Lock()
+        # Set when a full batch is waiting: wakes _run early. Flushing there rather than
+        # in a task spawned by add() keeps flush queries out of that request's tracker.
+        self._batch_ready = asyncio.Event()
+        self._task = None
+
+        # Metrics
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flushed_events = 0
+        self.rejected_events = 0
+        self.last_flush_latency_ms = 0.0
+        self.max_flush_latency_ms = 0.0
+        self.total_flush_latency_ms = 0.0
+
+    async def add(self, employee_id: str, activity_type: str = "active", status: str = "active"):
+        """Buffer one heartbeat; applies backpressure when the buffer is full"""
+        if len(self._events) >= self.max_buffered:
+            await self.flush()
+            if len(self._events) >= self.max_buffered:
+                self.rejected_events += 1
+                raise HeartbeatBufferFull("Heartbeat buffer is full")
+
+        self._events.append({
+            "employee_id": employee_id,
+            "activity_type": activity_type,
+            "status": status,
+            # Stamped on receipt so batching does not shift the logged time
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        })
+
+        if len(self._events) >= self.max_batch_size:
+            self._batch_ready.set()
+
+    async def flush(self):
+        """Write everything buffered so far as multi-row inserts"""
+        async with self._flush_lock:
+            if not self._events:
+                return
+
+            batch, self._events = self._events, []
+            started = time.perf_counter()
+            supabase_admin = get_supabase_admin()
+
+            for start in range(0, len(batch), self.max_batch_size):
+                chunk = batch[start:start + self.max_batch_size]
+                try:
+                    await db_execute(supabase_admin.table("activity_logs").insert(chunk))
+                    self.flushed_events += len(chunk)
+                    activity_rollups.observe(chunk)
+                except Exception as e:
+                    # Put unwritten events back in front of newer ones and retry next flush
+                    self.failed_flushes += 1
+                    self._events = batch[start:] + self._events
+                    print(f"Heartbeat flush error: {e}")
+                    break
+
+            latency_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.last_flush_latency_ms = latency_ms
+            self.max_flush_latency_ms = max(self.max_flush_latency_ms, latency_ms)
+            self.total_flush_latency_ms += latency_ms
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush loop"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def metrics(self) -> Dict:
+        return {
+            "buffer_depth": len(self._events),
+            "max_buffered": self.max_buffered,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "flushed_events": self.flushed_events,
+            "rejected_events": self.rejected_events,
+            "last_flush_latency_ms": round(self.last_flush_latency_ms, 2),
+            "max_flush_latency_ms": round(self.max_flush_latency_ms, 2),
+            "avg_flush_latency_ms": round(self.total_flush_latency_ms / self.flushes, 2) if self.flushes else 0.0
+        }
+
+heartbeat_buffer = HeartbeatBuffer(
+    flush_interval_seconds=settings.HEARTBEAT_FLUSH_SECONDS,
+    max_batch_size=settings.HEARTBEAT_BATCH_SIZE,
+    max_buffered=settings.HEARTBEAT_BUFFER_MAX
+)
\ No newline at end of file
@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from config.settings import settings
+from services.content_store import ContentStore
+from typing import Dict, List, Optional, Tuple
+
+PROFILE_VARIANT_SIZES = (500, 128, 64)
+
+def _save_variant(img, out_dir: str, fmt: str, **options) -> Tuple[str, str]:
+    temp_path = Path(out_dir) / uuid.uuid4().hex
+    img.save(temp_path, format=fmt, **options)
+    digest = hashlib.sha256(temp_path.read_bytes()).hexdigest()
+    return str(temp_path), digest
+
+def render_variants(source_path: str, out_dir: str, sizes: Tuple[int, ...]) -> List[Dict]:
+    """
+    Decode an image once and write every size variant, in WebP and in the
+    source format, to temp files in out_dir. Runs in a worker process, so
+    it only takes and returns plain values.
+    """
+    from PIL import Image, ImageOps
+
+    variants = []
+    try:
+        with Image.open(source_path) as img:
+            source_format = img.format
+            img = ImageOps.exif_transpose(img)
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            img = img.convert("RGBA" if has_alpha else "RGB")
+
+            # Largest first: each variant is resampled from the previous one, not the full original
+            for size in sorted(sizes, reverse=True):
+                img.thumbnail((size, size), Image.Resampling.LANCZOS)
+                for fmt, options in (("WEBP", {"quality": 80, "method": 4}), (source_format, {"optimize": True, "quality": 85})):
+                    temp_path, digest = _save_variant(img, out_dir, fmt, **options)
+                    variants.append({"size": size, "format": fmt.lower(), "temp_path": temp_path, "digest": digest})
+    except Exception:
+        for variant in variants:
+            Path(variant["temp_path"]).unlink(missing_ok=True)
+        raise
+    return variants
+
+class ImageProcessor:
+    """
+    Runs Pillow work in a process pool so decoding and resampling never
+    block the event loop (or hold the GIL for the API workers). The
+    semaphore bounds how many images are in flight; extra uploads wait on
+    the loop instead of piling up in the pool's queue.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(workers)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Created on first use, so importing the app does not fork workers
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def create_variants(
+        self,
+        source_path: str,
+        store: ContentStore,
+        sizes: Tuple[int, ...] = PROFILE_VARIANT_SIZES
+    ) -> Dict[str, Dict[str, str]]:
+        """
+        Render size variants of a stored image and commit them to `store`.
+        Returns {"<size>": {"webp": path, "<source format>": path}}.
+        """
+        out_dir = str(await asyncio.to_thread(store.temp_dir))
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            rendered = await loop.run_in_executor(self._pool(), render_variants, source_path, out_dir, sizes)
+
+        extensions = {"webp": ".webp", "jpeg": ".jpg", "png": ".png"}
+        variants: Dict[str, Dict[str, str]] = {}
+        for variant in rendered:
+            path = await asyncio.to_thread(
+                store.commit,
+                Path(variant["temp_path"]),
+                variant["digest"],
+                extensions.get(variant["format"], f".{variant['format']}")
+            )
+            variants.setdefault(str(variant["size"]), {})[variant["format"]] = str(path)
+        return variants
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+image_processor = ImageProcessor(workers=settings.IMAGE_PROCESS_WORKERS)
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import deque
+from config.settings import settings
+from config.database import db_execute
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+SEVERITY_ORDER = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+class AhoCorasickMatcher:
+    """
+    Multi-keyword substring matcher. Every keyword is compiled into one
+    automaton, so a text is scanned once no matter how many keywords exist.
+    """
+
+    def __init__(self, keywords: Dict[str, List[int]]):
+        """keywords maps a lowercased keyword to the ids of the rules using it"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[frozenset] = [frozenset()]
+
+        outputs = [set()]
+        for keyword, rule_ids in keywords.items():
+            if not keyword:
+                continue
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                node = next_node
+            outputs[node].update(rule_ids)
+
+        # Breadth-first pass to wire failure links and merge suffix outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                outputs[child] |= outputs[self._fail[child]]
+
+        self._output = [frozenset(o) for o in outputs]
+
+    def find(self, text: str) -> set:
+        """Return the ids of every rule with a keyword occurring in text"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        matched = set()
+        node = 0
+
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                matched |= output[node]
+
+        return matched
+
+class FlaggingRuleCache:
+    """
+    In-memory copy of the active flagging_rules, compiled into a single
+    AhoCorasickMatcher. Rules are re-read at most every
+    FLAGGING_RULES_REFRESH_SECONDS and the automaton is only rebuilt when
+    the version stamp (a hash of the rule contents) changes.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.version: Optional[str] = None
+        self.rules: Dict[int, dict] = {}
+        self._matcher: Optional[AhoCorasickMatcher] = None
+        self._loaded_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self.rebuilds = 0
+
+    def invalidate(self):
+        """Force a reload on the next match (call after editing flagging_rules)"""
+        self._loaded_at = float("-inf")
+
+    async def _refresh(self, supabase: "Client"):
+        async with self._lock:
+            if time.monotonic() - self._loaded_at < self.refresh_seconds and self._matcher:
+                return
+
+            result = await db_execute(
+                supabase.table("flagging_rules").select("*").eq("is_active", True)
+            )
+            self._loaded_at = time.monotonic()
+
+            version = FlaggingRuleCache._version_stamp(result.data)
+            if version == self.version:
+                return
+
+            rules = {}
+            keywords: Dict[str, List[int]] = {}
+            for index, rule in enumerate(result.data):
+                rule_keywords = rule.get("keywords") or [rule.get("keyword")]
+                rules[index] = rule
+                for keyword in rule_keywords:
+                    if keyword:
+                        keywords.setdefault(keyword.lower(), []).append(index)
+
+            self._matcher = AhoCorasickMatcher(keywords)
+            self.rules = rules
+            self.version = version
+            self.rebuilds += 1
+
+    @staticmethod
+    def _version_stamp(rows: List[dict]) -> str:
+        """Hash of the rule rows, independent of the order PostgREST returns them"""
+        canonical = sorted(json.dumps(row, sort_keys=True, default=str) for row in rows)
+        return hashlib.sha1("\n".join(canonical).encode()).hexdigest()
+
+    async def match(self, report: dict, supabase: "Client") -> Dict:
+        """
+        Scan a report's title and description in one pass each.
+        Returns every matching rule and the highest severity among them.
+        """
+        if time.monotonic() - self._loaded_at >= self.refresh_seconds or not self._matcher:
+            try:
+                await self._refresh(supabase)
+            except Exception as e:
+                # Keep matching against the last good rule set if the reload fails
+                if not self._matcher:
+                    raise
+                print(f"Flagging rule refresh error: {e}")
+
+        matched_ids = self._matcher.find(report["title"].lower())
+        matched_ids |= self._matcher.find(report["description"].lower())
+
+        matched_rules = [self.rules[i] for i in sorted(matched_ids)]
+        highest_severity = None
+        for rule in matched_rules:
+            severity = rule["severity_level"]
+            if highest_severity is None or SEVERITY_ORDER.get(severity, 0) > SEVERITY_ORDER.get(highest_severity, 0):
+                highest_severity = severity
+
+        keywords = [rule.get("keyword") or ", ".join(rule.get("keywords") or []) for rule in matched_rules]
+
+        return {
+            "rules": matched_rules,
+            "keywords": keywords,
+            "severity": highest_severity,
+            "version": self.version
+        }
+
+flagging_rule_cache = FlaggingRuleCache(refresh_seconds=settings.FLAGGING_RULES_REFRESH_SECONDS)
\ No newline at end of file
@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Seconds; covers a cached lookup (~1 ms) up to a slow export page
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels (label values passed positionally)"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in self._values.items():
+            yield f"{self.name}_total{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+class Histogram:
+    """
+    Cumulative-bucket histogram. observe() is a bisect plus two list/float
+    updates, so it is cheap enough for every request and every query.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        for label_values, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {count}"
+
+class Registry:
+    """
+    Metric families plus scrape-time gauge callbacks. Components that
+    already keep their own stats (heartbeat buffer, flagging queue, ...)
+    register a callback instead of double-counting on the hot path.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._gauges: List[Tuple[str, str, Tuple[str, ...], Callable[[], Iterable[Tuple[Tuple, float]]]]] = []
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(self, name: str, documentation: str, labels: Tuple[str, ...], collect: Callable):
+        """collect() returns [(label values, value), ...] when /metrics is scraped"""
+        self._gauges.append((name, documentation, labels, collect))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for name, documentation, labels, collect in self._gauges:
+            try:
+                values = list(collect())
+            except Exception as e:
+                print(f"Metrics collector {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{_format_labels(labels, label_values)} {_format_value(value)}" for label_values, value in values)
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "behappy_http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+DB_LATENCY = registry.histogram(
+    "behappy_db_query_duration_seconds", "Supabase/PostgREST call latency by table and operation", ("table", "operation")
+)
+DB_ERRORS = registry.counter(
+    "behappy_db_query_errors", "Supabase/PostgREST calls that raised", ("table", "operation")
+)
+FLAGGING_JOBS = registry.counter(
+    "behappy_flagging_jobs", "Finished report flagging jobs by outcome", ("outcome",)
+)
+WELLNESS_RUNS = registry.counter(
+    "behappy_wellness_recomputes", "Organisation-wide wellness recomputes", ("dry_run",)
+)
+WELLNESS_EMPLOYEES = registry.counter(
+    "behappy_wellness_employees_scored", "Employees scored by wellness recomputes"
+)
+WELLNESS_DURATION = registry.histogram(
+    "behappy_wellness_recompute_duration_seconds", "Wall time of organisation-wide wellness recomputes",
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+
+def describe_query(query) -> Tuple[str, str]:
+    """(table, operation) for a PostgREST request builder"""
+    path = getattr(query, "path", "") or ""
+    if path.startswith("/rpc/"):
+        return path[5:], "rpc"
+    method = getattr(query, "http_method", "GET")
+    if method == "POST":
+        prefer = query.headers.get("prefer", "") if hasattr(query, "headers") else ""
+        operation = "upsert" if "resolution=" in prefer else "insert"
+    else:
+        operation = {"GET": "select", "HEAD": "select", "PATCH": "update", "DELETE": "delete"}.get(method, method.lower())
+    return path.lstrip("/"), operation
+
+def measure_overhead(requests: int = 20000) -> Dict[str, float]:
+    """Per-request cost of the metrics middleware, measured against the bare app"""
+    from fastapi import FastAPI
+    from middleware.metrics import MetricsMiddleware
+
+    def build(instrumented: bool):
+        app = FastAPI()
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: int):
+            return {"id": item_id}
+
+        if instrumented:
+            app.add_middleware(MetricsMiddleware, histogram=Histogram("bench", "bench", ("method", "route", "status")))
+        return app
+
+    async def drive(app) -> float:
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/items/1", "raw_path": b"/items/1", "root_path": "",
+            "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("t", 80)
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        for _ in range(500):
+            await app(dict(scope), receive, send)
+        started = time.perf_counter()
+        for _ in range(requests):
+            await app(dict(scope), receive, send)
+        return (time.perf_counter() - started) / requests
+
+    bare = asyncio.run(drive(build(False)))
+    instrumented = asyncio.run(drive(build(True)))
+    return {
+        "bare_us": round(bare * 1e6, 2),
+        "instrumented_us": round(instrumented * 1e6, 2),
+        "overhead_us": round((instrumented - bare) * 1e6, 2)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metrics tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    overhead = subcommands.add_parser("overhead", help="Measure per-request instrumentation overhead")
+    overhead.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.command == "overhead":
+        print(measure_overhead(args.requests))
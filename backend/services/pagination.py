@@ -0,0 +1,59 @@
+import base64
+import binascii
+import json
+import re
+from fastapi import HTTPException, status
+from config.settings import settings
+from services.time_utils import parse_timestamp
+from typing import Dict, List, Optional, Tuple
+
+# Cursor values end up inside a PostgREST or=() filter, so only accept ids
+# that cannot change its structure (uuids, integers)
+_ROW_ID = re.compile(r"^[A-Za-z0-9-]+$")
+
+def encode_cursor(created_at: str, row_id) -> str:
+    """Opaque cursor pointing just past a (created_at, id) row"""
+    payload = json.dumps([created_at, str(row_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor; raises 400 for anything that did not come from it"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(created_at, str) or not isinstance(row_id, str) or not _ROW_ID.match(row_id):
+            raise ValueError("malformed cursor")
+        return parse_timestamp(created_at).isoformat(), row_id
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def clamp_limit(limit: Optional[int]) -> int:
+    """Page size from the query string, defaulted and capped by settings"""
+    if not limit or limit < 1:
+        return settings.DEFAULT_PAGE_SIZE
+    return min(limit, settings.MAX_PAGE_SIZE)
+
+def keyset_page(query, cursor: Optional[str], limit: int):
+    """
+    Restrict a PostgREST query to the page after `cursor`, newest first.
+    Rows are ordered by (created_at desc, id desc) and the page is read as
+    "strictly before the cursor row", so the database walks the
+    (created_at, id) index instead of skipping an offset. One extra row is
+    fetched so paginate_rows can tell whether another page exists.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})'
+        )
+    return query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+
+def paginate_rows(rows: List[dict], limit: int) -> Tuple[List[dict], Dict]:
+    """Split a keyset_page result into (page rows, pagination metadata)"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more else None
+    return rows, {"limit": limit, "has_more": has_more, "next_cursor": next_cursor}
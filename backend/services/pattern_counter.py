@@ -0,0 +1,137 @@
+import asyncio
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from config.settings import settings
+from config.database import db_execute
+from services.time_utils import parse_timestamp, utc_today
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+class SlidingWindowCounter:
+    """
+    Report counts per (department_id, report_type), bucketed by UTC day over
+    the last window_days days, so FlaggingService._check_patterns only scans
+    the reports table for pairs the counter puts below the threshold.
+
+    Each worker process counts only the reports it inserted itself plus
+    what the last warm() saw; reports taken by other workers arrive with
+    the next resync. A count is therefore a lower bound: enough to flag,
+    not enough to clear.
+
+    Counting is at day granularity: the whole day window_days ago is
+    included, so the count can only err toward flagging. For the same
+    reason reports recorded while warm() runs are replayed into the
+    rebuilt counters even if its scan also saw them.
+    """
+
+    def __init__(self, window_days: int):
+        self.window_days = window_days
+        # key -> (deque of [day, count] oldest first, [running total])
+        self._buckets: Dict[Tuple, Tuple[deque, list]] = {}
+        self.ready = False
+        self.warmed_at: Optional[datetime] = None
+        # record() calls made while warm() is scanning, replayed before its swap
+        self._recorded_during_warm: Optional[list] = None
+
+    def _expire(self, key: Tuple, today: date):
+        buckets, total = self._buckets[key]
+        cutoff = today - timedelta(days=self.window_days)
+        while buckets and buckets[0][0] < cutoff:
+            total[0] -= buckets.popleft()[1]
+        if not buckets:
+            del self._buckets[key]
+
+    def record(self, department_id, report_type, created_at=None):
+        """Count one report (call after each successful insert)"""
+        if self._recorded_during_warm is not None:
+            self._recorded_during_warm.append((department_id, report_type, created_at))
+        day = parse_timestamp(created_at).date() if created_at else utc_today()
+        key = (department_id, report_type)
+        buckets, total = self._buckets.setdefault(key, (deque(), [0]))
+
+        if buckets and buckets[-1][0] == day:
+            buckets[-1][1] += 1
+        elif not buckets or buckets[-1][0] < day:
+            buckets.append([day, 1])
+        else:
+            # Out-of-order timestamp (only during warm-up); keep buckets sorted
+            for bucket in buckets:
+                if bucket[0] == day:
+                    bucket[1] += 1
+                    break
+            else:
+                buckets.append([day, 1])
+                ordered = sorted(buckets)
+                buckets.clear()
+                buckets.extend(ordered)
+        total[0] += 1
+
+        self._expire(key, utc_today())
+
+    def count(self, department_id, report_type) -> int:
+        """Reports for this (department, type) inside the window"""
+        key = (department_id, report_type)
+        if key not in self._buckets:
+            return 0
+        self._expire(key, utc_today())
+        entry = self._buckets.get(key)
+        return entry[1][0] if entry else 0
+
+    def hot_pairs(self, min_count: int) -> List[Dict]:
+        """Every (department, type) pair at or above min_count, busiest first"""
+        today = utc_today()
+        for key in list(self._buckets):
+            self._expire(key, today)
+
+        pairs = [
+            {"department_id": key[0], "report_type": key[1], "count": total[0]}
+            for key, (_, total) in self._buckets.items()
+            if total[0] >= min_count
+        ]
+        return sorted(pairs, key=lambda p: p["count"], reverse=True)
+
+    async def warm(self, supabase: "Client", page_size: int = 1000):
+        """Rebuild the counters from the reports table (startup and periodic resync)"""
+        cutoff = datetime.combine(
+            utc_today() - timedelta(days=self.window_days),
+            datetime.min.time(),
+            tzinfo=timezone.utc
+        )
+
+        fresh = SlidingWindowCounter(self.window_days)
+        self._recorded_during_warm = []
+        try:
+            offset = 0
+            while True:
+                page = await db_execute(
+                    supabase.table("reports").select("department_id, report_type, created_at").gte(
+                        "created_at", cutoff.isoformat()
+                    ).order("created_at").range(offset, offset + page_size - 1)
+                )
+                for row in page.data:
+                    fresh.record(row["department_id"], row["report_type"], row["created_at"])
+                if len(page.data) < page_size:
+                    break
+                offset += page_size
+
+            for recorded in self._recorded_during_warm:
+                fresh.record(*recorded)
+        finally:
+            self._recorded_during_warm = None
+
+        self._buckets = fresh._buckets
+        self.ready = True
+        self.warmed_at = datetime.now(timezone.utc)
+
+    async def run_resync(self, supabase_factory, interval_minutes: int):
+        """Periodically re-warm so reports inserted by other workers are counted"""
+        while True:
+            await asyncio.sleep(interval_minutes * 60)
+            try:
+                await self.warm(supabase_factory())
+            except Exception as e:
+                print(f"Pattern counter resync error: {e}")
+
+pattern_counter = SlidingWindowCounter(window_days=settings.PATTERN_DETECTION_DAYS)
\ No newline at end of file
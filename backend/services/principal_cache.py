@@ -0,0 +1,142 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+from config.settings import settings
+
+class PrincipalCache:
+    """
+    In-process TTL + LRU cache of resolved user profiles, keyed by user_id.
+    Saves the profiles round trip that every authenticated request used to make.
+    Entries are invalidated explicitly whenever a profile is written; the TTL
+    bounds staleness for writes made by other workers. A load that was
+    already in flight when its key was invalidated is returned to its
+    callers but not cached.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        # Generation counter, bumped by every invalidate()/clear(). Loads remember the
+        # generation they started at; _invalidated_at is kept only while loads are in flight.
+        self._generation = 0
+        self._cleared_at = 0
+        self._invalidated_at: Dict[str, int] = {}
+        self._in_flight: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, user_id: str) -> Optional[dict]:
+        """Return a cached profile, or None if missing/expired"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+
+        profile, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+
+        self._entries.move_to_end(user_id)
+        return profile
+
+    def set(self, user_id: str, profile: dict):
+        """Store a profile, evicting the least recently used entry if full"""
+        self._entries[user_id] = (profile, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user_id)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(
+        self,
+        user_id: str,
+        loader: Callable[[], Awaitable[Optional[dict]]]
+    ) -> Optional[dict]:
+        """
+        Return the profile for user_id, calling loader() on a miss.
+        Concurrent misses for the same user share a single load.
+        """
+        user_id = str(user_id)
+        profile = self.get(user_id)
+        if profile is not None:
+            self.hits += 1
+            return dict(profile)
+
+        self.misses += 1
+
+        pending = self._loading.get(user_id)
+        if pending is not None:
+            profile = await asyncio.shield(pending)
+            return dict(profile) if profile is not None else None
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = future
+        started_at = self._generation
+        self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+        try:
+            profile = await loader()
+            if profile is not None and not self._invalidated_since(user_id, started_at):
+                self.set(user_id, profile)
+            future.set_result(profile)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not logged as lost
+            future.exception()
+            raise
+        finally:
+            if self._loading.get(user_id) is future:
+                del self._loading[user_id]
+            remaining = self._in_flight[user_id] - 1
+            if remaining:
+                self._in_flight[user_id] = remaining
+            else:
+                del self._in_flight[user_id]
+                self._invalidated_at.pop(user_id, None)
+
+        return dict(profile) if profile is not None else None
+
+    def _invalidated_since(self, user_id: str, generation: int) -> bool:
+        return max(self._invalidated_at.get(user_id, 0), self._cleared_at) > generation
+
+    def invalidate(self, user_id: str):
+        """Drop a user's cached profile (call after any write to profiles)"""
+        user_id = str(user_id)
+        self._generation += 1
+        if user_id in self._in_flight:
+            self._invalidated_at[user_id] = self._generation
+            # Later misses start a fresh load instead of joining the stale one
+            self._loading.pop(user_id, None)
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop every cached profile"""
+        self._generation += 1
+        self._cleared_at = self._generation
+        self._loading.clear()
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions
+        }
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
\ No newline at end of file
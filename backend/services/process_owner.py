@@ -0,0 +1,28 @@
+import os
+import socket
+import uuid
+
+def owner_id() -> str:
+    """'pid:host:nonce' naming this process as the holder of a lock or claim file"""
+    return f"{os.getpid()}:{socket.gethostname()}:{uuid.uuid4().hex}"
+
+def process_alive(pid: int, host: str) -> bool:
+    """False only when `pid` is a process on this host that no longer exists"""
+    # os.kill(pid, 0) would terminate the process on Windows; there nothing is known to be gone
+    if host != socket.gethostname() or os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def owner_alive(owner: str) -> bool:
+    """process_alive() for an owner_id() string; unparseable owners count as alive"""
+    try:
+        pid, host, _ = owner.split(":", 2)
+        return process_alive(int(pid), host)
+    except ValueError:
+        return True
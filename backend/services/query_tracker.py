@@ -0,0 +1,127 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from services.metrics import describe_query
+from typing import Dict, List, Optional, Tuple
+
+# Query-string keys that shape the result rather than select rows
+_NON_FILTER_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+def query_shape(query) -> Tuple[str, str, Tuple[str, ...]]:
+    """
+    (table, operation, filters) with filter values stripped, e.g.
+    ("reports", "select", ("employee_id.eq",)). Two queries with the same
+    shape in one request differ only in their parameters - the N+1 pattern.
+    """
+    table, operation = describe_query(query)
+    params = getattr(query, "params", None)
+    filters = []
+    if params is not None:
+        for key, value in params.multi_items():
+            if key in _NON_FILTER_PARAMS:
+                continue
+            # "or=(a.lt.1,...)" embeds literals; only the key says anything about the shape
+            filters.append(key if key in ("or", "and") else f"{key}.{value.split('.', 1)[0]}")
+    return table, operation, tuple(sorted(filters))
+
+class BulkOperation:
+    """
+    Shared by the round trips of one paged or chunked read or write (the
+    pages of db_fetch_all, the chunks of an in.(...) helper). Those repeat
+    their shape by design, so the N+1 check counts each shape once per
+    BulkOperation; a loop that calls such a helper over and over is still
+    reported.
+    """
+
+def format_shape(shape: Tuple[str, str, Tuple[str, ...]]) -> str:
+    table, operation, filters = shape
+    return f"{operation} {table}" + (f" [{', '.join(filters)}]" if filters else "")
+
+class QueryTracker:
+    """Data-layer calls made while handling one request (or one tracked block)"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+        # Like shapes, but all round trips of one BulkOperation count once
+        self._calls: Counter = Counter()
+        self._bulk_seen = set()
+
+    def record(self, query, elapsed: float, bulk: Optional[BulkOperation] = None):
+        self.count += 1
+        self.seconds += elapsed
+        shape = query_shape(query)
+        self.shapes[shape] += 1
+        if bulk is not None:
+            if (shape, bulk) in self._bulk_seen:
+                return
+            self._bulk_seen.add((shape, bulk))
+        self._calls[shape] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[Tuple, int]]:
+        """Shapes issued more than `threshold` times (bulk operations once each), most frequent first"""
+        return [(shape, n) for shape, n in self._calls.most_common() if n > threshold]
+
+    def summary(self) -> Dict:
+        return {
+            "queries": self.count,
+            "db_time_ms": round(self.seconds * 1000, 2),
+            "shapes": {format_shape(shape): n for shape, n in self.shapes.most_common()}
+        }
+
+_current: ContextVar[Optional[QueryTracker]] = ContextVar("query_tracker", default=None)
+
+def current_tracker() -> Optional[QueryTracker]:
+    return _current.get()
+
+def record_query(query, elapsed: float, bulk: Optional[BulkOperation] = None):
+    """Called by db_execute for every round trip; a no-op outside a tracked request"""
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.record(query, elapsed, bulk)
+
+@contextmanager
+def track_queries():
+    """Track every db_execute call made in this block (and tasks it spawns)"""
+    tracker = QueryTracker()
+    token = _current.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current.reset(token)
+
+# ----- test helpers -----
+
+@contextmanager
+def query_budget(max_queries: int):
+    """
+    Fail the block if it issues more than max_queries data-layer calls.
+    For service-level tests that await the code under test directly:
+
+        with query_budget(3):
+            await calculate_all_departments_wellness(supabase)
+    """
+    with track_queries() as tracker:
+        yield tracker
+    if tracker.count > max_queries:
+        raise AssertionError(
+            f"Query budget exceeded: {tracker.count} > {max_queries} queries\n"
+            + "\n".join(f"  {n} x {shape}" for shape, n in tracker.summary()["shapes"].items())
+        )
+
+def assert_query_budget(response, max_queries: int):
+    """
+    Fail if an HTTP response reports more than max_queries data-layer calls.
+    For endpoint tests through TestClient (needs QUERY_DEBUG_HEADERS=true):
+
+        assert_query_budget(client.get("/dashboard/metrics", headers=auth), 4)
+    """
+    header = response.headers.get("x-db-queries")
+    if header is None:
+        raise AssertionError("Response has no X-DB-Queries header; set QUERY_DEBUG_HEADERS=true")
+    if int(header) > max_queries:
+        raise AssertionError(
+            f"Query budget exceeded for {response.request.method} {response.request.url.path}: "
+            f"{header} > {max_queries} queries"
+        )
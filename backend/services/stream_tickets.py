@@ -0,0 +1,45 @@
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from config.settings import settings
+from config.database import db_execute
+from services.time_utils import parse_timestamp
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+TICKET_TABLE = "stream_tickets"
+
+def _ticket_hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+async def issue_stream_ticket(user_id: str, supabase: "Client") -> Dict:
+    """
+    A random, single-use ticket for opening /admin/stream. EventSource
+    cannot send an Authorization header, so the ticket goes in the URL in
+    place of the long-lived access token; only its hash is stored
+    (stream_tickets, migrations/007).
+    """
+    ticket = secrets.token_urlsafe(32)
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.STREAM_TICKET_TTL_SECONDS)
+    await db_execute(supabase.table(TICKET_TABLE).insert({
+        "ticket_hash": _ticket_hash(ticket),
+        "user_id": user_id,
+        "expires_at": expires_at.isoformat()
+    }))
+    return {"ticket": ticket, "expires_in": settings.STREAM_TICKET_TTL_SECONDS}
+
+async def redeem_stream_ticket(ticket: str, supabase: "Client") -> Optional[str]:
+    """
+    Consume a ticket and return the user it was issued to, or None if it
+    is unknown, already used or expired. The delete is the single-use
+    check, so a ticket works once across all workers.
+    """
+    result = await db_execute(supabase.table(TICKET_TABLE).delete().eq("ticket_hash", _ticket_hash(ticket)))
+    if not result.data:
+        return None
+    row = result.data[0]
+    if parse_timestamp(row["expires_at"]) <= datetime.now(timezone.utc):
+        return None
+    return str(row["user_id"])
@@ -0,0 +1,15 @@
+from datetime import date, datetime, timezone
+
+def parse_timestamp(value) -> datetime:
+    """Parse a PostgREST timestamp (ISO 8601, possibly with a trailing Z) as UTC"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def utc_today() -> date:
+    """Current UTC date (activity rollups and pattern windows are bucketed in UTC)"""
+    return datetime.now(timezone.utc).date()
\ No newline at end of file
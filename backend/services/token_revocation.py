@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from config.settings import settings
+from config.database import db_execute, db_fetch_all
+from services.time_utils import parse_timestamp
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+REVOCATION_TABLE = "revoked_tokens"
+
+def revocation_id(claims: Dict) -> Optional[str]:
+    """
+    What a logout revokes: the jti of tokens issued by AuthService, or the
+    session_id of Supabase access tokens (which carry no jti). Revoking the
+    session also covers access tokens refreshed from it.
+    """
+    return claims.get("jti") or claims.get("session_id")
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class TokenRevocationList:
+    """
+    Revoked access tokens, keyed by their jti claim. is_revoked() is a
+    Bloom filter probe, so the common case (token not revoked) never
+    touches the exact set or the database; a filter hit is confirmed
+    against the exact {jti: expires_at} map.
+
+    Revocations are persisted to revoked_tokens (migrations/004). Each
+    worker rebuilds its filter from that table at startup and pulls newer
+    rows every sync_seconds, which bounds how long a token revoked on
+    another worker keeps working there. Entries are dropped once the token
+    would have expired anyway, and the filter is rebuilt without them.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, sync_seconds: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+
+        self._expires: Dict[str, float] = {}
+        self._filter = BloomFilter(capacity, error_rate)
+        self._synced_until: Optional[str] = None
+        self._task = None
+
+        # Metrics
+        self.checks = 0
+        self.filter_hits = 0
+        self.false_positives = 0
+
+    # ----- checks -----
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """Microsecond check for get_current_user (tokens without a jti cannot be revoked)"""
+        if not jti:
+            return False
+        self.checks += 1
+        if jti not in self._filter:
+            return False
+
+        self.filter_hits += 1
+        expires_at = self._expires.get(jti)
+        if expires_at is None:
+            self.false_positives += 1
+            return False
+        return expires_at > time.time()
+
+    def _remember(self, jti: str, expires_at: float):
+        self._expires[jti] = expires_at
+        self._filter.add(jti)
+
+    # ----- writes -----
+
+    async def revoke(self, jti: str, expires_at: float, user_id: str, supabase: "Client"):
+        """Revoke one token here immediately and persist it for the other workers"""
+        if not jti or expires_at <= time.time():
+            return
+        self._remember(jti, expires_at)
+        await db_execute(supabase.table(REVOCATION_TABLE).upsert({
+            "jti": jti,
+            "user_id": user_id,
+            "expires_at": datetime.fromtimestamp(expires_at, timezone.utc).isoformat()
+        }, on_conflict="jti"))
+
+    # ----- persistence -----
+
+    async def rebuild(self, supabase: "Client"):
+        """Load every unexpired revocation (startup)"""
+        now = datetime.now(timezone.utc).isoformat()
+        rows = await db_fetch_all(
+            lambda: supabase.table(REVOCATION_TABLE).select("jti, expires_at, revoked_at").gt(
+                "expires_at", now
+            ).order("revoked_at").order("jti")
+        )
+
+        self._expires = {}
+        self._filter = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate)
+        for row in rows:
+            self._remember(row["jti"], parse_timestamp(row["expires_at"]).timestamp())
+        self._synced_until = rows[-1]["revoked_at"] if rows else now
+
+    async def sync(self, supabase: "Client"):
+        """Pick up revocations written by other workers since the last sync"""
+        # Overlap by one interval so rows committed slightly out of revoked_at order are not missed
+        since = parse_timestamp(self._synced_until) - timedelta(seconds=self.sync_seconds)
+        rows = await db_fetch_all(
+            lambda: supabase.table(REVOCATION_TABLE).select("jti, expires_at, revoked_at").gte(
+                "revoked_at", since.isoformat()
+            ).order("revoked_at").order("jti")
+        )
+        for row in rows:
+            self._remember(row["jti"], parse_timestamp(row["expires_at"]).timestamp())
+        if rows:
+            self._synced_until = rows[-1]["revoked_at"]
+
+    def purge_expired(self):
+        """Forget expired tokens and rebuild the filter without them"""
+        now = time.time()
+        live = {jti: expires_at for jti, expires_at in self._expires.items() if expires_at > now}
+        if len(live) == len(self._expires):
+            return
+        self._expires = {}
+        self._filter = BloomFilter(max(self.capacity, len(live) * 2), self.error_rate)
+        for jti, expires_at in live.items():
+            self._remember(jti, expires_at)
+
+    async def _run(self, supabase_factory):
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                await self.sync(supabase_factory())
+            except Exception as e:
+                print(f"Token revocation sync error: {e}")
+            self.purge_expired()
+
+    async def start(self, supabase_factory):
+        try:
+            await self.rebuild(supabase_factory())
+        except Exception as e:
+            print(f"Token revocation rebuild failed, starting empty: {e}")
+            self._synced_until = datetime.now(timezone.utc).isoformat()
+        self._task = asyncio.create_task(self._run(supabase_factory))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "revoked": len(self._expires),
+            "filter_bits": self._filter.size,
+            "hash_count": self._filter.hash_count,
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+            "false_positives": self.false_positives
+        }
+
+token_revocations = TokenRevocationList(
+    capacity=settings.TOKEN_REVOCATION_CAPACITY,
+    error_rate=settings.TOKEN_REVOCATION_ERROR_RATE,
+    sync_seconds=settings.TOKEN_REVOCATION_SYNC_SECONDS
+)
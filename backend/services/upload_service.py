@@ -1,23 +1,26 @@
+import asyncio
+import hashlib
 import os
 import aiofiles
 from fastapi import UploadFile, HTTPException
 from config.settings import settings
 from pathlib import Path
-import uuid
-from PIL import Image
+from services.content_store import ContentStore, content_store
+from services.image_processing import image_processor, PROFILE_VARIANT_SIZES
+from typing import Dict
 
 class UploadService:
     @staticmethod
     async def save_file(file: UploadFile, subfolder: str = "reports") -> str:
-        """Save uploaded file and return file path"""
+        """
+        Save uploaded file and return file path. Files are stored by the
+        SHA-256 of their content (see ContentStore), so uploading the same
+        evidence twice keeps one copy with two references.
+        """
         # Validate file size
         file_size = 0
         chunk_size = 1024 * 1024  # 1MB chunks
         
-        # Create upload directory if not exists
-        upload_path = Path(settings.UPLOAD_DIR) / subfolder
-        upload_path.mkdir(parents=True, exist_ok=True)
-        
         # Validate file extension
         file_ext = Path(file.filename).suffix.lower()
         if file_ext not in settings.ALLOWED_EXTENSIONS:
@@ -26,39 +29,47 @@ class UploadService:
                 detail=f"File type {file_ext} not allowed. Allowed types: {settings.ALLOWED_EXTENSIONS}"
             )
         
-        # Generate unique filename
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = upload_path / unique_filename
+        # Stream to a temp file, hashing as we go (the name depends on the content)
+        store = content_store(subfolder)
+        temp_path = await asyncio.to_thread(store.temp_path)
+        digest = hashlib.sha256()
         
         # Save file
         try:
-            async with aiofiles.open(file_path, 'wb') as f:
+            async with aiofiles.open(temp_path, 'wb') as f:
                 while chunk := await file.read(chunk_size):
                     file_size += len(chunk)
                     
                     # Check size limit
                     if file_size > settings.MAX_FILE_SIZE:
-                        # Remove partial file
-                        await f.close()
-                        os.remove(file_path)
                         raise HTTPException(
                             status_code=400,
                             detail=f"File too large. Max size: {settings.MAX_FILE_SIZE / 1024 / 1024}MB"
                         )
                     
+                    digest.update(chunk)
                     await f.write(chunk)
             
+            file_path = await asyncio.to_thread(store.commit, temp_path, digest.hexdigest(), file_ext)
             return str(file_path)
         
+        except HTTPException:
+            if temp_path.exists():
+                os.remove(temp_path)
+            raise
         except Exception as e:
             # Clean up on error
-            if file_path.exists():
-                os.remove(file_path)
+            if temp_path.exists():
+                os.remove(temp_path)
             raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
     
     @staticmethod
-    async def save_profile_picture(file: UploadFile, employee_id: str) -> str:
-        """Save profile picture with image processing"""
+    async def save_profile_picture(file: UploadFile, employee_id: str) -> Dict:
+        """
+        Save profile picture with image processing. Returns the 500px image
+        as "path" (what callers stored before) plus every size variant:
+        {"path": ..., "variants": {"64": {"webp": ..., "png": ...}, ...}}
+        """
         # Validate it's an image
         file_ext = Path(file.filename).suffix.lower()
         if file_ext not in {".png", ".jpg", ".jpeg"}:
@@ -67,24 +78,32 @@ class UploadService:
         # Save original file
         file_path = await UploadService.save_file(file, "profiles")
         
-        # Resize image to max 500x500
+        # Resize into every variant in the image process pool (one decode per upload)
         try:
-            with Image.open(file_path) as img:
-                img.thumbnail((500, 500), Image.Resampling.LANCZOS)
-                img.save(file_path, optimize=True, quality=85)
+            variants = await image_processor.create_variants(file_path, content_store("profiles"))
         except Exception as e:
             print(f"Image processing error: {e}")
+            return {"path": file_path, "variants": {}}
         
-        return file_path
+        # Only the variants are served; the full-size upload is not kept
+        await asyncio.to_thread(UploadService.delete_file, file_path)
+        largest = variants[str(max(PROFILE_VARIANT_SIZES))]
+        return {
+            "path": next(path for fmt, path in largest.items() if fmt != "webp"),
+            "variants": variants
+        }
     
     @staticmethod
     def delete_file(file_path: str) -> bool:
-        """Delete a file"""
+        """Delete a file (content-addressed files only once their last reference is gone)"""
         try:
-            if os.path.exists(file_path):
+            if not os.path.exists(file_path):
+                return False
+            if ContentStore.is_object(file_path):
+                ContentStore(Path(file_path).parents[2]).release(file_path)
+            else:
                 os.remove(file_path)
-                return True
-            return False
+            return True
         except Exception as e:
             print(f"Failed to delete file: {e}")
             return False
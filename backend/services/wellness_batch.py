@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from config.settings import settings
+from config.database import get_supabase_admin, db_execute, db_fetch_all
+from services.query_tracker import BulkOperation
+from services.time_utils import utc_today
+from services.metrics import WELLNESS_RUNS, WELLNESS_EMPLOYEES, WELLNESS_DURATION
+from services.wellness_service import (
+    WellnessService,
+    WORK_HOURS_BANDS,
+    ACTIVITY_BANDS,
+    STRESS_BANDS,
+    TASK_COMPLETION_BANDS
+)
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# numpy is imported where it is used: it adds ~80 ms to every import of the
+# app, and only the recompute (an admin action or this CLI) needs it.
+
+def apply_bands_vectorized(values: "np.ndarray", bands, below: bool = False):
+    """Array version of wellness_service.apply_bands: returns (scores, penalties)"""
+    import numpy as np
+    conditions = [(values < threshold) if below else (values > threshold) for threshold, _, _ in bands]
+    scores = np.select(conditions, [score for _, score, _ in bands], default=100)
+    penalties = np.select(conditions, [penalty for _, _, penalty in bands], default=0)
+    return scores, penalties
+
+class WellnessBatchEngine:
+    """
+    Organisation-wide wellness recompute. Source rows for all active
+    employees are pulled with chunked bulk queries (employee_id=in.(...)),
+    every factor is scored with NumPy over the whole organisation at once,
+    and the results are written to wellness_scores with bulk inserts.
+    Scoring uses the same band tables as WellnessService.score_wellness.
+    """
+
+    def __init__(self, supabase: "Client", chunk_size: int, page_size: int = 1000, max_concurrency: int = 8):
+        self.supabase = supabase
+        self.chunk_size = chunk_size
+        self.page_size = page_size
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _load_chunk(self, employee_ids: List[str], week_ago: str, month_ago: str, bulk: BulkOperation):
+        async with self._semaphore:
+            return await asyncio.gather(
+                db_fetch_all(lambda: self.supabase.table("activity_daily_rollups").select(
+                    "employee_id, active_slots, total_events"
+                ).in_("employee_id", employee_ids).gte("day", week_ago).order("employee_id").order("day"), self.page_size, bulk),
+                db_fetch_all(lambda: self.supabase.table("reports").select(
+                    "id, employee_id"
+                ).in_("employee_id", employee_ids).gte("created_at", month_ago).order("id"), self.page_size, bulk),
+                db_fetch_all(lambda: self.supabase.table("tasks").select(
+                    "id, employee_id, is_completed"
+                ).in_("employee_id", employee_ids).order("id"), self.page_size, bulk)
+            )
+
+    async def load(self) -> Dict:
+        """Bulk-load per-employee counters as arrays aligned with employee_ids"""
+        import numpy as np
+        employees = await db_fetch_all(
+            lambda: self.supabase.table("profiles").select("id").eq("is_active", True).order("id"),
+            self.page_size
+        )
+        employee_ids = [str(e["id"]) for e in employees]
+        index = {employee_id: i for i, employee_id in enumerate(employee_ids)}
+        n = len(employee_ids)
+
+        # Same window as WellnessService.load_wellness_context: the last 7 UTC days including today
+        week_ago = (utc_today() - timedelta(days=6)).isoformat()
+        month_ago = (datetime.now() - timedelta(days=30)).isoformat()
+
+        chunks = [employee_ids[i:i + self.chunk_size] for i in range(0, n, self.chunk_size)]
+        bulk = BulkOperation()
+        results = await asyncio.gather(*[self._load_chunk(chunk, week_ago, month_ago, bulk) for chunk in chunks])
+
+        active_slots = np.zeros(n, dtype=np.int64)
+        total_events = np.zeros(n, dtype=np.int64)
+        report_count = np.zeros(n, dtype=np.int64)
+        task_total = np.zeros(n, dtype=np.int64)
+        task_completed = np.zeros(n, dtype=np.int64)
+
+        for rollups, reports, tasks in results:
+            if rollups:
+                rows = np.fromiter((index[str(r["employee_id"])] for r in rollups), dtype=np.int64, count=len(rollups))
+                np.add.at(active_slots, rows, [r["active_slots"] or 0 for r in rollups])
+                np.add.at(total_events, rows, [r["total_events"] or 0 for r in rollups])
+            if reports:
+                rows = np.fromiter((index[str(r["employee_id"])] for r in reports), dtype=np.int64, count=len(reports))
+                np.add.at(report_count, rows, 1)
+            if tasks:
+                rows = np.fromiter((index[str(t["employee_id"])] for t in tasks), dtype=np.int64, count=len(tasks))
+                np.add.at(task_total, rows, 1)
+                np.add.at(task_completed, rows, [1 if t["is_completed"] else 0 for t in tasks])
+
+        return {
+            "employee_ids": employee_ids,
+            "active_slots": active_slots,
+            "total_events": total_events,
+            "report_count": report_count,
+            "task_total": task_total,
+            "task_completed": task_completed
+        }
+
+    @staticmethod
+    def score(data: Dict) -> Dict:
+        """Vectorized equivalent of WellnessService.score_wellness for every employee"""
+        import numpy as np
+        hours = data["active_slots"] * (settings.HEARTBEAT_INTERVAL_MINUTES / 60)
+        work_scores, work_penalties = apply_bands_vectorized(hours, WORK_HOURS_BANDS)
+        activity_scores, activity_penalties = apply_bands_vectorized(data["total_events"], ACTIVITY_BANDS, below=True)
+        stress_scores, stress_penalties = apply_bands_vectorized(data["report_count"], STRESS_BANDS)
+
+        has_tasks = data["task_total"] > 0
+        completion_rate = np.divide(
+            data["task_completed"],
+            data["task_total"],
+            out=np.ones(len(data["task_total"]), dtype=np.float64),
+            where=has_tasks
+        )
+        task_scores, task_penalties = apply_bands_vectorized(completion_rate, TASK_COMPLETION_BANDS, below=True)
+
+        penalties = work_penalties + activity_penalties + stress_penalties + task_penalties
+        scores = np.clip(10 - penalties, 1, 10)
+
+        return {
+            "score": scores,
+            "work_life_balance": work_scores,
+            "activity_level": activity_scores,
+            "stress_level": stress_scores,
+            "task_performance": task_scores
+        }
+
+    async def save(self, employee_ids: List[str], scored: Dict, chunk_size: int = 500):
+        """Bulk-insert one wellness_scores row per employee"""
+        messages = {s: WellnessService._generate_wellness_message(s) for s in range(1, 11)}
+        columns = {name: values.tolist() for name, values in scored.items()}
+
+        rows = [
+            {
+                "employee_id": employee_id,
+                "score": columns["score"][i],
+                "factors": {
+                    "work_life_balance": columns["work_life_balance"][i],
+                    "activity_level": columns["activity_level"][i],
+                    "stress_level": columns["stress_level"][i],
+                    "task_performance": columns["task_performance"][i]
+                },
+                "notes": messages[columns["score"][i]]
+            }
+            for i, employee_id in enumerate(employee_ids)
+        ]
+
+        bulk = BulkOperation()
+        await asyncio.gather(*[
+            db_execute(self.supabase.table("wellness_scores").insert(rows[start:start + chunk_size]), bulk)
+            for start in range(0, len(rows), chunk_size)
+        ])
+
+    async def run(self, dry_run: bool = False) -> Dict:
+        """Load, score and save the whole organisation; returns a run summary"""
+        import numpy as np
+        started = time.perf_counter()
+        data = await self.load()
+        loaded = time.perf_counter()
+        scored = WellnessBatchEngine.score(data)
+        computed = time.perf_counter()
+
+        departments = {}
+        if not dry_run and data["employee_ids"]:
+            await self.save(data["employee_ids"], scored)
+            # Department averages depend on the scores just written
+            departments = await WellnessService.calculate_all_departments_wellness(self.supabase)
+        finished = time.perf_counter()
+
+        scores = scored["score"]
+        return {
+            "employees": len(data["employee_ids"]),
+            "average_score": round(float(scores.mean()), 2) if len(scores) else None,
+            "distribution": {str(s): int(c) for s, c in zip(*np.unique(scores, return_counts=True))},
+            "departments": len(departments),
+            "dry_run": dry_run,
+            "timings_ms": {
+                "load": round((loaded - started) * 1000, 1),
+                "score": round((computed - loaded) * 1000, 1),
+                "save": round((finished - computed) * 1000, 1),
+                "total": round((finished - started) * 1000, 1)
+            }
+        }
+
+async def recompute_all_wellness(dry_run: bool = False) -> Dict:
+    """Recompute wellness_scores for every active employee, then every department"""
+    engine = WellnessBatchEngine(get_supabase_admin(), chunk_size=settings.WELLNESS_BATCH_CHUNK_SIZE)
+    summary = await engine.run(dry_run=dry_run)
+
+    WELLNESS_RUNS.inc(str(dry_run).lower())
+    WELLNESS_EMPLOYEES.inc(amount=summary["employees"])
+    WELLNESS_DURATION.observe(summary["timings_ms"]["total"] / 1000)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute wellness scores for the whole organisation")
+    parser.add_argument("--dry-run", action="store_true", help="Score everyone but do not write wellness_scores")
+    args = parser.parse_args()
+
+    summary = asyncio.run(recompute_all_wellness(dry_run=args.dry_run))
+    print(summary)
\ No newline at end of file
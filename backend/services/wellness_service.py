@@ -1,11 +1,36 @@
-from supabase import Client
+import asyncio
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, List, Optional
 from config.settings import settings
+from config.database import db_execute, db_fetch_all
+from services.query_tracker import BulkOperation
+from services.activity_rollup import activity_rollups
+from services.time_utils import utc_today
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Returned by a check whose source data could not be loaded
+NEUTRAL_FACTOR = {"score": 50, "penalty": 0}
+
+# Scoring bands shared with the batch engine (services/wellness_batch.py):
+# (threshold, factor score, penalty), first match wins, otherwise (100, 0)
+EXPECTED_LOGS_PER_WEEK = 12 * 5
+WORK_HOURS_BANDS = ((10, 30, 3), (8, 60, 1))  # active hours above threshold
+ACTIVITY_BANDS = ((EXPECTED_LOGS_PER_WEEK * 0.5, 40, 2), (EXPECTED_LOGS_PER_WEEK * 0.8, 70, 1))  # logs below threshold
+STRESS_BANDS = ((5, 30, 3), (2, 60, 1))  # reports above threshold
+TASK_COMPLETION_BANDS = ((0.3, 40, 2), (0.6, 70, 1))  # completion rate below threshold
+
+def apply_bands(value, bands, below: bool = False) -> Dict:
+    """Score a value against a band table"""
+    for threshold, score, penalty in bands:
+        if (value < threshold) if below else (value > threshold):
+            return {"score": score, "penalty": penalty}
+    return {"score": 100, "penalty": 0}
 
 class WellnessService:
     @staticmethod
-    async def calculate_employee_wellness(employee_id: str, supabase: Client) -> Dict:
+    async def calculate_employee_wellness(employee_id: str, supabase: "Client") -> Dict:
         """
         Calculate wellness score for an employee based on:
         1. Work hours (overtime detection)
@@ -13,145 +38,138 @@ class WellnessService:
         3. Report submissions (stress indicator)
         4. Task completion rate
         """
+        context = await WellnessService.load_wellness_context(employee_id, supabase)
+        score, factors = WellnessService.score_wellness(context)
+        
+        # Save wellness score
+        wellness_data = {
+            "employee_id": employee_id,
+            "score": score,
+            "factors": factors,
+            "notes": WellnessService._generate_wellness_message(score)
+        }
+        
+        await db_execute(supabase.table("wellness_scores").insert(wellness_data))
+        
+        return wellness_data
+    
+    @staticmethod
+    async def load_wellness_context(employee_id: str, supabase: "Client") -> Dict:
+        """
+        Fetch every source the scorers need - activity, reports and tasks -
+        once each and concurrently. A source that fails to load is None and
+        its scorers fall back to a neutral factor.
+        """
+        # The last 7 UTC days including today (rollups are per day, not a rolling 7x24h)
+        week_ago = utc_today() - timedelta(days=6)
+        month_ago = datetime.now() - timedelta(days=30)
+        
+        activity, reports, tasks = await asyncio.gather(
+            activity_rollups.get_totals(employee_id, week_ago, supabase),
+            db_execute(supabase.table("reports").select("id", count="exact").eq(
+                "employee_id", employee_id
+            ).gte(
+                "created_at", month_ago.isoformat()
+            ).limit(1)),
+            db_execute(supabase.table("tasks").select("is_completed").eq(
+                "employee_id", employee_id
+            )),
+            return_exceptions=True
+        )
+        
+        context = {"activity": None, "report_count": None, "tasks": None}
+        
+        if isinstance(activity, Exception):
+            print(f"Wellness activity load error: {activity}")
+        else:
+            context["activity"] = activity
+        
+        if isinstance(reports, Exception):
+            print(f"Wellness reports load error: {reports}")
+        else:
+            context["report_count"] = reports.count
+        
+        if isinstance(tasks, Exception):
+            print(f"Wellness tasks load error: {tasks}")
+        else:
+            context["tasks"] = {
+                "total": len(tasks.data),
+                "completed": len([t for t in tasks.data if t["is_completed"]])
+            }
+        
+        return context
+    
+    @staticmethod
+    def score_wellness(context: Dict) -> tuple:
+        """Turn a wellness context into (score 1-10, factors) - no database access"""
         factors = {}
         score = 10  # Start with perfect score
         
         # 1. Work-Life Balance (Check for overtime)
-        work_balance = await WellnessService._check_work_balance(employee_id, supabase)
+        work_balance = WellnessService._check_work_balance(context["activity"])
         factors["work_life_balance"] = work_balance["score"]
         score -= work_balance["penalty"]
         
         # 2. Activity Level
-        activity_level = await WellnessService._check_activity_level(employee_id, supabase)
+        activity_level = WellnessService._check_activity_level(context["activity"])
         factors["activity_level"] = activity_level["score"]
         score -= activity_level["penalty"]
         
         # 3. Stress Indicators (reports filed)
-        stress_level = await WellnessService._check_stress_indicators(employee_id, supabase)
+        stress_level = WellnessService._check_stress_indicators(context["report_count"])
         factors["stress_level"] = stress_level["score"]
         score -= stress_level["penalty"]
         
         # 4. Task Performance
-        task_performance = await WellnessService._check_task_performance(employee_id, supabase)
+        task_performance = WellnessService._check_task_performance(context["tasks"])
         factors["task_performance"] = task_performance["score"]
         score -= task_performance["penalty"]
         
         # Ensure score is between 1-10
         score = max(1, min(10, score))
         
-        # Save wellness score
-        wellness_data = {
-            "employee_id": employee_id,
-            "score": score,
-            "factors": factors,
-            "notes": WellnessService._generate_wellness_message(score)
-        }
-        
-        supabase.table("wellness_scores").insert(wellness_data).execute()
-        
-        return wellness_data
+        return score, factors
     
     @staticmethod
-    async def _check_work_balance(employee_id: str, supabase: Client) -> Dict:
+    def _check_work_balance(activity: Optional[Dict]) -> Dict:
         """Check work hours in last 7 days"""
-        try:
-            week_ago = datetime.now() - timedelta(days=7)
-            
-            activities = supabase.table("activity_logs").select("*").eq(
-                "employee_id", employee_id
-            ).gte(
-                "timestamp", week_ago.isoformat()
-            ).execute()
-            
-            active_sessions = [a for a in activities.data if a["activity_type"] == "active"]
-            hours_per_day = len(active_sessions) * (settings.HEARTBEAT_INTERVAL_MINUTES / 60)
-            
-            if hours_per_day > 10:
-                return {"score": 30, "penalty": 3}
-            elif hours_per_day > 8:
-                return {"score": 60, "penalty": 1}
-            else:
-                return {"score": 100, "penalty": 0}
-                
-        except Exception as e:
-            print(f"Work balance check error: {e}")
-            return {"score": 50, "penalty": 0}
+        if activity is None:
+            return NEUTRAL_FACTOR
+        
+        hours_per_day = activity["active_slots"] * (settings.HEARTBEAT_INTERVAL_MINUTES / 60)
+        
+        return apply_bands(hours_per_day, WORK_HOURS_BANDS)
     
     @staticmethod
-    async def _check_activity_level(employee_id: str, supabase: Client) -> Dict:
+    def _check_activity_level(activity: Optional[Dict]) -> Dict:
         """Check activity patterns"""
-        try:
-            week_ago = datetime.now() - timedelta(days=7)
-            
-            activities = supabase.table("activity_logs").select("*").eq(
-                "employee_id", employee_id
-            ).gte(
-                "timestamp", week_ago.isoformat()
-            ).execute()
-            
-            total_logs = len(activities.data)
-            expected_per_week = 12 * 5
-            
-            if total_logs < expected_per_week * 0.5:
-                return {"score": 40, "penalty": 2}
-            elif total_logs < expected_per_week * 0.8:
-                return {"score": 70, "penalty": 1}
-            else:
-                return {"score": 100, "penalty": 0}
-                
-        except Exception as e:
-            print(f"Activity level check error: {e}")
-            return {"score": 50, "penalty": 0}
+        if activity is None:
+            return NEUTRAL_FACTOR
+        
+        total_logs = activity["total_events"]
+        
+        return apply_bands(total_logs, ACTIVITY_BANDS, below=True)
     
     @staticmethod
-    async def _check_stress_indicators(employee_id: str, supabase: Client) -> Dict:
+    def _check_stress_indicators(report_count: Optional[int]) -> Dict:
         """Check for stress through report submissions"""
-        try:
-            month_ago = datetime.now() - timedelta(days=30)
-            
-            reports = supabase.table("reports").select("*").eq(
-                "employee_id", employee_id
-            ).gte(
-                "created_at", month_ago.isoformat()
-            ).execute()
-            
-            report_count = len(reports.data)
-            
-            if report_count > 5:
-                return {"score": 30, "penalty": 3}
-            elif report_count > 2:
-                return {"score": 60, "penalty": 1}
-            else:
-                return {"score": 100, "penalty": 0}
-                
-        except Exception as e:
-            print(f"Stress check error: {e}")
-            return {"score": 50, "penalty": 0}
+        if report_count is None:
+            return NEUTRAL_FACTOR
+        
+        return apply_bands(report_count, STRESS_BANDS)
     
     @staticmethod
-    async def _check_task_performance(employee_id: str, supabase: Client) -> Dict:
+    def _check_task_performance(tasks: Optional[Dict]) -> Dict:
         """Check task completion rate"""
-        try:
-            tasks = supabase.table("tasks").select("*").eq(
-                "employee_id", employee_id
-            ).execute()
-            
-            if len(tasks.data) == 0:
-                return {"score": 100, "penalty": 0}
-            
-            completed = len([t for t in tasks.data if t["is_completed"]])
-            completion_rate = completed / len(tasks.data)
-            
-            if completion_rate < 0.3:
-                return {"score": 40, "penalty": 2}
-            elif completion_rate < 0.6:
-                return {"score": 70, "penalty": 1}
-            else:
-                return {"score": 100, "penalty": 0}
-                
-        except Exception as e:
-            print(f"Task performance check error: {e}")
-            return {"score": 50, "penalty": 0}
+        if tasks is None:
+            return NEUTRAL_FACTOR
+        
+        if tasks["total"] == 0:
+            return {"score": 100, "penalty": 0}
+        
+        completion_rate = tasks["completed"] / tasks["total"]
+        
+        return apply_bands(completion_rate, TASK_COMPLETION_BANDS, below=True)
     
     @staticmethod
     def _generate_wellness_message(score: int) -> str:
@@ -166,48 +184,106 @@ class WellnessService:
             return "We're concerned about your wellbeing. Please speak with your manager or HR."
     
     @staticmethod
-    async def calculate_department_wellness(department_id: str, supabase: Client) -> Dict:
+    async def get_latest_scores(employee_ids: List[str], supabase: "Client", chunk_size: int = 200) -> Dict[str, int]:
+        """Latest wellness score per employee, one query per chunk of employees"""
+        chunks = [employee_ids[i:i + chunk_size] for i in range(0, len(employee_ids), chunk_size)]
+        bulk = BulkOperation()
+        results = await asyncio.gather(*[
+            db_fetch_all(lambda chunk=chunk: supabase.table("latest_wellness_scores").select(
+                "employee_id, score"
+            ).in_("employee_id", chunk).order("employee_id"), bulk=bulk)
+            for chunk in chunks
+        ])
+        return {str(row["employee_id"]): row["score"] for rows in results for row in rows}
+    
+    @staticmethod
+    def _summarize_department(employee_ids: List[str], latest_scores: Dict[str, int]) -> Dict:
+        """Average latest score (5 when an employee has none) on a 0-100 scale, with trend"""
+        total_score = sum(latest_scores.get(str(employee_id), 5) for employee_id in employee_ids)
+        avg_score = (total_score / len(employee_ids)) * 10
+        
+        trend = "stable"
+        if avg_score >= settings.WELLNESS_EXCELLENT_MIN:
+            trend = "improving"
+        elif avg_score < settings.WELLNESS_FAIR_MIN:
+            trend = "declining"
+        
+        return {
+            "wellness_score": int(avg_score),
+            "total_employees": len(employee_ids),
+            "trend": trend
+        }
+    
+    @staticmethod
+    async def calculate_department_wellness(department_id: str, supabase: "Client") -> Dict:
         """Calculate wellness score for entire department"""
         try:
-            employees = supabase.table("profiles").select("id").eq(
+            employees = await db_execute(supabase.table("profiles").select("id").eq(
                 "department_id", department_id
             ).eq(
                 "is_active", True
-            ).execute()
+            ))
             
             if not employees.data:
                 return {"wellness_score": 50, "total_employees": 0, "trend": "stable"}
             
-            total_score = 0
-            for emp in employees.data:
-                wellness = supabase.table("wellness_scores").select("score").eq(
-                    "employee_id", emp["id"]
-                ).order("calculated_at", desc=True).limit(1).execute()
-                
-                if wellness.data:
-                    total_score += wellness.data[0]["score"]
-                else:
-                    total_score += 5
+            employee_ids = [str(emp["id"]) for emp in employees.data]
+            latest_scores = await WellnessService.get_latest_scores(employee_ids, supabase)
+            summary = WellnessService._summarize_department(employee_ids, latest_scores)
             
-            avg_score = (total_score / len(employees.data)) * 10
+            await db_execute(supabase.table("departments").update({
+                "wellness_score": summary["wellness_score"],
+                "total_employees": summary["total_employees"]
+            }).eq("id", department_id))
             
-            trend = "stable"
-            if avg_score >= settings.WELLNESS_EXCELLENT_MIN:
-                trend = "improving"
-            elif avg_score < settings.WELLNESS_FAIR_MIN:
-                trend = "declining"
-            
-            supabase.table("departments").update({
-                "wellness_score": int(avg_score),
-                "total_employees": len(employees.data)
-            }).eq("id", department_id).execute()
-            
-            return {
-                "wellness_score": int(avg_score),
-                "total_employees": len(employees.data),
-                "trend": trend
-            }
+            return summary
             
         except Exception as e:
             print(f"Department wellness calculation error: {e}")
-            return {"wellness_score": 50, "total_employees": 0, "trend": "stable"}
\ No newline at end of file
+            return {"wellness_score": 50, "total_employees": 0, "trend": "stable"}
+    
+    @staticmethod
+    async def calculate_all_departments_wellness(supabase: "Client") -> Dict[str, Dict]:
+        """
+        Recompute wellness_score/total_employees for every department in one pass:
+        one paged read of active profiles, one of latest scores and a single
+        set_department_wellness() call (migrations/005) that writes only the
+        computed columns.
+        """
+        departments, employees = await asyncio.gather(
+            db_fetch_all(lambda: supabase.table("departments").select("id").order("id")),
+            db_fetch_all(lambda: supabase.table("profiles").select("id, department_id").eq(
+                "is_active", True
+            ).order("id"))
+        )
+        
+        members: Dict[str, List[str]] = {}
+        for emp in employees:
+            if emp.get("department_id"):
+                members.setdefault(str(emp["department_id"]), []).append(str(emp["id"]))
+        
+        latest_scores = await WellnessService.get_latest_scores([str(emp["id"]) for emp in employees], supabase)
+        
+        summaries = {}
+        updated_rows = []
+        for department in departments:
+            department_id = str(department["id"])
+            employee_ids = members.get(department_id)
+            
+            if not employee_ids:
+                # Same as calculate_department_wellness: empty departments are left untouched
+                summaries[department_id] = {"wellness_score": 50, "total_employees": 0, "trend": "stable"}
+                continue
+            
+            summary = WellnessService._summarize_department(employee_ids, latest_scores)
+            summaries[department_id] = summary
+            updated_rows.append({
+                "id": department["id"],
+                "wellness_score": summary["wellness_score"],
+                "total_employees": summary["total_employees"]
+            })
+        
+        if updated_rows:
+            await db_execute(supabase.rpc("set_department_wellness", {"summaries": updated_rows}))
+        
+        return summaries
\ No newline at end of file
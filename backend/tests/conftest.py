@@ -0,0 +1,63 @@
+"""
+Tests run the application in-process on the embedded SQLite backend, in a
+scratch directory, seeded like the load benchmark (benchmarks/seed.py).
+Settings are read at import time, so the environment is set here, before
+any application module is imported.
+"""
+import os
+import random
+import shutil
+import tempfile
+from typing import Callable, Dict
+
+import pytest
+
+_scratch = tempfile.mkdtemp(prefix="behappy-tests-")
+os.environ.update({
+    "DATABASE_BACKEND": "sqlite",
+    "SQLITE_PATH": os.path.join(_scratch, "behappy.db"),
+    "JWT_SECRET_KEY": "behappy-tests-secret",
+    "QUERY_DEBUG_HEADERS": "true",
+    "FLAGGING_QUEUE_FILE": os.path.join(_scratch, "flagging_queue.jsonl"),
+})
+
+@pytest.fixture(scope="session")
+def seeded() -> Dict:
+    """A small organisation: {"admin_id", "employee_ids", "active_employee_ids", "department_ids", "users"}"""
+    from benchmarks.seed import copy_to_sqlite, seed
+    from benchmarks.stand_in import SupabaseStandIn
+    from config.sqlite_backend import get_database
+
+    stand_in = SupabaseStandIn()
+    data = seed(stand_in, employees=40, activity_logs=800)
+    copy_to_sqlite(stand_in, get_database())
+    return {**data, "users": stand_in.auth.users}
+
+@pytest.fixture(scope="session")
+def client(seeded):
+    from fastapi.testclient import TestClient
+    import main
+
+    working_dir = os.getcwd()
+    os.chdir(_scratch)  # uploads and journals land in the scratch directory
+    try:
+        with TestClient(main.create_app()) as test_client:
+            yield test_client
+    finally:
+        os.chdir(working_dir)
+        shutil.rmtree(_scratch, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def auth_headers(seeded) -> Callable[[str], Dict[str, str]]:
+    from config.sqlite_backend import issue_access_token
+
+    return lambda user_id: {"Authorization": f"Bearer {issue_access_token(seeded['users'][user_id])}"}
+
+@pytest.fixture
+def as_employee(seeded, auth_headers) -> Dict[str, str]:
+    """Headers of a random active employee"""
+    return auth_headers(random.choice(seeded["active_employee_ids"]))
+
+@pytest.fixture
+def as_admin(seeded, auth_headers) -> Dict[str, str]:
+    return auth_headers(seeded["admin_id"])
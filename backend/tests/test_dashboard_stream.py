@@ -0,0 +1,25 @@
+"""
+DashboardBroadcaster subscriptions follow the SSE response's lifetime.
+"""
+import asyncio
+
+from services.dashboard_stream import DashboardBroadcaster
+
+def test_stream_subscribes_only_while_running():
+    broadcaster = DashboardBroadcaster(debounce_seconds=0, refresh_seconds=60, keepalive_seconds=60, queue_size=4)
+
+    async def scenario():
+        # A response that is never started (e.g. the client left first) subscribes nothing
+        broadcaster.stream()
+        assert broadcaster.stats()["subscribers"] == 0
+
+        events = broadcaster.stream()
+        assert (await events.__anext__()).startswith("retry:")
+        assert broadcaster.stats()["subscribers"] == 1
+        broadcaster.publish("report_created", {"id": "r1"})
+        assert "event: report_created" in await events.__anext__()
+
+        await events.aclose()
+        assert broadcaster.stats()["subscribers"] == 0
+
+    asyncio.run(scenario())
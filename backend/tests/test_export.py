@@ -0,0 +1,46 @@
+"""
+Streaming exports: CSV cell encoding and the department filter.
+"""
+import csv
+import io
+
+from services.export_service import CsvEncoder, NdjsonEncoder
+
+def test_csv_neutralises_formula_cells():
+    rows = [{
+        "title": "=HYPERLINK(\"http://evil.example\")", "description": "+1 more", "notes": "-2", "by": "@me",
+        "tabbed": "\tx", "returned": "\rx", "plain": "Wet floor", "score": -3, "factors": {"a": 1}
+    }]
+    cells = next(csv.DictReader(io.StringIO(CsvEncoder().encode(rows).decode("utf-8"))))
+    assert cells["title"] == "'=HYPERLINK(\"http://evil.example\")"
+    assert [cells[key] for key in ("description", "notes", "by", "tabbed", "returned")] == ["'+1 more", "'-2", "'@me", "'\tx", "'\rx"]
+    assert (cells["plain"], cells["score"], cells["factors"]) == ("Wet floor", "-3", '{"a": 1}')
+
+    # NDJSON keeps values as they are
+    assert NdjsonEncoder().encode(rows).decode("utf-8").startswith('{"title": "=HYPERLINK')
+
+def test_activity_export_by_department_reads_every_member(client, seeded, as_admin, monkeypatch):
+    import main
+    from config.database import db_execute, get_supabase_admin
+
+    department_id = seeded["department_ids"][0]
+    fetch_all = main.db_fetch_all
+
+    async def one_member_per_page(build_query, page_size=1000, bulk=None):
+        return await fetch_all(build_query, 1, bulk)
+
+    async def expected_rows():
+        admin = get_supabase_admin()
+        members = await db_execute(admin.table("profiles").select("id").eq("department_id", department_id))
+        ids = [member["id"] for member in members.data]
+        logs = await db_execute(admin.table("activity_logs").select("id", count="exact").in_("employee_id", ids).limit(1))
+        return len(ids), logs.count
+
+    members, logs = client.portal.call(expected_rows)
+    assert members > 1 and logs > 0
+    monkeypatch.setattr(main, "db_fetch_all", one_member_per_page)
+    response = client.get(
+        "/admin/export/activity", headers=as_admin, params={"department_id": department_id, "format": "ndjson"}
+    )
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == logs
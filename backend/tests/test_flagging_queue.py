@@ -0,0 +1,127 @@
+"""
+Background flagging: FlaggingQueue backlog and journal replay (with
+stand-ins for the checks and the report_flagging table), then the status
+endpoint and the pattern check against the application.
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+
+from services.flagging_queue import FlaggingQueue
+
+def make_queue(tmp_path, handler, statuses=None, **options) -> FlaggingQueue:
+    statuses = {} if statuses is None else statuses
+
+    async def store(report_id, fields):
+        statuses[report_id] = fields
+
+    settings = {"workers": 1, "max_depth": 2, "max_retries": 0, "retry_base_seconds": 0.01, **options}
+    return FlaggingQueue(
+        handler=handler, journal_path=str(tmp_path / "flagging_queue.jsonl"), status_store=store, **settings
+    )
+
+def test_full_queue_backlogs_instead_of_running_inline(tmp_path):
+    handled = []
+    recorded = {}
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def blocked_checks(report):
+            # Until released: a job run inline would hold enqueue() here
+            await release.wait()
+            handled.append(report["id"])
+            return {"flagged": False}
+
+        queue = make_queue(tmp_path, blocked_checks, recorded)
+        await queue.start()
+        statuses = await asyncio.wait_for(
+            asyncio.gather(*[queue.enqueue({"id": str(n)}) for n in range(8)]), 5
+        )
+        backlog = queue.stats()["backlog"]
+        release.set()
+        await asyncio.wait_for(queue._queue.join(), 5)
+        await queue.stop()
+        return statuses, backlog
+
+    statuses, backlog = asyncio.run(scenario())
+    assert statuses == ["queued"] * 8
+    assert backlog > 0
+    assert sorted(handled) == [str(n) for n in range(8)]
+    assert {report_id: fields["status"] for report_id, fields in recorded.items()} == {str(n): "clear" for n in range(8)}
+
+def test_start_adopts_journals_of_stopped_workers_only(tmp_path):
+    handled = []
+
+    async def checks(report):
+        handled.append(report["id"])
+        return {"flagged": False}
+
+    queue = make_queue(tmp_path, checks, workers=2, max_depth=100)
+    host = socket.gethostname()
+    # A pid that has just exited, and one that is certainly alive (this test's parent)
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+
+    def journal(name, *report_ids):
+        path = tmp_path / name
+        path.write_text("".join(json.dumps({"op": "enqueue", "report": {"id": r}}) + "\n" for r in report_ids))
+        return path
+
+    legacy = journal("flagging_queue.jsonl", "shared")
+    dead = journal(f"flagging_queue.{host}.{exited.pid}.jsonl", "dead-1", "dead-2")
+    live = journal(f"flagging_queue.{host}.{os.getppid()}.jsonl", "live")
+    with open(dead, "a") as f:
+        f.write(json.dumps({"op": "done", "id": "dead-2"}) + "\n")
+
+    async def scenario():
+        await queue.start()
+        await asyncio.wait_for(queue._queue.join(), 5)
+        await queue.stop()
+
+    asyncio.run(scenario())
+    assert sorted(handled) == ["dead-1", "shared"]
+    assert not legacy.exists() and not dead.exists()
+    assert live.exists()
+    # Nothing left pending, so the queue's own journal is removed on stop
+    assert not queue.journal_path.exists()
+
+def test_status_is_served_from_report_flagging(client, as_employee, as_admin):
+    from services.flagging_queue import flagging_queue
+
+    report = client.post("/reports", headers=as_employee, json={
+        "report_type": "harassment", "severity": "critical", "title": "Shouting",
+        "description": "A manager shouted at the team", "is_anonymous": False
+    }).json()
+    client.portal.call(flagging_queue._queue.join)
+
+    response = client.get(f"/reports/{report['id']}/flagging", headers=as_admin)
+    assert response.status_code == 200
+    flagging = response.json()["flagging"]
+    # Critical without attachments is always flagged (the documentation check)
+    assert flagging["status"] == "flagged" and flagging["attempts"] == 1
+    assert flagging["result"]["flagged"] is True
+
+    assert client.get("/reports/no-such-report/flagging", headers=as_admin).status_code == 404
+
+def test_pattern_check_counts_reports_of_other_workers(client, seeded):
+    from config.database import db_execute, get_supabase_admin
+    from services.flagging_service import FlaggingService
+    from services.pattern_counter import pattern_counter
+
+    report = {"department_id": seeded["department_ids"][0], "report_type": "Parking"}
+
+    async def check_after_other_worker_inserts():
+        # Inserted without pattern_counter.record(), as another worker's would be
+        for n in range(2):
+            await db_execute(get_supabase_admin().table("reports").insert({
+                **report, "severity": "low", "title": f"Blocked bay {n}", "description": "Someone parked in the bay"
+            }))
+        assert pattern_counter.ready and pattern_counter.count(report["department_id"], "Parking") == 0
+        return await FlaggingService._check_patterns(report, get_supabase_admin())
+
+    flag = client.portal.call(check_after_other_worker_inserts)
+    assert flag is not None and flag["type"] == "pattern"
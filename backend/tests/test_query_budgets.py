@@ -0,0 +1,74 @@
+"""
+Round-trip budgets for the hot endpoints. The principal cache is cleared
+before each test, so every count includes the profile lookup of a cold
+request. Raise a budget only together with the change that needs the
+extra query.
+"""
+import pytest
+
+from config.database import get_supabase_admin
+from config.settings import settings
+from services.principal_cache import principal_cache
+from services.query_tracker import BulkOperation, QueryTracker, assert_query_budget, query_budget, query_shape
+from services.wellness_service import WellnessService
+
+@pytest.fixture(autouse=True)
+def cold_principals():
+    principal_cache.clear()
+
+def test_heartbeat(client, as_employee):
+    response = client.post("/activity/heartbeat", headers=as_employee)
+    assert response.status_code == 200
+    assert_query_budget(response, 1)
+
+def test_report_submission(client, as_employee):
+    response = client.post("/reports", headers=as_employee, json={
+        "report_type": "safety", "severity": "low", "title": "Wet floor",
+        "description": "The floor by the loading dock is wet again", "is_anonymous": False
+    })
+    assert response.status_code == 200
+    assert_query_budget(response, 2)
+
+def test_employee_dashboard(client, as_employee):
+    response = client.get("/dashboard/metrics", headers=as_employee)
+    assert response.status_code == 200
+    assert_query_budget(response, 5)
+
+def test_admin_dashboard(client, as_admin):
+    response = client.get("/dashboard/metrics", headers=as_admin)
+    assert response.status_code == 200
+    assert_query_budget(response, 4)
+
+@pytest.mark.parametrize("limit, by_department", [
+    (None, False),
+    (settings.MAX_PAGE_SIZE, False),
+    (None, True),
+])
+def test_employee_list(client, seeded, as_admin, limit, by_department):
+    params = {"limit": limit} if limit else {}
+    if by_department:
+        params["department_id"] = seeded["department_ids"][0]
+    response = client.get("/admin/employees", headers=as_admin, params=params)
+    assert response.status_code == 200
+    assert_query_budget(response, 3)
+
+def test_department_wellness_recompute(client):
+    async def recompute():
+        with query_budget(4):
+            await WellnessService.calculate_all_departments_wellness(get_supabase_admin())
+
+    client.portal.call(recompute)
+
+def test_bulk_operation_counts_once_per_call():
+    query = get_supabase_admin().table("reports").select("id").in_("employee_id", ["a", "b"])
+    tracker = QueryTracker()
+
+    bulk = BulkOperation()
+    for _ in range(10):
+        tracker.record(query, 0.0, bulk)
+    assert tracker.repeated(5) == []
+
+    # The same chunked read issued once per item is still an N+1
+    for _ in range(10):
+        tracker.record(query, 0.0, BulkOperation())
+    assert tracker.repeated(5) == [(query_shape(query), 11)]
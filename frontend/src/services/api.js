@@ -71,6 +71,46 @@ export const dashboardAPI = {
     const response = await api.get('/dashboard/metrics');
     return response.data;
   },
+
+  // Admin only: live updates over Server-Sent Events instead of polling getMetrics.
+  // onEvent(type, data) receives 'dashboard' snapshots and report/wellness events.
+  // Each connection opens with a single-use ticket (EventSource cannot send the
+  // Authorization header, and the access token must not go in a URL), so a
+  // dropped stream reconnects with a fresh ticket instead of EventSource's own retry.
+  // Returns a handle; call .close() to unsubscribe.
+  subscribe: (onEvent) => {
+    let source = null;
+    let closed = false;
+    let retryTimer = null;
+
+    const connect = async () => {
+      try {
+        const response = await api.post('/admin/stream/ticket');
+        if (closed) return;
+        source = new EventSource(
+          `${API_BASE_URL}/admin/stream?ticket=${encodeURIComponent(response.data.ticket)}`
+        );
+        ['dashboard', 'report_created', 'report_flagged', 'employee_updated', 'wellness_recomputed'].forEach((type) => {
+          source.addEventListener(type, (event) => onEvent(type, JSON.parse(event.data)));
+        });
+        source.onerror = () => {
+          source.close();
+          if (!closed) retryTimer = setTimeout(connect, 3000);
+        };
+      } catch (error) {
+        if (!closed) retryTimer = setTimeout(connect, 3000);
+      }
+    };
+
+    connect();
+    return {
+      close: () => {
+        closed = true;
+        clearTimeout(retryTimer);
+        if (source) source.close();
+      },
+    };
+  },
 };
 
 // ==================== REPORTS ENDPOINTS ====================